@@ -0,0 +1,148 @@
+"""
+Бенчмарк памяти очередей многих серверов.
+
+Заполняет очереди множества серверов треками из общего набора популярных
+видео и измеряет через tracemalloc память исходных моделей (dataclass без
+slots, отдельный Track на каждое добавление, очередь на deque) и текущих
+(slots, общий Track на видео через intern_track, TrackQueue).
+
+Запуск из корня репозитория:
+    python benchmarks/models_bench.py [--guilds 200] [--queue 500] [--videos 2000]
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.music.models import Track, TrackSource, intern_track  # noqa: E402
+from src.music.queue import TrackQueue  # noqa: E402
+
+
+@dataclass
+class LegacyTrack:
+    """Track до перехода на slots"""
+    title: str
+    url: str
+    duration: int
+    thumbnail: Optional[str] = None
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    source: TrackSource = TrackSource.YOUTUBE
+    stream_url: Optional[str] = None
+
+
+@dataclass
+class LegacyQueueItem:
+    """QueueItem до перехода на slots"""
+    track: LegacyTrack
+    requester_id: int
+    requester_name: str
+    added_at: datetime = field(default_factory=datetime.now)
+    position: int = 0
+
+
+def _video_fields(video: int) -> Tuple[str, dict]:
+    """
+    Данные видео, как их возвращает извлечение.
+
+    Строки собираются при каждом вызове: после yt-dlp у каждого
+    добавления свои экземпляры строк.
+    """
+    video_id = f"{video:011d}"
+    return video_id, {
+        'title': f"Artist {video % 97} - Song number {video}",
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'duration': 120 + video % 240,
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        'artist': f"Artist {video % 97}",
+    }
+
+
+def _legacy_guilds(plan: List[List[int]]) -> list:
+    """Очереди серверов на исходных моделях"""
+    guilds = []
+    for videos in plan:
+        queue = deque()
+        for position, video in enumerate(videos, start=1):
+            _, data = _video_fields(video)
+            queue.append(LegacyQueueItem(
+                track=LegacyTrack(**data),
+                requester_id=position % 5,
+                requester_name=f"user{position % 5}",
+                position=position
+            ))
+        guilds.append(queue)
+    return guilds
+
+
+def _current_guilds(plan: List[List[int]]) -> list:
+    """Очереди серверов на текущих моделях"""
+    guilds = []
+    for videos in plan:
+        queue = TrackQueue(max_size=len(videos))
+        for position, video in enumerate(videos, start=1):
+            video_id, data = _video_fields(video)
+            track = intern_track(Track(**data), video_id)
+            queue.add(track, position % 5, f"user{position % 5}")
+        guilds.append(queue)
+    return guilds
+
+
+def _measure(build: Callable[[List[List[int]]], list], plan: List[List[int]]) -> Tuple[int, int]:
+    """
+    Память, занятая очередями после заполнения.
+
+    Returns:
+        Кортеж (байт занято, пик байт при заполнении)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        guilds = build(plan)
+        current, peak = tracemalloc.get_traced_memory()
+        del guilds
+    finally:
+        tracemalloc.stop()
+    return current - baseline, peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=200, help="Количество серверов")
+    parser.add_argument('--queue', type=int, default=500, help="Треков в очереди каждого сервера")
+    parser.add_argument('--videos', type=int, default=2000, help="Размер набора популярных видео")
+    args = parser.parse_args()
+
+    random.seed(0)
+    plan = [
+        [random.randrange(args.videos) for _ in range(args.queue)]
+        for _ in range(args.guilds)
+    ]
+    items = args.guilds * args.queue
+
+    print(
+        f"Серверов: {args.guilds}, треков в очереди: {args.queue}, "
+        f"разных видео: {args.videos}\n"
+    )
+    print(f"{'модели':<12}{'МиБ':>10}{'пик МиБ':>10}{'байт/трек':>12}")
+    results = {}
+    for name, build in (('до', _legacy_guilds), ('текущие', _current_guilds)):
+        used, peak = _measure(build, plan)
+        results[name] = used
+        print(f"{name:<12}{used / 2**20:>10.1f}{peak / 2**20:>10.1f}{used / items:>12.0f}")
+
+    print(f"\nЭкономия: {1 - results['текущие'] / results['до']:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Микробенчмарк очереди треков на 10 000 элементов.
+
+Сравнивает исходную очередь на deque (позиции пересчитываются при каждом
+изменении, страница и длительность - копированием всей очереди) с
+TrackQueue и ее режимом честной очереди.
+
+Запуск из корня репозитория:
+    python benchmarks/queue_bench.py [--size 10000] [--ops 1000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.music.models import Track, QueueItem  # noqa: E402
+from src.music.queue import TrackQueue  # noqa: E402
+
+
+class LegacyTrackQueue:
+    """Очередь до индексации (операции, которые измеряет бенчмарк)"""
+
+    def __init__(self, max_size: int):
+        self._queue: deque = deque()
+        self._max_size = max_size
+        self._current: Optional[QueueItem] = None
+
+    @property
+    def total_duration(self) -> int:
+        total = sum(item.track.duration for item in self._queue)
+        if self._current:
+            total += self._current.track.duration
+        return total
+
+    def add(self, track: Track, requester_id: int, requester_name: str) -> Optional[QueueItem]:
+        if len(self._queue) >= self._max_size:
+            return None
+        position = len(self._queue) + (2 if self._current else 1)
+        item = QueueItem(track=track, requester_id=requester_id, requester_name=requester_name, position=position)
+        self._queue.append(item)
+        return item
+
+    def get_next(self) -> Optional[QueueItem]:
+        if not self._queue:
+            return None
+        item = self._queue.popleft()
+        self._update_positions()
+        return item
+
+    def remove_at(self, position: int) -> Optional[QueueItem]:
+        index = position - 2 if self._current else position - 1
+        if index < 0 or index >= len(self._queue):
+            return None
+        queue_list = list(self._queue)
+        removed = queue_list.pop(index)
+        self._queue = deque(queue_list)
+        self._update_positions()
+        return removed
+
+    def get_page(self, page: int = 1, per_page: int = 10) -> Tuple[List[QueueItem], int, int]:
+        total_pages = max(1, (len(self._queue) + per_page - 1) // per_page)
+        page = max(1, min(page, total_pages))
+        start = (page - 1) * per_page
+        return list(self._queue)[start:start + per_page], page, total_pages
+
+    def _update_positions(self):
+        start = 2 if self._current else 1
+        for i, item in enumerate(self._queue):
+            item.position = start + i
+
+
+def _tracks(count: int) -> List[Track]:
+    return [
+        Track(title=f"Track {i}", url=f"https://www.youtube.com/watch?v={i:011d}", duration=180 + i % 120)
+        for i in range(count)
+    ]
+
+
+def _filled(factory: Callable[[], object], tracks: List[Track]):
+    queue = factory()
+    for i, track in enumerate(tracks):
+        # Несколько пользователей, чтобы честная очередь чередовала подочереди
+        queue.add(track, i % 8, f"user{i % 8}")
+    return queue
+
+
+def _measure(setup: Callable[[], object], op: Callable[[object, int], None], ops: int, repeat: int = 3) -> float:
+    """Лучшее из repeat время одной операции в микросекундах"""
+    best = float('inf')
+    for _ in range(repeat):
+        queue = setup()
+        started = time.perf_counter()
+        for i in range(ops):
+            op(queue, i)
+        best = min(best, (time.perf_counter() - started) / ops)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=10000, help="Размер очереди")
+    parser.add_argument('--ops', type=int, default=1000, help="Операций в одном замере")
+    args = parser.parse_args()
+
+    size, ops = args.size, args.ops
+    tracks = _tracks(size)
+    random.seed(0)
+
+    implementations = {
+        'deque (до)': lambda: LegacyTrackQueue(max_size=size * 2),
+        'TrackQueue': lambda: TrackQueue(max_size=size * 2),
+        'честная': lambda: TrackQueue(max_size=size * 2, fair=True),
+    }
+    page = size // 20
+
+    benchmarks = {
+        'add': (lambda factory: factory(), lambda q, i: q.add(tracks[i % size], i % 8, 'user')),
+        'get_next': (lambda factory: _filled(factory, tracks), lambda q, i: q.get_next()),
+        'remove_at (середина)': (
+            lambda factory: _filled(factory, tracks),
+            lambda q, i: q.remove_at((size - i) // 2)
+        ),
+        f'get_page (стр. {page})': (lambda factory: _filled(factory, tracks), lambda q, i: q.get_page(page)),
+        'total_duration': (lambda factory: _filled(factory, tracks), lambda q, i: q.total_duration),
+    }
+
+    print(f"Очередь: {size} треков, {ops} операций на замер, мкс на операцию\n")
+    names = list(implementations)
+    print(f"{'операция':<24}" + ''.join(f"{name:>14}" for name in names))
+    for title, (setup, op) in benchmarks.items():
+        row = [
+            _measure(lambda factory=factory: setup(factory), op, ops)
+            for factory in implementations.values()
+        ]
+        print(f"{title:<24}" + ''.join(f"{value:>14.2f}" for value in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,8 @@ from discord import app_commands
 import asyncio
 import locale
 import logging
-from typing import Optional
+import signal
+from typing import Optional, List
 from datetime import datetime, date
 import os
 
@@ -131,16 +132,15 @@ class DiscordBot(commands.Bot):
             except Exception as e:
                 logger.error(f"Ошибка синхронизации команд: {e}")
 
-            # Установка активности
-            activity = discord.Activity(
-                type=discord.ActivityType.listening,
-                name=self.config.BOT_ACTIVITY_NAME
-            )
-            await self.change_presence(
-                activity=activity,
-                status=discord.Status.do_not_disturb
-            )
+            # Установка активности (через общий менеджер: при переподключении
+            # остается трек, который сейчас играет)
+            self.music_commands.presence.refresh()
             logger.info('Sombra Online')
+
+            # Восстановление музыкальных очередей после перезапуска
+            await self.music_commands.suggestions.load()
+            await self.music_commands.radio.load()
+            await self.music_commands.restore_sessions()
         
         @self.event
         async def on_message(message):
@@ -372,6 +372,24 @@ class DiscordBot(commands.Bot):
             """Команда воспроизведения музыки"""
             await self.music_commands.play(interaction, query)
         
+        @play.autocomplete('query')
+        async def play_autocomplete(
+            interaction: discord.Interaction,
+            current: str
+        ) -> List[app_commands.Choice[str]]:
+            """Подсказки по ранее воспроизведенным трекам"""
+            return self.music_commands.autocomplete(current)
+        
+        @self.tree.command(
+            name="search",
+            description="Найти трек на YouTube и выбрать из результатов",
+            guild=discord.Object(id=self.config.GUILD_ID)
+        )
+        @app_commands.describe(query="Название трека для поиска")
+        async def search(interaction: discord.Interaction, query: str):
+            """Команда поиска трека"""
+            await self.music_commands.search(interaction, query)
+        
         @self.tree.command(
             name="skip",
             description="Пропустить текущий трек",
@@ -408,6 +426,16 @@ class DiscordBot(commands.Bot):
             """Команда паузы/возобновления"""
             await self.music_commands.pause(interaction)
         
+        @self.tree.command(
+            name="seek",
+            description="Перемотать текущий трек",
+            guild=discord.Object(id=self.config.GUILD_ID)
+        )
+        @app_commands.describe(position="Время в формате 1:30 или 90 (секунды)")
+        async def seek(interaction: discord.Interaction, position: str):
+            """Команда перемотки"""
+            await self.music_commands.seek(interaction, position)
+        
         @self.tree.command(
             name="loop",
             description="Переключить режим повтора (трек/очередь/выкл)",
@@ -417,6 +445,32 @@ class DiscordBot(commands.Bot):
             """Команда переключения режима повтора"""
             await self.music_commands.loop(interaction)
         
+        @self.tree.command(
+            name="autoplay",
+            description="Включить или выключить автовоспроизведение похожих треков",
+            guild=discord.Object(id=self.config.GUILD_ID)
+        )
+        async def autoplay(interaction: discord.Interaction):
+            """Команда переключения автовоспроизведения"""
+            await self.music_commands.autoplay(interaction)
+        
+        @self.tree.command(
+            name="fairqueue",
+            description="Чередовать треки пользователей в очереди (требует прав модератора)",
+            guild=discord.Object(id=self.config.GUILD_ID)
+        )
+        @app_commands.describe(
+            user="Пользователь, которому изменить долю (без него - переключить режим)",
+            weight="Сколько треков подряд пользователь получает за ход (1-5)"
+        )
+        async def fairqueue(
+            interaction: discord.Interaction,
+            user: Optional[discord.Member] = None,
+            weight: app_commands.Range[int, 1, 5] = 1
+        ):
+            """Команда переключения честной очереди"""
+            await self.music_commands.fair_queue(interaction, user, weight)
+        
         @self.tree.command(
             name="clear",
             description="Очистить очередь треков (требует прав модератора)",
@@ -425,6 +479,26 @@ class DiscordBot(commands.Bot):
         async def clear(interaction: discord.Interaction):
             """Команда очистки очереди"""
             await self.music_commands.clear(interaction)
+        
+        @self.tree.command(
+            name="musictop",
+            description="Самые популярные треки и активные диджеи сервера",
+            guild=discord.Object(id=self.config.GUILD_ID)
+        )
+        @app_commands.describe(days="За сколько последних дней (по умолчанию 7)")
+        async def musictop(interaction: discord.Interaction, days: int = 7):
+            """Команда просмотра топа треков"""
+            await self.music_commands.top(interaction, days)
+        
+        @self.tree.command(
+            name="musicstats",
+            description="Задержки музыкального плеера по этапам (только для администраторов)",
+            guild=discord.Object(id=self.config.GUILD_ID)
+        )
+        @app_commands.describe(export="Выгрузить все замеры в JSON файл")
+        async def musicstats(interaction: discord.Interaction, export: bool = False):
+            """Команда просмотра задержек плеера"""
+            await self.music_commands.stats(interaction, export)
     
     async def handle_message_statistics(self, message):
         """Об��абатывает статистику сообщений"""
@@ -438,10 +512,28 @@ class DiscordBot(commands.Bot):
         except Exception as e:
             logger.error(f"Ош��бка обработки статистики сообщений: {e}")
 
+    async def close(self):
+        """Останавливает бота, сохранив накопленную статистику музыки"""
+        try:
+            await self.music_commands.shutdown()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения данных музыки при остановке: {e}")
+        await super().close()
+
     async def run_bot(self):
         """Запускает бота"""
+        # docker stop отправляет SIGTERM: без обработчика процесс завершится без close()
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, lambda: asyncio.ensure_future(self.close())
+            )
+        except NotImplementedError:
+            # Windows
+            pass
+        
         try:
-            await self.start(self.config.DISCORD_TOKEN)
+            async with self:
+                await self.start(self.config.DISCORD_TOKEN)
         except Exception as e:
             logger.error(f"Ошибк�� запуска бота: {e}")
             raise
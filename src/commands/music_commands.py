@@ -3,10 +3,14 @@
 """
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
+import asyncio
+import io
+import json
 import logging
-from typing import Optional
+import time
+from typing import Optional, Tuple
 
 from .base_command import BaseCommand
 from ..music import (
@@ -14,11 +18,21 @@ from ..music import (
     TrackQueue, 
     YouTubeExtractor, 
     SpotifyClient,
+    SpotifyMatchCache,
+    AudioCache,
+    QueueJournal,
+    PresenceManager,
+    FFmpegGovernor,
+    UpstreamHealth,
+    UpstreamUnavailable,
+    TrackIndex,
+    PlayHistory,
+    CoOccurrenceIndex,
     PermissionChecker,
     Track,
     QueueItem
 )
-from ..music.models import LoopMode
+from ..music.models import LoopMode, format_duration, parse_duration
 from ..music.permissions import PermissionLevel
 
 logger = logging.getLogger(__name__)
@@ -63,6 +77,11 @@ class MusicControlView(discord.ui.View):
         self.music_commands = music_commands
         self.guild_id = guild_id
     
+    def refresh(self):
+        """Приводит кнопку паузы в соответствие с состоянием плеера"""
+        state = self.music_commands.player.get_state(self.guild_id)
+        self.pause_resume.emoji = "▶️" if state.is_paused else "⏸️"
+    
     @discord.ui.button(emoji="⏸️", style=discord.ButtonStyle.secondary)
     async def pause_resume(self, interaction: discord.Interaction, button: discord.ui.Button):
         state = self.music_commands.player.get_state(self.guild_id)
@@ -96,43 +115,214 @@ class MusicControlView(discord.ui.View):
     
     @discord.ui.button(emoji="⏹️", style=discord.ButtonStyle.danger)
     async def stop_playback(self, interaction: discord.Interaction, button: discord.ui.Button):
+        # Активность сбрасывается в callback отключения
         await self.music_commands.player.stop(self.guild_id)
         
-        # Возвращаем активность по умолчанию
-        try:
-            activity = discord.Activity(
-                type=discord.ActivityType.listening,
-                name=self.music_commands.bot.config.BOT_ACTIVITY_NAME
+        await interaction.response.send_message("⏹️ Воспроизведение остановлено", ephemeral=True)
+        self.stop()
+
+
+class SearchResultsView(discord.ui.View):
+    """View с выбором трека из результатов поиска"""
+    
+    def __init__(
+        self,
+        music_commands: 'MusicCommands',
+        user_id: int,
+        tracks: list[Track],
+        timeout: float = 60
+    ):
+        super().__init__(timeout=timeout)
+        self.music_commands = music_commands
+        self.user_id = user_id
+        self.tracks = tracks
+        
+        self.choose.options = [
+            discord.SelectOption(
+                label=track.title[:100],
+                description=f"{track.artist or 'YouTube'} · {track.duration_formatted}"[:100],
+                value=str(index)
             )
-            await self.music_commands.bot.change_presence(
-                activity=activity,
-                status=discord.Status.do_not_disturb
+            for index, track in enumerate(tracks)
+        ]
+    
+    @discord.ui.select(placeholder="Выберите трек")
+    async def choose(self, interaction: discord.Interaction, select: discord.ui.Select):
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message(
+                "❌ Выбрать трек может только автор поиска",
+                ephemeral=True
             )
-        except Exception as e:
-            pass
+            return
         
-        await interaction.response.send_message("⏹️ Воспроизведение остановлено", ephemeral=True)
+        requested_at = time.perf_counter()
+        track = self.tracks[int(select.values[0])]
+        
+        # Убираем меню, чтобы трек не добавили повторно
+        select.disabled = True
+        await interaction.response.edit_message(view=self)
         self.stop()
+        
+        if not await self.music_commands._join_voice(interaction):
+            return
+        await self.music_commands._enqueue_tracks(interaction, [track], requested_at)
+
+
+class NowPlayingPanel:
+    """
+    Сообщение "Сейчас играет" сервера, которое редактируется при смене трека.
+    
+    Для всех треков используется одно сообщение и один MusicControlView.
+    Если треки меняются чаще, чем раз в EDIT_INTERVAL секунд, промежуточные
+    изменения не отправляются: после паузы сообщение редактируется один раз
+    под последний трек.
+    """
+    
+    # Минимальный интервал между изменениями сообщения (ограничения Discord)
+    EDIT_INTERVAL = 1.5
+    
+    def __init__(self, music_commands: 'MusicCommands', guild_id: int):
+        self.music_commands = music_commands
+        self.guild_id = guild_id
+        self.view = MusicControlView(music_commands, guild_id)
+        self.message: Optional[discord.Message] = None
+        
+        self._pending: Optional[Tuple[QueueItem, int]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_edit = 0.0
+    
+    def show(self, item: QueueItem, channel_id: int):
+        """Показывает трек в панели (изменение отправляется в фоне)"""
+        self._pending = (item, channel_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._flush())
+    
+    async def _flush(self):
+        """Отправляет последнее изменение с учетом интервала"""
+        while self._pending:
+            delay = self._last_edit + self.EDIT_INTERVAL - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            item, channel_id = self._pending
+            self._pending = None
+            self._last_edit = time.monotonic()
+            
+            try:
+                await self._render(item, channel_id)
+            except Exception as e:
+                logger.error(f"Ошибка обновления панели воспроизведения: {e}")
+    
+    async def _render(self, item: QueueItem, channel_id: int):
+        """Редактирует сообщение панели или отправляет новое"""
+        embed = self.music_commands._create_now_playing_embed(item)
+        self.view.refresh()
+        
+        if self.message and self.message.channel.id == channel_id:
+            try:
+                await self.message.edit(embed=embed, view=self.view)
+                return
+            except discord.NotFound:
+                # Сообщение удалили - отправляем новое
+                self.message = None
+        
+        channel = self.music_commands.bot.get_channel(channel_id)
+        if not channel:
+            return
+        
+        if self.message:
+            await self._detach()
+        self.message = await channel.send(embed=embed, view=self.view)
+    
+    async def _detach(self):
+        """Убирает кнопки из текущего сообщения панели"""
+        message, self.message = self.message, None
+        try:
+            await message.edit(view=None)
+        except discord.HTTPException:
+            pass
+    
+    async def close(self):
+        """Закрывает панель: останавливает view и убирает кнопки"""
+        self._pending = None
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.view.stop()
+        if self.message:
+            await self._detach()
 
 
 class MusicCommands(BaseCommand):
     """Класс музыкальных команд"""
     
+    # Количество результатов в /search (не больше 25 - ограничение меню Discord)
+    SEARCH_RESULTS = 5
+    
+    # Имя заказавшего для треков автовоспроизведения
+    AUTOPLAY_REQUESTER_NAME = "Автовоспроизведение"
+    # Сколько результатов поиска просматривать, если переходов нет
+    AUTOPLAY_SEARCH_RESULTS = 5
+    
+    # Максимальная доля пользователя в честной очереди (треков за ход)
+    FAIR_QUEUE_MAX_WEIGHT = 5
+    
+    # Состояния внешних сервисов в /musicstats
+    UPSTREAM_STATES = {
+        'closed': "🟢 работает",
+        'open': "🔴 отключен",
+        'half_open': "🟡 проверка"
+    }
+    
     def __init__(self, bot: commands.Bot):
         super().__init__(bot)
         
         # Инициализация компонентов
-        self.youtube = YouTubeExtractor()
+        self.health = UpstreamHealth(
+            failure_threshold=bot.config.MUSIC_UPSTREAM_FAILURES,
+            max_delay=bot.config.MUSIC_UPSTREAM_MAX_BACKOFF
+        )
+        self.youtube = YouTubeExtractor(
+            max_workers=bot.config.MUSIC_EXTRACTOR_WORKERS,
+            backend=bot.config.MUSIC_EXTRACTOR_BACKEND,
+            health=self.health
+        )
         self.spotify = SpotifyClient(
             client_id=bot.config.SPOTIFY_CLIENT_ID,
             client_secret=bot.config.SPOTIFY_CLIENT_SECRET,
-            youtube_extractor=self.youtube
+            youtube_extractor=self.youtube,
+            match_concurrency=bot.config.SPOTIFY_MATCH_CONCURRENCY,
+            match_timeout=bot.config.SPOTIFY_MATCH_TIMEOUT,
+            match_cache=SpotifyMatchCache(bot.db_manager)
         )
+        audio_cache = None
+        if bot.config.MUSIC_AUDIO_CACHE_DIR:
+            audio_cache = AudioCache(
+                cache_dir=bot.config.MUSIC_AUDIO_CACHE_DIR,
+                youtube_extractor=self.youtube,
+                max_bytes=bot.config.MUSIC_AUDIO_CACHE_MAX_MB * 1024 * 1024,
+                play_threshold=bot.config.MUSIC_AUDIO_CACHE_MIN_PLAYS
+            )
+        self.journal = QueueJournal(bot.db_manager) if bot.config.MUSIC_PERSIST_QUEUES else None
         self.player = MusicPlayer(
             youtube_extractor=self.youtube,
             inactivity_timeout=bot.config.MUSIC_INACTIVITY_TIMEOUT,
             max_queue_size=bot.config.MUSIC_MAX_QUEUE_SIZE,
-            default_volume=bot.config.MUSIC_DEFAULT_VOLUME
+            fair_queue=bot.config.MUSIC_FAIR_QUEUE,
+            default_volume=bot.config.MUSIC_DEFAULT_VOLUME,
+            prefetch_depth=bot.config.MUSIC_PREFETCH_DEPTH,
+            audio_cache=audio_cache,
+            opus_passthrough=bot.config.MUSIC_OPUS_PASSTHROUGH,
+            gapless=bot.config.MUSIC_GAPLESS,
+            gapless_lead=bot.config.MUSIC_GAPLESS_LEAD,
+            crossfade_ms=bot.config.MUSIC_CROSSFADE_MS,
+            journal=self.journal,
+            governor=FFmpegGovernor(
+                max_processes=bot.config.MUSIC_FFMPEG_MAX_PROCESSES,
+                max_cpu_percent=bot.config.MUSIC_FFMPEG_MAX_CPU,
+                max_rss_mb=bot.config.MUSIC_FFMPEG_MAX_RSS_MB,
+                wait_timeout=bot.config.MUSIC_FFMPEG_WAIT
+            )
         )
         self.permissions = PermissionChecker(
             main_admin_id=bot.config.ADMIN_USER_ID,
@@ -140,27 +330,63 @@ class MusicCommands(BaseCommand):
             admin_role_lvl1=bot.config.ADMIN_ROLE_LVL1,
             admin_role_lvl2=bot.config.ADMIN_ROLE_LVL2
         )
+        self.suggestions = TrackIndex(bot.db_manager)
+        self.history = PlayHistory(bot.db_manager)
+        self.radio = CoOccurrenceIndex(bot.db_manager)
+        self.presence = PresenceManager(
+            bot,
+            default_name=bot.config.BOT_ACTIVITY_NAME,
+            interval=bot.config.MUSIC_PRESENCE_INTERVAL
+        )
         
         # Устанавливаем callbacks
         self.player.set_on_track_start(self._on_track_start)
         self.player.set_on_queue_empty(self._on_queue_empty)
         self.player.set_on_error(self._on_error)
-        
-        # Запускаем проверку бездействия
-        self._inactivity_check.start()
+        self.player.set_on_disconnect(self._on_disconnect)
         
         # Храним каналы для уведомлений
         self._notification_channels: dict[int, int] = {}
+        self._panels: dict[int, NowPlayingPanel] = {}
+        self._sessions_restored = False
     
-    @tasks.loop(minutes=1)
-    async def _inactivity_check(self):
-        """Проверяет бездействие на всех серверах"""
-        for guild_id in list(self.player._states.keys()):
-            await self.player.check_inactivity(guild_id)
+    async def shutdown(self):
+        """Записывает накопленные данные перед остановкой бота"""
+        if self.journal:
+            # Позиция сохраняется раз в POSITION_INTERVAL секунд: без этого
+            # трек после перезапуска продолжится раньше места остановки
+            self.journal.checkpoint()
+            await self.journal.flush()
+            self.journal.stop()
+        await self.history.flush()
+        await self.suggestions.flush()
+        await self.radio.flush()
     
-    @_inactivity_check.before_loop
-    async def before_inactivity_check(self):
-        await self.bot.wait_until_ready()
+    async def restore_sessions(self):
+        """Восстанавливает очереди, сохраненные до перезапуска бота"""
+        # on_ready вызывается и при переподключении к Discord
+        if not self.journal or self._sessions_restored:
+            return
+        self._sessions_restored = True
+        
+        for session in await self.journal.load():
+            channel = self.bot.get_channel(session.voice_channel_id)
+            
+            # Не заходим в пустой или удаленный канал
+            if not isinstance(channel, discord.VoiceChannel) or not any(not m.bot for m in channel.members):
+                logger.info(f"Сохраненная очередь сервера {session.guild_id} не восстановлена: канал пуст")
+                self.journal.forget(session.guild_id)
+                continue
+            
+            if session.text_channel_id:
+                self._notification_channels[session.guild_id] = session.text_channel_id
+                self.journal.set_text_channel(session.guild_id, session.text_channel_id)
+            
+            try:
+                if not await self.player.restore(session, channel):
+                    logger.warning(f"Не удалось восстановить воспроизведение на сервере {session.guild_id}")
+            except Exception as e:
+                logger.error(f"Ошибка восстановления очереди сервера {session.guild_id}: {e}")
     
     def _check_channel_permission(self, interaction: discord.Interaction) -> tuple[bool, str]:
         """
@@ -183,23 +409,29 @@ class MusicCommands(BaseCommand):
     
     async def _on_track_start(self, guild_id: int, item: QueueItem):
         """Callback при старте трека"""
+        self.history.record(guild_id, item)
+        self.suggestions.record(item.track)
+        
+        # Переходы, выбранные автовоспроизведением, не учитываем: иначе
+        # индекс закреплял бы собственный выбор
+        history = self.player.get_queue(guild_id).history
+        if history and item.requester_id != self.bot.user.id:
+            self.radio.record(guild_id, history[-1].track, item.track)
+        
         # Меняем активность бота на текущий трек
-        try:
-            activity = discord.Activity(
-                type=discord.ActivityType.listening,
-                name=item.track.display_name[:128]  # Discord limit
-            )
-            await self.bot.change_presence(
-                activity=activity,
-                status=discord.Status.do_not_disturb
-            )
-        except Exception as e:
-            logger.error(f"Ошибка смены активности: {e}")
+        self.presence.set_track(guild_id, item.track.display_name)
         
         channel_id = self._notification_channels.get(guild_id)
         if not channel_id:
             return
         
+        if self.bot.config.MUSIC_NOW_PLAYING_PANEL:
+            panel = self._panels.get(guild_id)
+            if panel is None:
+                panel = self._panels[guild_id] = NowPlayingPanel(self, guild_id)
+            panel.show(item, channel_id)
+            return
+        
         channel = self.bot.get_channel(channel_id)
         if not channel:
             return
@@ -212,20 +444,27 @@ class MusicCommands(BaseCommand):
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления: {e}")
     
+    async def _close_panel(self, guild_id: int):
+        """Закрывает панель воспроизведения сервера"""
+        panel = self._panels.pop(guild_id, None)
+        if panel:
+            await panel.close()
+    
+    async def _on_disconnect(self, guild_id: int):
+        """Callback при отключении бота от голосового канала"""
+        self.presence.clear(guild_id)
+        await self._close_panel(guild_id)
+    
     async def _on_queue_empty(self, guild_id: int):
         """Callback при опустошении очереди"""
+        if self.player.get_autoplay(guild_id) and await self._autoplay(guild_id):
+            return
+        
         # Возвращаем активность по умолчанию
-        try:
-            activity = discord.Activity(
-                type=discord.ActivityType.listening,
-                name=self.bot.config.BOT_ACTIVITY_NAME
-            )
-            await self.bot.change_presence(
-                activity=activity,
-                status=discord.Status.do_not_disturb
-            )
-        except Exception as e:
-            logger.error(f"Ошибка смены активности: {e}")
+        self.presence.clear(guild_id)
+        
+        # Кнопки управления без трека не нужны
+        await self._close_panel(guild_id)
         
         channel_id = self._notification_channels.get(guild_id)
         if not channel_id:
@@ -246,6 +485,53 @@ class MusicCommands(BaseCommand):
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления: {e}")
     
+    async def _autoplay(self, guild_id: int) -> bool:
+        """
+        Добавляет трек, похожий на недавно сыгранные.
+        
+        Трек выбирается по переходам между треками на этом сервере; поиск
+        на YouTube выполняется, только если переходов для недавних треков нет.
+        
+        Returns:
+            True если трек добавлен
+        """
+        recent = [item.track for item in self.player.get_queue(guild_id).history]
+        if not recent:
+            return False
+        
+        track = self.radio.pick(guild_id, recent)
+        if track is None:
+            track = await self._autoplay_search(recent)
+        if track is None:
+            logger.info(f"Автовоспроизведение: нет похожих треков для сервера {guild_id}")
+            return False
+        
+        logger.info(f"Автовоспроизведение: {track.display_name}")
+        item = await self.player.play(
+            guild_id,
+            track,
+            self.bot.user.id,
+            self.AUTOPLAY_REQUESTER_NAME
+        )
+        return item is not None
+    
+    async def _autoplay_search(self, recent: list[Track]) -> Optional[Track]:
+        """Ищет на YouTube трек того же исполнителя, которого не было среди недавних"""
+        last = recent[-1]
+        played = {YouTubeExtractor.get_video_id(track.url) or track.url for track in recent}
+        
+        try:
+            with self.player.metrics.span('autoplay.search'):
+                results = await self.youtube.search(last.artist or last.title, max_results=self.AUTOPLAY_SEARCH_RESULTS)
+        except UpstreamUnavailable as e:
+            logger.warning(f"Автовоспроизведение без поиска: {e}")
+            return None
+        
+        for track in results:
+            if (YouTubeExtractor.get_video_id(track.url) or track.url) not in played:
+                return track
+        return None
+    
     async def _on_error(self, guild_id: int, error: str):
         """Callback при ошибке"""
         channel_id = self._notification_channels.get(guild_id)
@@ -341,6 +627,8 @@ class MusicCommands(BaseCommand):
         footer_text = f"Страница {data['current_page']}/{data['total_pages']} | Общее время: {data['total_duration']}"
         if loop_text:
             footer_text += f" | {loop_text}"
+        if queue.fair:
+            footer_text += " | ⚖️ Честная очередь"
         
         embed.set_footer(text=footer_text)
         
@@ -348,21 +636,93 @@ class MusicCommands(BaseCommand):
     
     async def play(self, interaction: discord.Interaction, query: str):
         """Команда воспроизведения"""
+        requested_at = time.perf_counter()
+        metrics = self.player.metrics
+        
         # Проверяем канал
         allowed, error_msg = self._check_channel_permission(interaction)
         if not allowed:
             await interaction.response.send_message(error_msg, ephemeral=True)
             return
         
-        await interaction.response.defer()
+        with metrics.span('play.defer'):
+            await interaction.response.defer()
         
+        if not await self._join_voice(interaction):
+            return
+        
+        # Определяем тип запроса и извлекаем треки
+        tracks = []
+        
+        try:
+            # Проверяем Spotify
+            if self.spotify.is_enabled and self.spotify.is_spotify_url(query):
+                spotify_type = self.spotify.get_spotify_type(query)
+                
+                await interaction.followup.send(
+                    f"🔍 Обработка Spotify {spotify_type}...",
+                    ephemeral=True
+                )
+                
+                if spotify_type == 'track':
+                    with metrics.span('play.spotify'):
+                        track = await self.spotify.get_track(query)
+                    if track:
+                        tracks = [track]
+                elif spotify_type in ('album', 'playlist'):
+                    await self._play_spotify_collection(interaction, query, spotify_type)
+                    return
+            
+            # Проверяем YouTube
+            elif self.youtube.is_youtube_url(query):
+                if self.youtube.is_playlist_url(query):
+                    await interaction.followup.send(
+                        "🔍 Загрузка плейлиста...",
+                        ephemeral=True
+                    )
+                    with metrics.span('play.extract_playlist'):
+                        tracks = await self.youtube.extract_playlist(query)
+                else:
+                    with metrics.span('play.extract'):
+                        track = await self.youtube.extract_track(query)
+                    if track:
+                        tracks = [track]
+            
+            # Поиск по запросу: быстрый поиск без форматов видео, stream URL
+            # получит плеер (предзагрузка или запуск трека)
+            else:
+                with metrics.span('play.search'):
+                    tracks = await self.youtube.search(query, max_results=1)
+        except UpstreamUnavailable as e:
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
+            return
+        
+        if not tracks:
+            await interaction.followup.send(
+                "❌ Ничего не найдено по запросу",
+                ephemeral=True
+            )
+            return
+        
+        await self._enqueue_tracks(interaction, tracks, requested_at)
+    
+    async def _join_voice(self, interaction: discord.Interaction) -> bool:
+        """
+        Подключает бота к голосовому каналу пользователя для воспроизведения.
+        
+        Ответ на interaction должен быть отложен (defer), ошибки
+        отправляются через followup.
+        
+        Returns:
+            True если бот подключен
+        """
         # Проверяем, что пользователь в голосовом канале
         if not interaction.user.voice:
             await interaction.followup.send(
                 "❌ Вы должны быть в голосовом канале",
                 ephemeral=True
             )
-            return
+            return False
         
         target_channel = interaction.user.voice.channel
         guild_id = interaction.guild_id
@@ -384,75 +744,46 @@ class MusicCommands(BaseCommand):
                 f"❌ {permission.reason}",
                 ephemeral=True
             )
-            return
+            return False
         
-        # Подключаемся к каналу
-        vc = await self.player.connect(target_channel, interaction.user.id)
+        # Подключаемся к каналу (замеряем только настоящее подключение или переход)
+        if current_channel == target_channel:
+            vc = await self.player.connect(target_channel, interaction.user.id)
+        else:
+            with self.player.metrics.span('play.connect'):
+                vc = await self.player.connect(target_channel, interaction.user.id)
         if not vc:
             await interaction.followup.send(
                 "❌ Не удалось подключиться к голосовому каналу",
                 ephemeral=True
             )
-            return
+            return False
         
         # Сохраняем канал для уведомлений
         self._notification_channels[guild_id] = interaction.channel_id
-        
-        # Определяем тип запроса и извлекаем треки
-        tracks = []
-        
-        # Проверяем Spotify
-        if self.spotify.is_enabled and self.spotify.is_spotify_url(query):
-            spotify_type = self.spotify.get_spotify_type(query)
-            
-            await interaction.followup.send(
-                f"🔍 Обработка Spotify {spotify_type}...",
-                ephemeral=True
-            )
-            
-            if spotify_type == 'track':
-                track = await self.spotify.get_track(query)
-                if track:
-                    tracks = [track]
-            elif spotify_type == 'album':
-                tracks = await self.spotify.get_album_tracks(query)
-            elif spotify_type == 'playlist':
-                tracks = await self.spotify.get_playlist_tracks(query)
-        
-        # Проверяем YouTube
-        elif self.youtube.is_youtube_url(query):
-            if self.youtube.is_playlist_url(query):
-                await interaction.followup.send(
-                    "🔍 Загрузка плейлиста...",
-                    ephemeral=True
-                )
-                tracks = await self.youtube.extract_playlist(query)
-            else:
-                track = await self.youtube.extract_track(query)
-                if track:
-                    tracks = [track]
-        
-        # Поиск по запросу
-        else:
-            track = await self.youtube.extract_track(query)
-            if track:
-                tracks = [track]
-        
-        if not tracks:
-            await interaction.followup.send(
-                "❌ Ничего не найдено по запросу",
-                ephemeral=True
-            )
-            return
+        if self.journal:
+            self.journal.set_text_channel(guild_id, interaction.channel_id)
+        return True
+    
+    async def _enqueue_tracks(
+        self,
+        interaction: discord.Interaction,
+        tracks: list[Track],
+        requested_at: Optional[float] = None
+    ):
+        """Ставит найденные треки в очередь и сообщает результат через followup"""
+        guild_id = interaction.guild_id
         
         # Добавляем треки
         if len(tracks) == 1:
-            item = await self.player.play(
-                guild_id,
-                tracks[0],
-                interaction.user.id,
-                interaction.user.display_name
-            )
+            with self.player.metrics.span('play.start'):
+                item = await self.player.play(
+                    guild_id,
+                    tracks[0],
+                    interaction.user.id,
+                    interaction.user.display_name,
+                    requested_at=requested_at
+                )
             
             if item:
                 queue = self.player.get_queue(guild_id)
@@ -476,31 +807,134 @@ class MusicCommands(BaseCommand):
                     await interaction.followup.send(embed=embed)
         else:
             # Несколько треков
-            items = await self.player.play_multiple(
-                guild_id,
-                tracks,
-                interaction.user.id,
-                interaction.user.display_name
-            )
+            with self.player.metrics.span('play.start'):
+                items = await self.player.play_multiple(
+                    guild_id,
+                    tracks,
+                    interaction.user.id,
+                    interaction.user.display_name,
+                    requested_at=requested_at
+                )
             
-            embed = discord.Embed(
-                title="✅ Добавлено в очередь",
-                description=f"Добавлено **{len(items)}** треков",
-                color=discord.Color.green()
+            embed = self._create_tracks_added_embed(items)
+            await interaction.followup.send(embed=embed)
+    
+    def autocomplete(self, current: str) -> list[app_commands.Choice[str]]:
+        """Подсказки для /play из индекса воспроизведенных треков"""
+        return [
+            app_commands.Choice(name=entry.display_name[:100], value=entry.url[:100])
+            for entry in self.suggestions.lookup(current)
+        ]
+    
+    async def search(self, interaction: discord.Interaction, query: str):
+        """Команда поиска с выбором трека"""
+        # Проверяем канал
+        allowed, error_msg = self._check_channel_permission(interaction)
+        if not allowed:
+            await interaction.response.send_message(error_msg, ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            with self.player.metrics.span('search'):
+                tracks = await self.youtube.search(query, max_results=self.SEARCH_RESULTS)
+        except UpstreamUnavailable as e:
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
+            return
+        
+        if not tracks:
+            await interaction.followup.send(
+                "❌ Ничего не найдено по запросу",
+                ephemeral=True
             )
-            
-            if items:
-                first_tracks = items[:5]
-                tracks_text = "\n".join(
-                    f"`{i.position}.` {i.track.display_name}" 
-                    for i in first_tracks
+            return
+        
+        embed = discord.Embed(
+            title=f"🔍 Результаты поиска: {query[:200]}",
+            description="\n".join(
+                f"`{index}.` {track.display_name} `[{track.duration_formatted}]`"
+                for index, track in enumerate(tracks, 1)
+            ),
+            color=discord.Color.blue()
+        )
+        
+        view = SearchResultsView(self, interaction.user.id, tracks)
+        await interaction.followup.send(embed=embed, view=view, ephemeral=True)
+    
+    async def _play_spotify_collection(
+        self,
+        interaction: discord.Interaction,
+        query: str,
+        spotify_type: str
+    ):
+        """Ставит треки альбома или плейлиста Spotify в очередь по мере их нахождения"""
+        guild_id = interaction.guild_id
+        
+        # Страницы Spotify подгружаются по мере заполнения очереди
+        max_tracks = self.bot.config.MUSIC_MAX_QUEUE_SIZE
+        if spotify_type == 'album':
+            matches = self.spotify.iter_album_tracks(query, max_tracks)
+        else:
+            matches = self.spotify.iter_playlist_tracks(query, max_tracks)
+        
+        items = []
+        unavailable: Optional[UpstreamUnavailable] = None
+        try:
+            async for track in matches:
+                # Первый найденный трек сразу запускает воспроизведение
+                added = await self.player.play_multiple(
+                    guild_id,
+                    [track],
+                    interaction.user.id,
+                    interaction.user.display_name
                 )
-                if len(items) > 5:
-                    tracks_text += f"\n... и еще {len(items) - 5}"
-                
-                embed.add_field(name="Треки", value=tracks_text, inline=False)
+                if not added:
+                    # Очередь заполнена
+                    break
+                items.extend(added)
+        except UpstreamUnavailable as e:
+            # Уже найденные треки остаются в очереди
+            unavailable = e
+        finally:
+            await matches.aclose()
+        
+        if not items:
+            await interaction.followup.send(
+                f"❌ {unavailable}" if unavailable else "❌ Ничего не найдено по запросу",
+                ephemeral=True
+            )
+            return
+        
+        embed = self._create_tracks_added_embed(items)
+        await interaction.followup.send(embed=embed)
+        
+        if unavailable:
+            await interaction.followup.send(
+                f"⚠️ Добавлены не все треки: {unavailable}",
+                ephemeral=True
+            )
+    
+    def _create_tracks_added_embed(self, items: list[QueueItem]) -> discord.Embed:
+        """Создает embed для нескольких добавленных треков"""
+        embed = discord.Embed(
+            title="✅ Добавлено в очередь",
+            description=f"Добавлено **{len(items)}** треков",
+            color=discord.Color.green()
+        )
+        
+        if items:
+            first_tracks = items[:5]
+            tracks_text = "\n".join(
+                f"`{i.position}.` {i.track.display_name}" 
+                for i in first_tracks
+            )
+            if len(items) > 5:
+                tracks_text += f"\n... и еще {len(items) - 5}"
             
-            await interaction.followup.send(embed=embed)
+            embed.add_field(name="Треки", value=tracks_text, inline=False)
+        
+        return embed
     
     async def skip(self, interaction: discord.Interaction):
         """Команда пропуска трека"""
@@ -596,19 +1030,6 @@ class MusicCommands(BaseCommand):
         if guild_id in self._notification_channels:
             del self._notification_channels[guild_id]
         
-        # Возвращаем активность по умолчанию
-        try:
-            activity = discord.Activity(
-                type=discord.ActivityType.listening,
-                name=self.bot.config.BOT_ACTIVITY_NAME
-            )
-            await self.bot.change_presence(
-                activity=activity,
-                status=discord.Status.do_not_disturb
-            )
-        except Exception as e:
-            logger.error(f"Ошибка смены активности: {e}")
-        
         embed = discord.Embed(
             title="⏹️ Воспроизведение остановлено",
             description="Очередь очищена, бот отключен",
@@ -639,6 +1060,65 @@ class MusicCommands(BaseCommand):
             else:
                 await interaction.response.send_message("❌ Не удалось поставить на паузу", ephemeral=True)
     
+    async def seek(self, interaction: discord.Interaction, position: str):
+        """Команда перемотки текущего трека"""
+        # Проверяем канал
+        allowed, error_msg = self._check_channel_permission(interaction)
+        if not allowed:
+            await interaction.response.send_message(error_msg, ephemeral=True)
+            return
+        
+        guild_id = interaction.guild_id
+        state = self.player.get_state(guild_id)
+        current = state.current_track
+        
+        if not self.player.is_connected(guild_id) or not current:
+            await interaction.response.send_message(
+                "❌ Бот не воспроизводит музыку",
+                ephemeral=True
+            )
+            return
+        
+        # Перемотка чужого трека требует тех же прав, что и пропуск
+        result = self.permissions.can_skip(interaction.user, current.requester_id)
+        if not result.allowed:
+            await interaction.response.send_message(
+                f"❌ {result.reason}",
+                ephemeral=True
+            )
+            return
+        
+        seconds = parse_duration(position)
+        if seconds is None:
+            await interaction.response.send_message(
+                "❌ Укажите время в формате `1:30` или `90`",
+                ephemeral=True
+            )
+            return
+        
+        if current.track.duration and seconds >= current.track.duration:
+            await interaction.response.send_message(
+                f"❌ Длительность трека: {current.track.duration_formatted}",
+                ephemeral=True
+            )
+            return
+        
+        await interaction.response.defer()
+        
+        if not await self.player.seek(guild_id, seconds):
+            await interaction.followup.send("❌ Не удалось перемотать трек", ephemeral=True)
+            return
+        
+        embed = discord.Embed(
+            title="⏩ Перемотка",
+            description=(
+                f"**{current.track.display_name}**\n"
+                f"{format_duration(seconds)} / {current.track.duration_formatted}"
+            ),
+            color=discord.Color.blue()
+        )
+        await interaction.followup.send(embed=embed)
+    
     async def loop(self, interaction: discord.Interaction):
         """Команда переключения режима повтора"""
         # Проверяем канал
@@ -679,6 +1159,92 @@ class MusicCommands(BaseCommand):
         
         await interaction.response.send_message(embed=embed)
     
+    async def autoplay(self, interaction: discord.Interaction):
+        """Команда переключения автовоспроизведения"""
+        # Проверяем канал
+        allowed, error_msg = self._check_channel_permission(interaction)
+        if not allowed:
+            await interaction.response.send_message(error_msg, ephemeral=True)
+            return
+        
+        guild_id = interaction.guild_id
+        
+        if not self.player.is_connected(guild_id):
+            await interaction.response.send_message(
+                "❌ Бот не воспроизводит музыку",
+                ephemeral=True
+            )
+            return
+        
+        enabled = not self.player.get_autoplay(guild_id)
+        self.player.set_autoplay(guild_id, enabled)
+        
+        embed = discord.Embed(
+            title="📻 Автовоспроизведение",
+            description=(
+                "Включено: когда очередь закончится, будут играть похожие треки"
+                if enabled else "Выключено"
+            ),
+            color=discord.Color.blue()
+        )
+        
+        await interaction.response.send_message(embed=embed)
+    
+    async def fair_queue(
+        self,
+        interaction: discord.Interaction,
+        user: Optional[discord.Member] = None,
+        weight: int = 1
+    ):
+        """Команда переключения честной очереди и доли пользователя в ней"""
+        # Проверяем канал
+        allowed, error_msg = self._check_channel_permission(interaction)
+        if not allowed:
+            await interaction.response.send_message(error_msg, ephemeral=True)
+            return
+        
+        guild_id = interaction.guild_id
+        
+        if not self.player.is_connected(guild_id):
+            await interaction.response.send_message(
+                "❌ Бот не воспроизводит музыку",
+                ephemeral=True
+            )
+            return
+        
+        # Порядок очереди меняет для всех - нужны те же права, что и на очистку
+        result = self.permissions.can_clear_queue(interaction.user)
+        if not result.allowed:
+            await interaction.response.send_message(
+                f"❌ {result.reason}",
+                ephemeral=True
+            )
+            return
+        
+        queue = self.player.get_queue(guild_id)
+        
+        if user:
+            weight = max(1, min(weight, self.FAIR_QUEUE_MAX_WEIGHT))
+            queue.set_weight(user.id, weight)
+            description = f"{user.display_name} получает треков за ход: **{weight}**"
+            if not queue.fair:
+                description += "\nДоля учитывается, когда честная очередь включена"
+        else:
+            enabled = not self.player.get_fair_queue(guild_id)
+            self.player.set_fair_queue(guild_id, enabled)
+            description = (
+                "Включена: треки пользователей чередуются"
+                if enabled else "Выключена: треки играют в порядке добавления"
+            )
+        
+        embed = discord.Embed(
+            title="⚖️ Честная очередь",
+            description=description,
+            color=discord.Color.blue()
+        )
+        
+        await interaction.response.send_message(embed=embed)
+    
     async def clear(self, interaction: discord.Interaction):
         """Команда очистки очереди"""
         # Проверяем канал
@@ -715,6 +1281,127 @@ class MusicCommands(BaseCommand):
         
         await interaction.response.send_message(embed=embed)
     
+    async def top(self, interaction: discord.Interaction, days: int = 7):
+        """Команда просмотра самых популярных треков и диджеев"""
+        # Проверяем канал
+        allowed, error_msg = self._check_channel_permission(interaction)
+        if not allowed:
+            await interaction.response.send_message(error_msg, ephemeral=True)
+            return
+        
+        guild_id = interaction.guild_id
+        days = max(1, min(days, 365))
+        
+        await interaction.response.defer()
+        
+        tracks = await self.history.top_tracks(guild_id, days=days)
+        users = await self.history.top_users(guild_id, days=days)
+        
+        embed = discord.Embed(
+            title=f"📊 Топ за {days} дн.",
+            color=discord.Color.blue()
+        )
+        
+        track_lines = [
+            f"`{i}.` [{(f'{t.artist} - {t.title}' if t.artist else t.title)[:60]}]({t.url}) — {t.plays}"
+            for i, t in enumerate(tracks, 1)
+        ]
+        embed.add_field(
+            name="Треки",
+            value="\n".join(track_lines) if track_lines else "Пока ничего не играло",
+            inline=False
+        )
+        
+        user_lines = [
+            f"`{i}.` <@{u.user_id}> — {u.plays} тр., {format_duration(u.seconds)}"
+            for i, u in enumerate(users, 1)
+        ]
+        embed.add_field(
+            name="Диджеи",
+            value="\n".join(user_lines) if user_lines else "Пока никто не заказывал треки",
+            inline=False
+        )
+        
+        await interaction.followup.send(embed=embed)
+    
+    async def stats(self, interaction: discord.Interaction, export: bool = False):
+        """Команда просмотра задержек музыкального плеера"""
+        level = self.permissions.get_user_permission_level(interaction.user)
+        if level < PermissionLevel.ADMIN:
+            await interaction.response.send_message(
+                "❌ Команда доступна только администраторам",
+                ephemeral=True
+            )
+            return
+        
+        if export:
+            governor = self.player.governor
+            data = {
+                'latency': self.player.metrics.export(),
+                'presence': {'sent': self.presence.sent, 'dropped': self.presence.dropped},
+                'upstreams': self.health.snapshot(),
+                'streams': {
+                    'recovered': self.player.streams_recovered,
+                    'failed': self.player.streams_failed
+                },
+                'ffmpeg': {
+                    'processes': governor.snapshot(),
+                    'refused': governor.refused,
+                    'reaped': governor.reaped
+                }
+            }
+            file = discord.File(
+                io.BytesIO(json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')),
+                filename='music_metrics.json'
+            )
+            await interaction.response.send_message(file=file, ephemeral=True)
+            return
+        
+        stages = self.player.metrics.stages()
+        lines = [
+            f"`{stage}` — {h.count} шт., p50 {h.percentile(50):.0f} мс, "
+            f"p95 {h.percentile(95):.0f} мс, макс {h.max_ms:.0f} мс"
+            for stage, h in stages.items()
+        ]
+        
+        embed = discord.Embed(
+            title="⏱️ Задержки музыкального плеера",
+            description="\n".join(lines) if lines else "Замеров пока нет",
+            color=discord.Color.blue()
+        )
+        embed.add_field(
+            name="Смена активности",
+            value=f"Отправлено: {self.presence.sent}, отброшено: {self.presence.dropped}",
+            inline=False
+        )
+        embed.add_field(
+            name="Внешние сервисы",
+            value="\n".join(
+                f"{UpstreamHealth.TITLES[name]}: {self.UPSTREAM_STATES[info['state']]}"
+                + (f" ещё {info['retry_after_s']:.0f} с" if info['retry_after_s'] else "")
+                + f", ошибок подряд: {info['failures']}, отказов: {info['rejected']}"
+                for name, info in self.health.snapshot().items()
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Обрывы потоков",
+            value=f"Восстановлено: {self.player.streams_recovered}, не удалось: {self.player.streams_failed}",
+            inline=False
+        )
+        governor = self.player.governor
+        embed.add_field(
+            name="FFmpeg",
+            value=(
+                f"Процессов: {governor.process_count}, CPU: {governor.cpu_percent:.0f}%, "
+                f"память: {governor.rss_bytes / 1024 / 1024:.0f} МБ\n"
+                f"Отказов: {governor.refused}, завершено брошенных: {governor.reaped}"
+            ),
+            inline=False
+        )
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    
     async def execute(self, interaction: discord.Interaction, **kwargs) -> None:
         """Абстрактный метод выполнения команды"""
         pass
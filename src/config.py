@@ -48,9 +48,50 @@ class Config:
         # Spotify API конфигурация
         self.SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID', '')
         self.SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET', '')
+        self.SPOTIFY_MATCH_CONCURRENCY = int(os.getenv('SPOTIFY_MATCH_CONCURRENCY', 4))
+        self.SPOTIFY_MATCH_TIMEOUT = float(os.getenv('SPOTIFY_MATCH_TIMEOUT', 15))
 
         # Настройки музыкального плеера
         self.MUSIC_INACTIVITY_TIMEOUT = int(os.getenv('MUSIC_INACTIVITY_TIMEOUT', 300))
         self.MUSIC_MAX_QUEUE_SIZE = int(os.getenv('MUSIC_MAX_QUEUE_SIZE', 100))
+        # Чередовать треки разных пользователей вместо общей очереди по порядку
+        self.MUSIC_FAIR_QUEUE = os.getenv('MUSIC_FAIR_QUEUE', 'false').lower() in ('1', 'true', 'yes')
         self.MUSIC_DEFAULT_VOLUME = int(os.getenv('MUSIC_DEFAULT_VOLUME', 50))
-        self.MUSIC_CHANNEL_ID = int(os.getenv('MUSIC_CHANNEL_ID', 0)) or None
\ No newline at end of file
+        self.MUSIC_CHANNEL_ID = int(os.getenv('MUSIC_CHANNEL_ID', 0)) or None
+        self.MUSIC_PREFETCH_DEPTH = int(os.getenv('MUSIC_PREFETCH_DEPTH', 2))
+
+        # Локальный кэш аудио (пустая директория - кэш отключен)
+        self.MUSIC_AUDIO_CACHE_DIR = os.getenv('MUSIC_AUDIO_CACHE_DIR', '')
+        self.MUSIC_AUDIO_CACHE_MAX_MB = int(os.getenv('MUSIC_AUDIO_CACHE_MAX_MB', 1024))
+        self.MUSIC_AUDIO_CACHE_MIN_PLAYS = int(os.getenv('MUSIC_AUDIO_CACHE_MIN_PLAYS', 3))
+
+        # Передача Opus в Discord без декодирования в PCM
+        self.MUSIC_OPUS_PASSTHROUGH = os.getenv('MUSIC_OPUS_PASSTHROUGH', 'true').lower() in ('1', 'true', 'yes')
+
+        # Бесшовные переходы между треками
+        self.MUSIC_GAPLESS = os.getenv('MUSIC_GAPLESS', 'true').lower() in ('1', 'true', 'yes')
+        self.MUSIC_GAPLESS_LEAD = float(os.getenv('MUSIC_GAPLESS_LEAD', 5.0))
+        self.MUSIC_CROSSFADE_MS = int(os.getenv('MUSIC_CROSSFADE_MS', 0))
+
+        # Одно сообщение "Сейчас играет" на сервер, которое обновляется при смене трека
+        self.MUSIC_NOW_PLAYING_PANEL = os.getenv('MUSIC_NOW_PLAYING_PANEL', 'true').lower() in ('1', 'true', 'yes')
+
+        # Ограничение процессов ffmpeg на все серверы (0 - без ограничения)
+        self.MUSIC_FFMPEG_MAX_PROCESSES = int(os.getenv('MUSIC_FFMPEG_MAX_PROCESSES', 8))
+        self.MUSIC_FFMPEG_MAX_CPU = float(os.getenv('MUSIC_FFMPEG_MAX_CPU', 0))
+        self.MUSIC_FFMPEG_MAX_RSS_MB = int(os.getenv('MUSIC_FFMPEG_MAX_RSS_MB', 0))
+        self.MUSIC_FFMPEG_WAIT = float(os.getenv('MUSIC_FFMPEG_WAIT', 10.0))
+
+        # Отключение запросов к YouTube/Spotify после серии ошибок подряд
+        self.MUSIC_UPSTREAM_FAILURES = int(os.getenv('MUSIC_UPSTREAM_FAILURES', 5))
+        self.MUSIC_UPSTREAM_MAX_BACKOFF = float(os.getenv('MUSIC_UPSTREAM_MAX_BACKOFF', 300.0))
+
+        # Минимальный интервал между сменами активности бота в секундах
+        self.MUSIC_PRESENCE_INTERVAL = float(os.getenv('MUSIC_PRESENCE_INTERVAL', 5.0))
+
+        # Сохранение очередей в БД и восстановление после перезапуска
+        self.MUSIC_PERSIST_QUEUES = os.getenv('MUSIC_PERSIST_QUEUES', 'true').lower() in ('1', 'true', 'yes')
+
+        # Извлечение yt-dlp: 'process' (пул процессов) или 'thread' (пул потоков)
+        self.MUSIC_EXTRACTOR_BACKEND = os.getenv('MUSIC_EXTRACTOR_BACKEND', 'process')
+        self.MUSIC_EXTRACTOR_WORKERS = int(os.getenv('MUSIC_EXTRACTOR_WORKERS', os.cpu_count() or 3))
\ No newline at end of file
@@ -1,6 +1,6 @@
 import aiosqlite
 import asyncio
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Any, Callable
 import logging
 
 # Настройка логирования
@@ -71,6 +71,110 @@ class DatabaseManager:
                         money INTEGER DEFAULT 0
                     )
                 ''')
+                # Соответствия треков Spotify видео на YouTube
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS spotify_matches (
+                        spotify_id TEXT PRIMARY KEY,
+                        isrc TEXT,
+                        video_id TEXT NOT NULL,
+                        title TEXT,
+                        duration INTEGER DEFAULT 0,
+                        confidence REAL DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                await conn.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_spotify_matches_isrc ON spotify_matches (isrc)'
+                )
+                # Сохраненное состояние музыкального плеера (восстанавливается после перезапуска)
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS music_sessions (
+                        guild_id INTEGER PRIMARY KEY,
+                        voice_channel_id INTEGER NOT NULL,
+                        text_channel_id INTEGER,
+                        owner_id INTEGER,
+                        loop_mode TEXT DEFAULT 'none',
+                        volume INTEGER DEFAULT 50,
+                        current_track TEXT,
+                        current_requester_id INTEGER,
+                        current_requester_name TEXT,
+                        position REAL DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS music_queue_items (
+                        guild_id INTEGER NOT NULL,
+                        seq INTEGER NOT NULL,
+                        track TEXT NOT NULL,
+                        requester_id INTEGER,
+                        requester_name TEXT,
+                        PRIMARY KEY (guild_id, seq)
+                    )
+                ''')
+                # История воспроизведения (только добавление)
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS music_play_history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        guild_id INTEGER NOT NULL,
+                        track_key TEXT NOT NULL,
+                        title TEXT,
+                        artist TEXT,
+                        url TEXT,
+                        duration INTEGER DEFAULT 0,
+                        requester_id INTEGER,
+                        played_at TIMESTAMP NOT NULL
+                    )
+                ''')
+                # Агрегаты истории по дням: запросы "топ за неделю" не читают всю историю
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS music_track_stats (
+                        guild_id INTEGER NOT NULL,
+                        day TEXT NOT NULL,
+                        track_key TEXT NOT NULL,
+                        title TEXT,
+                        artist TEXT,
+                        url TEXT,
+                        plays INTEGER DEFAULT 0,
+                        PRIMARY KEY (guild_id, day, track_key)
+                    )
+                ''')
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS music_user_stats (
+                        guild_id INTEGER NOT NULL,
+                        day TEXT NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        plays INTEGER DEFAULT 0,
+                        seconds INTEGER DEFAULT 0,
+                        PRIMARY KEY (guild_id, day, user_id)
+                    )
+                ''')
+                # Воспроизведенные треки для подсказок /play
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS music_track_index (
+                        key TEXT PRIMARY KEY,
+                        url TEXT NOT NULL,
+                        title TEXT,
+                        artist TEXT,
+                        plays INTEGER DEFAULT 0,
+                        last_played TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                # Переходы между треками для автовоспроизведения
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS music_track_transitions (
+                        guild_id INTEGER NOT NULL,
+                        prev_key TEXT NOT NULL,
+                        next_key TEXT NOT NULL,
+                        title TEXT,
+                        artist TEXT,
+                        url TEXT NOT NULL,
+                        duration INTEGER DEFAULT 0,
+                        source TEXT,
+                        weight INTEGER DEFAULT 0,
+                        PRIMARY KEY (guild_id, prev_key, next_key)
+                    )
+                ''')
                 await conn.commit()
                 logger.info(f"База данных инициализирована успешно: {self.db_path}")
         except Exception as e:
@@ -103,6 +207,52 @@ class DatabaseManager:
                 logger.error(f"Путь к БД: {self.db_path}")
                 return False
     
+    async def execute_batch(self, statements: List[Tuple[str, tuple]]) -> bool:
+        """Выполняет несколько SQL запросов в одной транзакции"""
+        async with self._lock:
+            try:
+                # Инициализируем БД при первом использовании
+                if not hasattr(self, '_initialized'):
+                    try:
+                        await self._init_database()
+                        self._initialized = True
+                    except Exception as e:
+                        logger.error(f"Критическая ошибка инициализации БД: {e}")
+                        return False
+                
+                async with aiosqlite.connect(self.db_path) as conn:
+                    for query, params in statements:
+                        await conn.execute(query, params)
+                    await conn.commit()
+                    return True
+            except Exception as e:
+                logger.error(f"Ошибка выполнения пакета запросов: {e}")
+                logger.error(f"Путь к БД: {self.db_path}")
+                return False
+    
+    async def execute_many(self, batches: List[Tuple[str, List[tuple]]]) -> bool:
+        """Выполняет запросы для наборов параметров (executemany) в одной транзакции"""
+        async with self._lock:
+            try:
+                # Инициализируем БД при первом использовании
+                if not hasattr(self, '_initialized'):
+                    try:
+                        await self._init_database()
+                        self._initialized = True
+                    except Exception as e:
+                        logger.error(f"Критическая ошибка инициализации БД: {e}")
+                        return False
+                
+                async with aiosqlite.connect(self.db_path) as conn:
+                    for query, params_list in batches:
+                        await conn.executemany(query, params_list)
+                    await conn.commit()
+                    return True
+            except Exception as e:
+                logger.error(f"Ошибка выполнения пакета запросов: {e}")
+                logger.error(f"Путь к БД: {self.db_path}")
+                return False
+    
     async def fetch_one(self, query: str, params: tuple = ()) -> Optional[tuple]:
         """Получает одну запись из БД"""
         async with self._lock:
@@ -145,6 +295,77 @@ class DatabaseManager:
                 logger.error(f"Путь к БД: {self.db_path}")
                 return []
 
+class BatchedWriter:
+    """
+    Отложенная пакетная запись в БД.
+    
+    Владелец добавляет записи в буфер pending и вызывает schedule().
+    Накопленные записи записываются одной транзакцией (execute_many) раз
+    в flush_interval секунд или сразу при накоплении batch_size записей,
+    поэтому код, который их добавляет, не ждет базу данных.
+    """
+    
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        build: Callable[[Any], List[Tuple[str, List[tuple]]]],
+        description: str,
+        buffer_factory: Callable[[], Any] = list,
+        flush_interval: float = 10.0,
+        batch_size: int = 100
+    ):
+        """
+        Args:
+            db_manager: DatabaseManager
+            build: Формирует пакеты запросов для execute_many из накопленных записей
+            description: Что записывается (для сообщения об ошибке)
+            buffer_factory: Создает пустой буфер (list или dict для объединения записей)
+            flush_interval: Максимальная задержка записи в секундах
+            batch_size: Количество записей, после которого запись выполняется сразу
+        """
+        self._db = db_manager
+        self._build = build
+        self._description = description
+        self._buffer_factory = buffer_factory
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        
+        self.pending = buffer_factory()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+    
+    def schedule(self):
+        """Планирует запись после добавления в буфер"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        if len(self.pending) >= self._batch_size:
+            self._cancel_flush()
+            asyncio.ensure_future(self.flush())
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                self._flush_interval,
+                lambda: asyncio.ensure_future(self.flush())
+            )
+    
+    def _cancel_flush(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+    
+    async def flush(self):
+        """Записывает накопленные записи"""
+        self._cancel_flush()
+        async with self._flush_lock:
+            pending, self.pending = self.pending, self._buffer_factory()
+            if not pending:
+                return
+            
+            if not await self._db.execute_many(self._build(pending)):
+                logger.error(f"Не удалось сохранить {self._description} ({len(pending)} записей)")
+
 class UserDatabase:
     """Класс для работы с пользователями в БД"""
     
@@ -7,6 +7,16 @@ from .models import Track, QueueItem
 from .queue import TrackQueue
 from .youtube import YouTubeExtractor
 from .spotify import SpotifyClient
+from .match_cache import SpotifyMatchCache
+from .audio_cache import AudioCache
+from .journal import QueueJournal
+from .presence import PresenceManager
+from .metrics import LatencyMetrics
+from .governor import FFmpegGovernor
+from .health import UpstreamHealth, UpstreamUnavailable
+from .suggestions import TrackIndex
+from .history import PlayHistory
+from .radio import CoOccurrenceIndex
 from .player import MusicPlayer
 from .permissions import PermissionChecker
 
@@ -16,6 +26,17 @@ __all__ = [
     'TrackQueue',
     'YouTubeExtractor',
     'SpotifyClient',
+    'SpotifyMatchCache',
+    'AudioCache',
+    'QueueJournal',
+    'PresenceManager',
+    'LatencyMetrics',
+    'FFmpegGovernor',
+    'UpstreamHealth',
+    'UpstreamUnavailable',
+    'TrackIndex',
+    'PlayHistory',
+    'CoOccurrenceIndex',
     'MusicPlayer',
     'PermissionChecker'
 ]
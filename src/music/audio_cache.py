@@ -0,0 +1,235 @@
+"""
+Локальный кэш аудио (Ogg/Opus) для часто воспроизводимых треков.
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Optional, Dict, Set
+
+from .models import Track
+from .youtube import YouTubeExtractor
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCache:
+    """
+    Кэш аудио на диске.
+
+    Треки, воспроизведенные не меньше play_threshold раз, скачиваются в
+    фоне и сохраняются в формате Ogg/Opus. Размер кэша ограничен max_bytes,
+    при превышении удаляются давно не воспроизводившиеся файлы (LRU).
+    Файлы пишутся во временный файл и атомарно переименовываются, поэтому
+    в кэше никогда не бывает недокачанных треков.
+    """
+
+    FILE_EXTENSION = '.opus'
+    TEMP_EXTENSION = '.part'
+
+    # Максимальное число отслеживаемых счетчиков воспроизведений
+    PLAY_COUNTS_LIMIT = 10000
+
+    def __init__(
+        self,
+        cache_dir: str,
+        youtube_extractor: YouTubeExtractor,
+        max_bytes: int = 1024 * 1024 * 1024,
+        play_threshold: int = 3,
+        download_timeout: float = 600.0
+    ):
+        """
+        Инициализация кэша.
+
+        Args:
+            cache_dir: Директория для файлов кэша
+            youtube_extractor: Экземпляр YouTubeExtractor
+            max_bytes: Максимальный размер кэша в байтах
+            play_threshold: Количество воспроизведений для попадания в кэш
+            download_timeout: Таймаут скачивания одного трека в секундах
+        """
+        self._dir = os.path.abspath(cache_dir)
+        self._youtube = youtube_extractor
+        self._max_bytes = max_bytes
+        self._play_threshold = max(1, play_threshold)
+        self._download_timeout = download_timeout
+
+        # video_id -> размер файла, от давно использованных к недавним
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        self._play_counts: Dict[str, int] = {}
+
+        self._downloads: asyncio.Queue = asyncio.Queue()
+        self._queued: Set[str] = set()
+        self._worker: Optional[asyncio.Task] = None
+
+        self._load()
+
+    def _load(self):
+        """Загружает содержимое директории кэша"""
+        os.makedirs(self._dir, exist_ok=True)
+
+        files = []
+        for name in os.listdir(self._dir):
+            path = os.path.join(self._dir, name)
+            if name.endswith(self.TEMP_EXTENSION):
+                # Остатки прерванных скачиваний
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            elif name.endswith(self.FILE_EXTENSION):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name[:-len(self.FILE_EXTENSION)], stat.st_size))
+
+        for _, video_id, size in sorted(files):
+            self._entries[video_id] = size
+            self._total_bytes += size
+
+        logger.info(
+            f"Аудио кэш: {len(self._entries)} треков, "
+            f"{self._total_bytes / 1024 / 1024:.1f} МБ"
+        )
+        self._evict()
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self._dir, video_id + self.FILE_EXTENSION)
+
+    def get_path(self, track: Track) -> Optional[str]:
+        """
+        Возвращает путь к локальному файлу трека.
+
+        Args:
+            track: Track объект
+
+        Returns:
+            Путь к файлу или None, если трека нет в кэше
+        """
+        video_id = self._youtube.get_video_id(track.url)
+        if not video_id or video_id not in self._entries:
+            return None
+
+        path = self._path(video_id)
+        if not os.path.exists(path):
+            self._total_bytes -= self._entries.pop(video_id)
+            return None
+
+        self._entries.move_to_end(video_id)
+        try:
+            # Время изменения сохраняет порядок LRU между перезапусками
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def record_play(self, track: Track):
+        """
+        Учитывает воспроизведение трека и ставит его на скачивание
+        при достижении порога.
+
+        Args:
+            track: Воспроизводимый трек
+        """
+        video_id = self._youtube.get_video_id(track.url)
+        if not video_id or video_id in self._entries or video_id in self._queued:
+            return
+
+        count = self._play_counts.get(video_id, 0) + 1
+        self._play_counts[video_id] = count
+
+        if len(self._play_counts) > self.PLAY_COUNTS_LIMIT:
+            # Забываем треки, сыгранные один раз
+            self._play_counts = {k: v for k, v in self._play_counts.items() if v > 1}
+
+        if count >= self._play_threshold:
+            self._queued.add(video_id)
+            self._downloads.put_nowait((video_id, track))
+            self._ensure_worker()
+
+    def _ensure_worker(self):
+        """Запускает фоновое скачивание, если оно не запущено"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._download_loop())
+
+    async def _download_loop(self):
+        """Скачивает треки из очереди по одному"""
+        while True:
+            video_id, track = await self._downloads.get()
+            try:
+                await self._download(video_id, track)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка кэширования трека {track.title}: {e}")
+            finally:
+                self._queued.discard(video_id)
+                self._play_counts.pop(video_id, None)
+
+    async def _download(self, video_id: str, track: Track):
+        """Скачивает и перекодирует трек в Ogg/Opus"""
+        stream_url = await self._youtube.get_stream_url(track)
+        if not stream_url:
+            return
+
+        final_path = self._path(video_id)
+        temp_path = final_path + self.TEMP_EXTENSION
+
+        # Opus из WebM достаточно переупаковать в Ogg
+        if track.stream_codec == 'opus':
+            codec_args = ('-c:a', 'copy')
+        else:
+            codec_args = ('-c:a', 'libopus', '-b:a', '128k')
+
+        process = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+            '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+            '-i', stream_url,
+            '-vn', *codec_args, '-f', 'ogg',
+            temp_path,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), self._download_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            self._remove(temp_path)
+            raise
+
+        if process.returncode != 0:
+            logger.error(f"ffmpeg не смог закэшировать {track.title}: {stderr.decode(errors='ignore')[-300:]}")
+            self._remove(temp_path)
+            return
+
+        os.replace(temp_path, final_path)
+
+        size = os.path.getsize(final_path)
+        self._entries[video_id] = size
+        self._total_bytes += size
+        logger.info(f"Трек сохранен в аудио кэш: {track.title} ({size / 1024 / 1024:.1f} МБ)")
+
+        self._evict()
+
+    def _evict(self):
+        """Удаляет давно не использованные файлы при превышении размера"""
+        while self._total_bytes > self._max_bytes and self._entries:
+            video_id, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._remove(self._path(video_id))
+            logger.debug(f"Трек удален из аудио кэша: {video_id}")
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stop(self):
+        """Останавливает фоновое скачивание"""
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
@@ -0,0 +1,323 @@
+"""
+Движки извлечения информации о видео через yt-dlp.
+
+Объект YoutubeDL не рассчитан на одновременное использование из нескольких
+потоков, а большая часть его работы (JSON, регулярные выражения) держит GIL.
+Поэтому каждый рабочий процесс или поток владеет собственными экземплярами
+YoutubeDL, а наружу возвращаются только обычные словари.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import sys
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, Tuple
+
+import yt_dlp
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+
+logger = logging.getLogger(__name__)
+
+# Признаки ограничения запросов в тексте ошибки, когда исключения нет
+_THROTTLE_MARKERS = ('HTTP Error 429', 'Too Many Requests', 'not a bot', 'rate-limit')
+
+
+class ExtractionFailed(Exception):
+    """yt-dlp не смог извлечь данные"""
+
+    def __init__(self, message: str, upstream: bool):
+        super().__init__(message)
+        # Сбой YouTube или сети, а не ошибка конкретного видео
+        self.upstream = upstream
+
+
+def is_upstream_error(error: Optional[BaseException], message: str = '') -> bool:
+    """
+    Отличает сбой сервиса от ошибки конкретного видео.
+
+    Сбой - ограничение запросов (429), ошибка сервера (5xx), сеть или
+    таймаут. Удаленное, приватное или недоступное в регионе видео - ответ
+    сервиса, а не сбой.
+
+    Args:
+        error: Исключение yt-dlp (проверяется вся цепочка причин)
+        message: Текст ошибки
+
+    Returns:
+        True если ошибка говорит о недоступности сервиса
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, HTTPError):
+            return error.status == 429 or error.status >= 500
+        if isinstance(error, (TransportError, OSError)):
+            return True
+        error = getattr(error, 'cause', None) or error.__cause__ or error.__context__
+    return any(marker in message for marker in _THROTTLE_MARKERS)
+
+
+class _ErrorLog:
+    """
+    Логгер yt-dlp, запоминающий первую ошибку извлечения.
+
+    С ignoreerrors yt-dlp не бросает исключение, а только сообщает об
+    ошибке; исключение доступно через sys.exc_info() в момент сообщения.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.message: Optional[str] = None
+        self.upstream = False
+
+    def debug(self, message: str):
+        pass
+
+    def info(self, message: str):
+        pass
+
+    def warning(self, message: str):
+        pass
+
+    def error(self, message: str):
+        if self.message is None and 'ERROR' in message:
+            self.message = message
+            self.upstream = is_upstream_error(sys.exc_info()[1], message)
+
+
+def _options_key(options: Dict[str, Any]) -> str:
+    """Формирует ключ набора настроек yt-dlp"""
+    return repr(sorted(options.items()))
+
+
+def _create_ytdl(options: Dict[str, Any]) -> Tuple[yt_dlp.YoutubeDL, _ErrorLog]:
+    """Создает экземпляр YoutubeDL с логгером ошибок"""
+    errors = _ErrorLog()
+    return yt_dlp.YoutubeDL({**options, 'logger': errors}), errors
+
+
+def _run_extraction(
+    ytdl: yt_dlp.YoutubeDL,
+    errors: _ErrorLog,
+    url: str
+) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+    """
+    Извлекает информацию экземпляром YoutubeDL.
+
+    Returns:
+        Кортеж (данные yt-dlp или None, текст ошибки или None, сбой сервиса)
+    """
+    errors.reset()
+    try:
+        data = ytdl.extract_info(url, download=False)
+    except Exception as e:
+        return None, str(e), is_upstream_error(e, str(e))
+    if data:
+        return data, None, False
+    return None, errors.message, errors.upstream
+
+
+# Экземпляры YoutubeDL рабочего процесса, по одному на набор настроек
+_process_ytdl: Dict[str, Tuple[yt_dlp.YoutubeDL, _ErrorLog]] = {}
+
+
+def _extract_in_process(
+    url: str,
+    options: Dict[str, Any]
+) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+    """
+    Извлекает информацию в рабочем процессе.
+
+    Returns:
+        Кортеж (данные yt-dlp или None, текст ошибки или None, сбой сервиса)
+    """
+    key = _options_key(options)
+    instance = _process_ytdl.get(key)
+    if instance is None:
+        instance = _process_ytdl[key] = _create_ytdl(options)
+
+    ytdl, errors = instance
+    data, error, upstream = _run_extraction(ytdl, errors, url)
+    # Только сериализуемые данные: результат передается в основной процесс
+    return (ytdl.sanitize_info(data) if data else None), error, upstream
+
+
+def _raise_failure(error: str, upstream: bool):
+    """Сообщает об ошибке извлечения"""
+    if upstream:
+        logger.error(f"Ошибка yt-dlp: {error}")
+    else:
+        logger.warning(f"Ошибка yt-dlp: {error}")
+    raise ExtractionFailed(error, upstream)
+
+
+class ExtractionBackend(ABC):
+    """Базовый класс движка извлечения"""
+
+    def __init__(self, default_options: Dict[str, Any], max_workers: int):
+        self._default_options = default_options
+        self._max_workers = max_workers
+
+    @abstractmethod
+    async def extract(
+        self,
+        url: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Извлекает информацию о видео, плейлисте или результатах поиска.
+
+        Args:
+            url: URL или запрос для yt-dlp
+            options: Настройки yt-dlp (по умолчанию - настройки движка)
+
+        Returns:
+            Данные yt-dlp или None, если данных нет
+
+        Raises:
+            ExtractionFailed: yt-dlp сообщил об ошибке
+        """
+
+    @abstractmethod
+    def shutdown(self):
+        """Освобождает ресурсы движка"""
+
+
+class ThreadExtractionBackend(ExtractionBackend):
+    """Извлечение в пуле потоков, у каждого потока свои экземпляры YoutubeDL"""
+
+    def __init__(self, default_options: Dict[str, Any], max_workers: int = 3):
+        super().__init__(default_options, max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='ytdl'
+        )
+        self._local = threading.local()
+
+    async def extract(
+        self,
+        url: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_event_loop()
+        data, error, upstream = await loop.run_in_executor(
+            self._executor,
+            self._extract_sync,
+            url,
+            options or self._default_options
+        )
+        if error:
+            _raise_failure(error, upstream)
+        return data
+
+    def _extract_sync(
+        self,
+        url: str,
+        options: Dict[str, Any]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+        """Синхронное извлечение информации в потоке пула"""
+        instances = getattr(self._local, 'instances', None)
+        if instances is None:
+            instances = self._local.instances = {}
+
+        key = _options_key(options)
+        instance = instances.get(key)
+        if instance is None:
+            instance = instances[key] = _create_ytdl(options)
+
+        return _run_extraction(*instance, url)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class ProcessExtractionBackend(ExtractionBackend):
+    """
+    Извлечение в пуле процессов.
+
+    Каждый рабочий процесс создает собственные экземпляры YoutubeDL, поэтому
+    извлечение не конкурирует за GIL с event loop и аудио потоками. Если пул
+    процессов недоступен или сломался, работа продолжается в пуле потоков.
+    """
+
+    def __init__(self, default_options: Dict[str, Any], max_workers: int = 3):
+        super().__init__(default_options, max_workers)
+        self._fallback: Optional[ThreadExtractionBackend] = None
+        try:
+            # spawn: дочерние процессы не наследуют потоки и event loop бота
+            self._executor: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        except Exception as e:
+            logger.error(f"Не удалось создать пул процессов yt-dlp: {e}")
+            self._executor = None
+            self._switch_to_fallback()
+
+    async def extract(
+        self,
+        url: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        if self._executor is None:
+            return await self._fallback.extract(url, options)
+
+        loop = asyncio.get_event_loop()
+        try:
+            data, error, upstream = await loop.run_in_executor(
+                self._executor,
+                _extract_in_process,
+                url,
+                options or self._default_options
+            )
+        except BrokenProcessPool:
+            logger.error("Пул процессов yt-dlp сломан, переключение на пул потоков")
+            self._switch_to_fallback()
+            return await self._fallback.extract(url, options)
+
+        if error:
+            _raise_failure(error, upstream)
+        return data
+
+    def _switch_to_fallback(self):
+        """Переключает движок на пул потоков"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._fallback is None:
+            self._fallback = ThreadExtractionBackend(self._default_options, self._max_workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._fallback is not None:
+            self._fallback.shutdown()
+
+
+def create_extraction_backend(
+    kind: str,
+    default_options: Dict[str, Any],
+    max_workers: int = 3
+) -> ExtractionBackend:
+    """
+    Создает движок извлечения.
+
+    Args:
+        kind: 'process' или 'thread'
+        default_options: Настройки yt-dlp по умолчанию
+        max_workers: Количество рабочих процессов или потоков
+
+    Returns:
+        Экземпляр ExtractionBackend
+    """
+    if kind == 'process':
+        return ProcessExtractionBackend(default_options, max_workers)
+    if kind != 'thread':
+        logger.warning(f"Неизвестный движок извлечения '{kind}', используется 'thread'")
+    return ThreadExtractionBackend(default_options, max_workers)
@@ -0,0 +1,299 @@
+"""
+Общее ограничение процессов ffmpeg для всех серверов.
+"""
+
+import asyncio
+import logging
+import subprocess
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Optional, Dict, List
+
+import discord
+
+try:
+    import psutil
+except ImportError:  # без psutil работает только ограничение числа процессов
+    psutil = None
+
+from .source import find_ffmpeg_process
+
+logger = logging.getLogger(__name__)
+
+
+class StreamLimitExceeded(Exception):
+    """Нет свободных ресурсов для нового потока"""
+
+
+@dataclass
+class _FFmpegProcess:
+    """Процесс ffmpeg, запущенный для источника"""
+    guild_id: int
+    process: subprocess.Popen
+    source: weakref.ref
+    started_at: float
+    cpu_percent: float = 0.0
+    rss_bytes: int = 0
+    # psutil.Process для замера CPU (None без psutil)
+    stats: Optional[object] = None
+    # Процессу отправлен kill, код возврата еще не получен
+    killed: bool = False
+
+
+class FFmpegGovernor:
+    """
+    Ограничивает число одновременных процессов ffmpeg.
+
+    Перед созданием источника плеер вызывает acquire(): если процессов уже
+    max_processes или суммарные CPU/RSS процессов превышают бюджет, новый
+    поток ждет освобождения до wait_timeout секунд, а затем получает отказ
+    (StreamLimitExceeded). Разрешение сразу резервирует место, поэтому
+    одновременно запускаемые потоки не превышают лимит; резерв переходит
+    в процесс в register() или снимается release(), если запуск не удался.
+    Процесс сервера, который уже играет (переход на следующий трек,
+    перемотка), считается заменяемым и в лимит нового потока не входит:
+    иначе при полной загрузке текущие потоки не смогли бы переключить трек.
+
+    Фоновая проверка раз в check_interval секунд снимает CPU и RSS
+    процессов, забирает код возврата завершившихся (зомби) и завершает
+    процессы, чей источник уже удален без cleanup() - например, после
+    ошибки vc.play().
+    """
+
+    def __init__(
+        self,
+        max_processes: int = 8,
+        max_cpu_percent: float = 0.0,
+        max_rss_mb: int = 0,
+        wait_timeout: float = 10.0,
+        check_interval: float = 5.0
+    ):
+        """
+        Инициализация ограничителя.
+
+        Args:
+            max_processes: Максимум одновременных процессов (0 - без ограничения)
+            max_cpu_percent: Бюджет CPU всех процессов в процентах одного ядра (0 - без ограничения)
+            max_rss_mb: Бюджет памяти всех процессов в МБ (0 - без ограничения)
+            wait_timeout: Сколько секунд новый поток ждет освобождения ресурсов
+            check_interval: Интервал проверки процессов в секундах
+        """
+        self._max_processes = max_processes
+        self._max_cpu_percent = max_cpu_percent
+        self._max_rss_bytes = max_rss_mb * 1024 * 1024
+        self._wait_timeout = wait_timeout
+        self._check_interval = check_interval
+
+        if psutil is None and (max_cpu_percent or max_rss_mb):
+            logger.warning("psutil не установлен, бюджет CPU и памяти ffmpeg не проверяется")
+
+        # pid -> процесс
+        self._processes: Dict[int, _FFmpegProcess] = {}
+        # guild_id -> разрешенные, но еще не запущенные процессы
+        self._pending: Dict[int, int] = {}
+        self._released = asyncio.Event()
+        self._monitor: Optional[asyncio.Task] = None
+
+        self.refused = 0
+        self.reaped = 0
+
+    @property
+    def process_count(self) -> int:
+        return len(self._processes)
+
+    @property
+    def cpu_percent(self) -> float:
+        """Суммарная загрузка CPU процессами ffmpeg"""
+        return sum(entry.cpu_percent for entry in self._processes.values())
+
+    @property
+    def rss_bytes(self) -> int:
+        """Суммарная память процессов ffmpeg"""
+        return sum(entry.rss_bytes for entry in self._processes.values())
+
+    def _replaced(self, guild_id: int) -> Optional[_FFmpegProcess]:
+        """Процесс сервера, который заменит новый поток (самый старый)"""
+        if self._pending.get(guild_id):
+            # Замену уже получил другой запуск этого сервера
+            return None
+        entries = [entry for entry in self._processes.values() if entry.guild_id == guild_id]
+        return min(entries, key=lambda entry: entry.started_at) if entries else None
+
+    def _over_budget(self, guild_id: int) -> bool:
+        """Превышен ли лимит процессов или бюджет ресурсов для нового потока сервера"""
+        replaced = self._replaced(guild_id)
+        entries = [entry for entry in self._processes.values() if entry is not replaced]
+
+        count = len(entries) + sum(self._pending.values())
+        if self._max_processes and count >= self._max_processes:
+            return True
+        if self._max_cpu_percent and sum(entry.cpu_percent for entry in entries) >= self._max_cpu_percent:
+            return True
+        if self._max_rss_bytes and sum(entry.rss_bytes for entry in entries) >= self._max_rss_bytes:
+            return True
+        return False
+
+    async def acquire(self, guild_id: int):
+        """
+        Ждет возможности запустить новый процесс ffmpeg и резервирует его.
+
+        После успешного вызова нужно вызвать register() или release().
+
+        Args:
+            guild_id: ID сервера
+
+        Raises:
+            StreamLimitExceeded: Ресурсы не освободились за wait_timeout
+        """
+        self._reap()
+        if not self._over_budget(guild_id):
+            self._reserve(guild_id)
+            return
+
+        logger.info(f"Поток сервера {guild_id} ожидает свободный процесс ffmpeg")
+        deadline = time.monotonic() + self._wait_timeout
+        while self._over_budget(guild_id):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.refused += 1
+                raise StreamLimitExceeded(
+                    "Бот сейчас воспроизводит слишком много потоков, попробуйте позже"
+                )
+
+            self._released.clear()
+            try:
+                # Завершившиеся процессы проверяем не реже интервала проверки
+                await asyncio.wait_for(
+                    self._released.wait(),
+                    min(remaining, self._check_interval)
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._reap()
+
+        self._reserve(guild_id)
+
+    def _reserve(self, guild_id: int):
+        self._pending[guild_id] = self._pending.get(guild_id, 0) + 1
+        # Процессы проверяются, пока есть резерв: иначе ожидающие потоки
+        # не узнают о завершившихся процессах
+        self._ensure_monitor()
+
+    def release(self, guild_id: int):
+        """
+        Снимает резерв, полученный acquire(), если процесс не запущен.
+
+        Args:
+            guild_id: ID сервера
+        """
+        count = self._pending.get(guild_id, 0) - 1
+        if count > 0:
+            self._pending[guild_id] = count
+        else:
+            self._pending.pop(guild_id, None)
+        self._released.set()
+
+    def register(self, guild_id: int, source: discord.AudioSource):
+        """
+        Учитывает процесс ffmpeg созданного источника вместо резерва.
+
+        Args:
+            guild_id: ID сервера
+            source: Созданный источник
+        """
+        self.release(guild_id)
+
+        process = find_ffmpeg_process(source)
+        if process is None:
+            return
+
+        stats = None
+        if psutil is not None:
+            try:
+                stats = psutil.Process(process.pid)
+                # Первый вызов только запоминает начальное время CPU
+                stats.cpu_percent(None)
+            except psutil.Error:
+                stats = None
+
+        self._processes[process.pid] = _FFmpegProcess(
+            guild_id=guild_id,
+            process=process,
+            source=weakref.ref(source),
+            started_at=time.monotonic(),
+            stats=stats
+        )
+        self._ensure_monitor()
+
+    def _reap(self) -> int:
+        """
+        Убирает завершившиеся процессы и процессы без источника.
+
+        Returns:
+            Количество убранных процессов
+        """
+        removed = 0
+        for pid, entry in list(self._processes.items()):
+            if entry.process.poll() is None:
+                if entry.source() is None and not entry.killed:
+                    # Источник удален без cleanup() - процесс больше никто не читает
+                    logger.warning(f"Завершение брошенного процесса ffmpeg {pid} (сервер {entry.guild_id})")
+                    entry.process.kill()
+                    entry.killed = True
+                    self.reaped += 1
+                # Код возврата забирается следующей проверкой, без ожидания в event loop
+                continue
+
+            del self._processes[pid]
+            removed += 1
+
+        if removed:
+            self._released.set()
+        return removed
+
+    def _sample(self):
+        """Снимает CPU и память процессов"""
+        if psutil is None:
+            return
+        for entry in self._processes.values():
+            if entry.stats is None:
+                continue
+            try:
+                entry.cpu_percent = entry.stats.cpu_percent(None)
+                entry.rss_bytes = entry.stats.memory_info().rss
+            except psutil.Error:
+                entry.cpu_percent = 0.0
+                entry.rss_bytes = 0
+
+    def _ensure_monitor(self):
+        """Запускает фоновую проверку процессов"""
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.ensure_future(self._monitor_loop())
+
+    async def _monitor_loop(self):
+        """Проверяет процессы, пока они есть"""
+        while self._processes or self._pending:
+            await asyncio.sleep(self._check_interval)
+            self._reap()
+            self._sample()
+
+    def snapshot(self) -> List[dict]:
+        """Возвращает сведения о текущих процессах"""
+        now = time.monotonic()
+        return [
+            {
+                'pid': pid,
+                'guild_id': entry.guild_id,
+                'age_s': round(now - entry.started_at, 1),
+                'cpu_percent': round(entry.cpu_percent, 1),
+                'rss_mb': round(entry.rss_bytes / 1024 / 1024, 1)
+            }
+            for pid, entry in self._processes.items()
+        ]
+
+    def stop(self):
+        """Останавливает фоновую проверку"""
+        if self._monitor:
+            self._monitor.cancel()
+            self._monitor = None
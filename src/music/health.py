@@ -0,0 +1,177 @@
+"""
+Состояние внешних сервисов (YouTube, Spotify) и автоматическое отключение
+запросов к недоступному сервису.
+"""
+
+import logging
+import math
+import random
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """Сервис временно отключен после серии ошибок"""
+
+    def __init__(self, title: str, retry_after: float):
+        self.title = title
+        self.retry_after = retry_after
+        super().__init__(
+            f"{title} временно недоступен, попробуйте через {max(1, math.ceil(retry_after))} с"
+        )
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель запросов к одному сервису.
+
+    После failure_threshold ошибок подряд запросы не выполняются, а сразу
+    получают UpstreamUnavailable. Через паузу один запрос пропускается как
+    проверочный: успех возвращает сервис в работу, ошибка снова отключает
+    его с вдвое большей паузой (не больше max_delay). К паузе добавляется
+    случайный разброс jitter, чтобы проверки не совпадали по времени.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        title: str,
+        failure_threshold: int = 5,
+        base_delay: float = 5.0,
+        max_delay: float = 300.0,
+        jitter: float = 0.2
+    ):
+        """
+        Инициализация выключателя.
+
+        Args:
+            title: Название сервиса для сообщений
+            failure_threshold: Количество ошибок подряд до отключения
+            base_delay: Первая пауза в секундах
+            max_delay: Максимальная пауза в секундах
+            jitter: Доля случайного разброса паузы
+        """
+        self.title = title
+        self._failure_threshold = max(1, failure_threshold)
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._jitter = jitter
+
+        self._failures = 0
+        # Сколько раз подряд сервис отключался (для роста паузы)
+        self._trips = 0
+        self._open_until = 0.0
+        # Пропущен проверочный запрос, результата еще нет
+        self._probing = False
+
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._failures < self._failure_threshold:
+            return self.CLOSED
+        if time.monotonic() < self._open_until:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def _delay(self) -> float:
+        delay = min(self._max_delay, self._base_delay * 2 ** self._trips)
+        return delay * random.uniform(1 - self._jitter, 1 + self._jitter)
+
+    def check(self):
+        """
+        Проверяет, можно ли выполнить запрос.
+
+        Raises:
+            UpstreamUnavailable: Сервис отключен
+        """
+        if self._failures < self._failure_threshold:
+            return
+
+        now = time.monotonic()
+        if now < self._open_until:
+            self.rejected += 1
+            raise UpstreamUnavailable(self.title, self._open_until - now)
+
+        # Проверочный запрос: остальные ждут его результата до конца новой паузы.
+        # Если запрос отменят, сервис просто проверится позже
+        self._open_until = now + self._delay()
+        self._probing = True
+        logger.info(f"{self.title}: проверочный запрос")
+
+    def record_success(self):
+        """Учитывает успешный запрос"""
+        if self._failures >= self._failure_threshold:
+            logger.info(f"{self.title}: сервис снова доступен")
+        self._failures = 0
+        self._trips = 0
+        self._probing = False
+
+    def record_failure(self):
+        """Учитывает ошибку запроса"""
+        self._failures += 1
+        if self._failures < self._failure_threshold:
+            return
+
+        tripped = self._failures > self._failure_threshold
+        if tripped and not self._probing and time.monotonic() < self._open_until:
+            # Запрос начался до отключения: пауза не продлевается
+            return
+
+        self._probing = False
+        delay = self._delay()
+        self._open_until = time.monotonic() + delay
+        self._trips += 1
+        logger.warning(
+            f"{self.title}: ошибок подряд - {self._failures}, запросы отключены на {delay:.0f} с"
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            'state': self.state,
+            'failures': self._failures,
+            'retry_after_s': round(max(0.0, self._open_until - time.monotonic()), 1)
+            if self.state == self.OPEN else 0.0,
+            'rejected': self.rejected
+        }
+
+
+class UpstreamHealth:
+    """Выключатели всех внешних сервисов плеера"""
+
+    YOUTUBE = 'youtube'
+    YOUTUBE_SEARCH = 'youtube_search'
+    SPOTIFY = 'spotify'
+
+    TITLES = {
+        YOUTUBE: 'YouTube',
+        YOUTUBE_SEARCH: 'Поиск YouTube',
+        SPOTIFY: 'Spotify',
+    }
+
+    def __init__(self, failure_threshold: int = 5, base_delay: float = 5.0, max_delay: float = 300.0):
+        """
+        Инициализация.
+
+        Args:
+            failure_threshold: Количество ошибок подряд до отключения сервиса
+            base_delay: Первая пауза отключения в секундах
+            max_delay: Максимальная пауза отключения в секундах
+        """
+        self._breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(title, failure_threshold, base_delay, max_delay)
+            for name, title in self.TITLES.items()
+        }
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        """Возвращает выключатель сервиса"""
+        return self._breakers[name]
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Возвращает состояние всех сервисов"""
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
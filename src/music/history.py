@@ -0,0 +1,183 @@
+"""
+История воспроизведения и статистика треков.
+"""
+
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Tuple
+
+from ..database import BatchedWriter
+from .models import QueueItem
+from .youtube import YouTubeExtractor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TrackStats:
+    """Статистика трека за период"""
+    title: str
+    artist: Optional[str]
+    url: str
+    plays: int
+
+
+@dataclass
+class UserStats:
+    """Статистика пользователя за период"""
+    user_id: int
+    plays: int
+    seconds: int
+
+
+class PlayHistory:
+    """
+    История воспроизведения.
+
+    Каждое воспроизведение добавляется в music_play_history, а счетчики
+    по дням в music_track_stats и music_user_stats увеличиваются. Запросы
+    статистики за период читают только дневные счетчики.
+
+    Записи копятся в памяти и записываются в БД одной транзакцией раз в
+    flush_interval секунд или при накоплении batch_size записей, поэтому
+    старт трека не ждет базу данных.
+    """
+
+    def __init__(self, db_manager, flush_interval: float = 10.0, batch_size: int = 100):
+        """
+        Инициализация истории.
+
+        Args:
+            db_manager: DatabaseManager
+            flush_interval: Максимальная задержка записи в секундах
+            batch_size: Количество записей, после которого запись выполняется сразу
+        """
+        self._db = db_manager
+        # Буфер: (guild_id, ключ трека, название, исполнитель, URL, длительность,
+        # ID заказавшего, время)
+        self._writer = BatchedWriter(
+            db_manager,
+            self._build_batches,
+            "историю воспроизведения",
+            flush_interval=flush_interval,
+            batch_size=batch_size
+        )
+
+    @staticmethod
+    def _key(item: QueueItem) -> str:
+        return YouTubeExtractor.get_video_id(item.track.url) or item.track.url
+
+    def record(self, guild_id: int, item: QueueItem):
+        """
+        Добавляет воспроизведение в историю.
+
+        Args:
+            guild_id: ID сервера
+            item: Воспроизведенный элемент очереди
+        """
+        track = item.track
+        self._writer.pending.append((
+            guild_id, self._key(item), track.title, track.artist, track.url,
+            track.duration, item.requester_id, datetime.now(timezone.utc)
+        ))
+        self._writer.schedule()
+
+    async def flush(self):
+        """Записывает накопленную историю и обновляет счетчики"""
+        await self._writer.flush()
+
+    @staticmethod
+    def _build_batches(rows: List[Tuple]) -> List[Tuple[str, List[tuple]]]:
+        """Запросы записи истории и дневных счетчиков"""
+        track_plays: Counter = Counter()
+        track_meta = {}
+        user_plays: Counter = Counter()
+        user_seconds: Counter = Counter()
+        for guild_id, key, title, artist, url, duration, requester_id, played_at in rows:
+            day = played_at.date().isoformat()
+            track_plays[(guild_id, day, key)] += 1
+            # Последние метаданные трека
+            track_meta[(guild_id, day, key)] = (title, artist, url)
+            if requester_id:
+                user_plays[(guild_id, day, requester_id)] += 1
+                user_seconds[(guild_id, day, requester_id)] += duration or 0
+
+        return [
+            (
+                "INSERT INTO `music_play_history` "
+                "(guild_id, track_key, title, artist, url, duration, requester_id, played_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [row[:7] + (row[7].strftime('%Y-%m-%d %H:%M:%S'),) for row in rows]
+            ),
+            (
+                "INSERT INTO `music_track_stats` (guild_id, day, track_key, title, artist, url, plays) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(guild_id, day, track_key) DO UPDATE SET "
+                "title = excluded.title, artist = excluded.artist, url = excluded.url, "
+                "plays = music_track_stats.plays + excluded.plays",
+                [key + track_meta[key] + (plays,) for key, plays in track_plays.items()]
+            ),
+            (
+                "INSERT INTO `music_user_stats` (guild_id, day, user_id, plays, seconds) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(guild_id, day, user_id) DO UPDATE SET "
+                "plays = music_user_stats.plays + excluded.plays, "
+                "seconds = music_user_stats.seconds + excluded.seconds",
+                [key + (plays, user_seconds[key]) for key, plays in user_plays.items()]
+            ),
+        ]
+
+    @staticmethod
+    def _since(days: int) -> str:
+        """Первый день периода из days последних дней (включая сегодня)"""
+        return (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+
+    async def top_tracks(self, guild_id: int, days: int = 7, limit: int = 10) -> List[TrackStats]:
+        """
+        Самые воспроизводимые треки сервера за период.
+
+        Args:
+            guild_id: ID сервера
+            days: Количество последних дней
+            limit: Максимальное количество треков
+
+        Returns:
+            Список TrackStats
+        """
+        await self.flush()
+        rows = await self._db.fetch_all(
+            "SELECT MAX(title), MAX(artist), MAX(url), SUM(plays) AS total "
+            "FROM `music_track_stats` WHERE `guild_id` = ? AND `day` >= ? "
+            "GROUP BY `track_key` ORDER BY total DESC LIMIT ?",
+            (guild_id, self._since(days), limit)
+        )
+        return [
+            TrackStats(title=title or '', artist=artist, url=url or '', plays=plays)
+            for title, artist, url, plays in rows
+        ]
+
+    async def top_users(self, guild_id: int, days: int = 7, limit: int = 10) -> List[UserStats]:
+        """
+        Пользователи, заказавшие больше всего треков за период.
+
+        Args:
+            guild_id: ID сервера
+            days: Количество последних дней
+            limit: Максимальное количество пользователей
+
+        Returns:
+            Список UserStats
+        """
+        await self.flush()
+        rows = await self._db.fetch_all(
+            "SELECT user_id, SUM(plays) AS total, SUM(seconds) "
+            "FROM `music_user_stats` WHERE `guild_id` = ? AND `day` >= ? "
+            "GROUP BY `user_id` ORDER BY total DESC LIMIT ?",
+            (guild_id, self._since(days), limit)
+        )
+        return [
+            UserStats(user_id=user_id, plays=plays, seconds=seconds or 0)
+            for user_id, plays, seconds in rows
+        ]
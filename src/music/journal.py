@@ -0,0 +1,317 @@
+"""
+Журнал очередей музыкального плеера в SQLite.
+
+Позволяет восстановить очереди, текущий трек, режим повтора и громкость
+после перезапуска или падения бота.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Tuple, Callable
+
+from .models import Track, QueueItem, GuildMusicState, LoopMode, intern_track
+from .queue import QueueObserver
+from .youtube import YouTubeExtractor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SavedSession:
+    """Сохраненное состояние плеера сервера"""
+    guild_id: int
+    voice_channel_id: int
+    text_channel_id: Optional[int]
+    owner_id: Optional[int]
+    loop_mode: LoopMode
+    volume: int
+    current: Optional[QueueItem]
+    position: float
+    # Пары (номер записи в журнале, элемент очереди) по порядку
+    items: List[Tuple[int, QueueItem]] = field(default_factory=list)
+
+
+class _GuildJournal(QueueObserver):
+    """Передает изменения очереди сервера в журнал"""
+
+    def __init__(self, journal: 'QueueJournal', guild_id: int):
+        self._journal = journal
+        self._guild_id = guild_id
+
+    def on_append(self, item: QueueItem):
+        self._journal._append(self._guild_id, item)
+
+    def on_remove(self, item: QueueItem):
+        self._journal._remove(self._guild_id, item)
+
+    def on_reset(self, items: List[QueueItem]):
+        self._journal._reset(self._guild_id, items)
+
+
+class QueueJournal:
+    """
+    Журнал состояния плеера.
+
+    Очередь не перезаписывается целиком: добавление и удаление трека - это
+    одна вставка или удаление строки в music_queue_items. Изменения копятся
+    в памяти и записываются одной транзакцией на следующей итерации event
+    loop. Позиция текущего трека сохраняется раз в POSITION_INTERVAL секунд.
+    """
+
+    POSITION_INTERVAL = 15.0
+
+    def __init__(self, db_manager):
+        """
+        Инициализация журнала.
+
+        Args:
+            db_manager: DatabaseManager
+        """
+        self._db = db_manager
+        self._pending: List[Tuple[str, tuple]] = []
+        self._flush_scheduled = False
+        self._flush_lock = asyncio.Lock()
+
+        # guild_id -> item_id -> номер записи в журнале
+        self._seqs: Dict[int, Dict[int, int]] = {}
+        self._next_seq: Dict[int, int] = {}
+        self._positions: Dict[int, float] = {}
+        self._text_channels: Dict[int, int] = {}
+
+        self._position_provider: Optional[Callable[[], Dict[int, float]]] = None
+        self._checkpoint_task: Optional[asyncio.Task] = None
+
+    def observer(self, guild_id: int) -> QueueObserver:
+        """Возвращает наблюдателя для очереди сервера"""
+        return _GuildJournal(self, guild_id)
+
+    def set_position_provider(self, provider: Callable[[], Dict[int, float]]):
+        """Устанавливает функцию, возвращающую позиции воспроизведения по серверам"""
+        self._position_provider = provider
+
+    @staticmethod
+    def _dump_track(track: Track) -> str:
+        data = track.to_dict()
+        # URL потока временный и после перезапуска уже недействителен
+        data.pop('stream_url', None)
+        return json.dumps(data, ensure_ascii=False)
+
+    @staticmethod
+    def _load_track(data: str) -> Track:
+        track = Track.from_dict(json.loads(data))
+        return intern_track(track, YouTubeExtractor.get_video_id(track.url))
+
+    def _append(self, guild_id: int, item: QueueItem):
+        seq = self._next_seq.get(guild_id, 1)
+        self._next_seq[guild_id] = seq + 1
+        self._seqs.setdefault(guild_id, {})[item.item_id] = seq
+        self._write(
+            "INSERT OR REPLACE INTO `music_queue_items` "
+            "(guild_id, seq, track, requester_id, requester_name) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, seq, self._dump_track(item.track), item.requester_id, item.requester_name)
+        )
+
+    def _remove(self, guild_id: int, item: QueueItem):
+        seq = self._seqs.get(guild_id, {}).pop(item.item_id, None)
+        if seq is None:
+            return
+        self._write(
+            "DELETE FROM `music_queue_items` WHERE `guild_id` = ? AND `seq` = ?",
+            (guild_id, seq)
+        )
+
+    def _reset(self, guild_id: int, items: List[QueueItem]):
+        self._seqs.pop(guild_id, None)
+        self._next_seq.pop(guild_id, None)
+        self._write("DELETE FROM `music_queue_items` WHERE `guild_id` = ?", (guild_id,))
+        for item in items:
+            self._append(guild_id, item)
+
+    def save_session(
+        self,
+        guild_id: int,
+        state: GuildMusicState,
+        voice_channel_id: int,
+        position: float = 0.0
+    ):
+        """
+        Сохраняет состояние плеера сервера.
+
+        Args:
+            guild_id: ID сервера
+            state: Состояние плеера
+            voice_channel_id: ID голосового канала
+            position: Позиция текущего трека в секундах
+        """
+        current = state.current_track
+        self._positions[guild_id] = position
+        self._write(
+            "INSERT INTO `music_sessions` "
+            "(guild_id, voice_channel_id, text_channel_id, owner_id, loop_mode, volume, "
+            "current_track, current_requester_id, current_requester_name, position, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(guild_id) DO UPDATE SET "
+            "voice_channel_id = excluded.voice_channel_id, "
+            "text_channel_id = COALESCE(excluded.text_channel_id, music_sessions.text_channel_id), "
+            "owner_id = excluded.owner_id, loop_mode = excluded.loop_mode, volume = excluded.volume, "
+            "current_track = excluded.current_track, "
+            "current_requester_id = excluded.current_requester_id, "
+            "current_requester_name = excluded.current_requester_name, "
+            "position = excluded.position, updated_at = CURRENT_TIMESTAMP",
+            (
+                guild_id, voice_channel_id, self._text_channels.get(guild_id), state.channel_owner_id,
+                state.loop_mode.value, state.volume,
+                self._dump_track(current.track) if current else None,
+                current.requester_id if current else None,
+                current.requester_name if current else None,
+                position
+            )
+        )
+        self._ensure_checkpoints()
+
+    def set_text_channel(self, guild_id: int, channel_id: int):
+        """Сохраняет канал для уведомлений"""
+        self._text_channels[guild_id] = channel_id
+        self._write(
+            "UPDATE `music_sessions` SET `text_channel_id` = ? WHERE `guild_id` = ?",
+            (channel_id, guild_id)
+        )
+
+    def forget(self, guild_id: int):
+        """Удаляет сохраненное состояние сервера"""
+        self._seqs.pop(guild_id, None)
+        self._next_seq.pop(guild_id, None)
+        self._positions.pop(guild_id, None)
+        self._text_channels.pop(guild_id, None)
+        self._write("DELETE FROM `music_queue_items` WHERE `guild_id` = ?", (guild_id,))
+        self._write("DELETE FROM `music_sessions` WHERE `guild_id` = ?", (guild_id,))
+
+    def adopt(self, guild_id: int, items: List[Tuple[int, QueueItem]]):
+        """
+        Связывает восстановленные элементы очереди с записями журнала.
+
+        Args:
+            guild_id: ID сервера
+            items: Пары (номер записи, элемент очереди)
+        """
+        seqs = self._seqs.setdefault(guild_id, {})
+        for seq, item in items:
+            seqs[item.item_id] = seq
+        if items:
+            self._next_seq[guild_id] = max(self._next_seq.get(guild_id, 1), items[-1][0] + 1)
+
+    async def load(self) -> List[SavedSession]:
+        """
+        Загружает сохраненные состояния всех серверов.
+
+        Returns:
+            Список SavedSession
+        """
+        rows = await self._db.fetch_all(
+            "SELECT guild_id, voice_channel_id, text_channel_id, owner_id, loop_mode, volume, "
+            "current_track, current_requester_id, current_requester_name, position "
+            "FROM `music_sessions`"
+        )
+        item_rows = await self._db.fetch_all(
+            "SELECT guild_id, seq, track, requester_id, requester_name "
+            "FROM `music_queue_items` ORDER BY guild_id, seq"
+        )
+
+        sessions: Dict[int, SavedSession] = {}
+        for row in rows:
+            try:
+                current = None
+                if row[6]:
+                    current = QueueItem(
+                        track=self._load_track(row[6]),
+                        requester_id=row[7],
+                        requester_name=row[8] or ''
+                    )
+                sessions[row[0]] = SavedSession(
+                    guild_id=row[0],
+                    voice_channel_id=row[1],
+                    text_channel_id=row[2],
+                    owner_id=row[3],
+                    loop_mode=LoopMode(row[4] or 'none'),
+                    volume=row[5],
+                    current=current,
+                    position=row[9] or 0.0
+                )
+            except (ValueError, KeyError) as e:
+                logger.error(f"Поврежденное состояние плеера сервера {row[0]}: {e}")
+
+        for guild_id, seq, track_json, requester_id, requester_name in item_rows:
+            session = sessions.get(guild_id)
+            if not session:
+                continue
+            try:
+                track = self._load_track(track_json)
+            except (ValueError, KeyError) as e:
+                logger.error(f"Поврежденный трек в очереди сервера {guild_id}: {e}")
+                continue
+            session.items.append((seq, QueueItem(
+                track=track,
+                requester_id=requester_id,
+                requester_name=requester_name or ''
+            )))
+
+        return list(sessions.values())
+
+    def _write(self, query: str, params: tuple):
+        """Добавляет запрос в очередь записи"""
+        self._pending.append((query, params))
+        if self._flush_scheduled:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._flush_scheduled = True
+        loop.call_soon(lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self):
+        """Записывает накопленные изменения одной транзакцией"""
+        self._flush_scheduled = False
+        async with self._flush_lock:
+            statements, self._pending = self._pending, []
+            if statements and not await self._db.execute_batch(statements):
+                logger.error(f"Не удалось сохранить {len(statements)} изменений очереди")
+
+    def _ensure_checkpoints(self):
+        """Запускает периодическое сохранение позиции"""
+        if self._position_provider is None:
+            return
+        if self._checkpoint_task is None or self._checkpoint_task.done():
+            self._checkpoint_task = asyncio.ensure_future(self._checkpoint_loop())
+
+    async def _checkpoint_loop(self):
+        """Периодически сохраняет позиции текущих треков"""
+        while True:
+            await asyncio.sleep(self.POSITION_INTERVAL)
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Сохраняет позиции текущих треков (запись выполнит flush)"""
+        if self._position_provider is None:
+            return
+
+        for guild_id, position in self._position_provider().items():
+            if guild_id not in self._positions:
+                continue
+            if abs(self._positions[guild_id] - position) < 1:
+                continue
+            self._positions[guild_id] = position
+            self._write(
+                "UPDATE `music_sessions` SET `position` = ? WHERE `guild_id` = ?",
+                (position, guild_id)
+            )
+
+    def stop(self):
+        """Останавливает периодическое сохранение позиции"""
+        if self._checkpoint_task:
+            self._checkpoint_task.cancel()
+            self._checkpoint_task = None
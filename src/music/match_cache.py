@@ -0,0 +1,128 @@
+"""
+Постоянный кэш соответствий треков Spotify видео на YouTube.
+"""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpotifyMatch:
+    """Найденное соответствие трека Spotify видео на YouTube"""
+    video_id: str
+    title: str
+    duration: int
+    confidence: float
+
+
+class SpotifyMatchCache:
+    """
+    Кэш соответствий Spotify -> YouTube.
+
+    Соответствия хранятся в таблице spotify_matches и ищутся по Spotify ID
+    трека или по ISRC. Перед базой данных стоит LRU кэш в памяти.
+    """
+
+    def __init__(
+        self,
+        db_manager=None,
+        memory_limit: int = 1000,
+        min_confidence: float = 0.5
+    ):
+        """
+        Инициализация кэша.
+
+        Args:
+            db_manager: DatabaseManager для постоянного хранения (None - только память)
+            memory_limit: Максимальное количество записей в памяти
+            min_confidence: Минимальная уверенность для повторного использования
+        """
+        self._db = db_manager
+        self._memory: OrderedDict[str, SpotifyMatch] = OrderedDict()
+        self._memory_limit = memory_limit
+        self._min_confidence = min_confidence
+
+    async def get(self, spotify_id: str, isrc: Optional[str] = None) -> Optional[SpotifyMatch]:
+        """
+        Ищет соответствие по Spotify ID или ISRC.
+
+        Args:
+            spotify_id: Spotify ID трека
+            isrc: ISRC трека (если известен)
+
+        Returns:
+            SpotifyMatch или None, если соответствия нет или оно ненадежно
+        """
+        keys = [self._key('spotify', spotify_id)]
+        if isrc:
+            keys.append(self._key('isrc', isrc))
+
+        for key in keys:
+            match = self._memory.get(key)
+            if match:
+                self._memory.move_to_end(key)
+                return match
+
+        if not self._db:
+            return None
+
+        row = await self._db.fetch_one(
+            "SELECT `video_id`, `title`, `duration`, `confidence` FROM `spotify_matches` "
+            "WHERE (`spotify_id` = ? OR (`isrc` IS NOT NULL AND `isrc` = ?)) AND `confidence` >= ? "
+            "ORDER BY `confidence` DESC LIMIT 1",
+            (spotify_id, isrc, self._min_confidence)
+        )
+        if not row:
+            return None
+
+        match = SpotifyMatch(
+            video_id=row[0],
+            title=row[1] or '',
+            duration=row[2] or 0,
+            confidence=row[3] or 0.0
+        )
+        for key in keys:
+            self._remember(key, match)
+        return match
+
+    async def put(self, spotify_id: str, isrc: Optional[str], match: SpotifyMatch):
+        """
+        Сохраняет соответствие.
+
+        Ненадежные соответствия сохраняются в базе, но не используются
+        повторно: такие треки будут найдены заново и перезаписаны.
+
+        Args:
+            spotify_id: Spotify ID трека
+            isrc: ISRC трека (если известен)
+            match: Найденное соответствие
+        """
+        if match.confidence >= self._min_confidence:
+            self._remember(self._key('spotify', spotify_id), match)
+            if isrc:
+                self._remember(self._key('isrc', isrc), match)
+
+        if not self._db:
+            return
+
+        await self._db.execute_query(
+            "INSERT OR REPLACE INTO `spotify_matches` "
+            "(spotify_id, isrc, video_id, title, duration, confidence, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            (spotify_id, isrc, match.video_id, match.title, match.duration, match.confidence)
+        )
+
+    def _remember(self, key: str, match: SpotifyMatch):
+        """Добавляет запись в кэш в памяти с вытеснением самых старых"""
+        self._memory[key] = match
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_limit:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _key(kind: str, value: str) -> str:
+        return f"{kind}:{value}"
@@ -0,0 +1,141 @@
+"""
+Замеры задержек музыкального плеера по этапам.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Iterator
+
+# Границы корзин гистограммы в миллисекундах
+BUCKET_BOUNDS_MS = (
+    5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000
+)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек одного этапа с фиксированными корзинами"""
+
+    def __init__(self):
+        # Последняя корзина - все, что больше последней границы
+        self.buckets: List[int] = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms: Optional[float] = None
+
+    def observe(self, value_ms: float):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        if self.min_ms is None or value_ms < self.min_ms:
+            self.min_ms = value_ms
+        if self.max_ms is None or value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Оценивает перцентиль по корзинам.
+
+        Args:
+            p: Перцентиль от 0 до 100
+
+        Returns:
+            Верхняя граница корзины, в которую попадает перцентиль
+            (не больше максимального замера)
+        """
+        if not self.count:
+            return 0.0
+
+        rank = max(1, round(self.count * p / 100))
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                if index < len(BUCKET_BOUNDS_MS):
+                    return min(float(BUCKET_BOUNDS_MS[index]), self.max_ms)
+                return self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean_ms, 1),
+            'min_ms': round(self.min_ms or 0.0, 1),
+            'max_ms': round(self.max_ms or 0.0, 1),
+            'p50_ms': round(self.percentile(50), 1),
+            'p95_ms': round(self.percentile(95), 1),
+            'buckets': {
+                **{f'le_{bound}': count for bound, count in zip(BUCKET_BOUNDS_MS, self.buckets)},
+                'inf': self.buckets[-1]
+            }
+        }
+
+
+class LatencyMetrics:
+    """
+    Гистограммы задержек по этапам.
+
+    Замеры приходят и из event loop, и из аудио потоков discord.py,
+    поэтому запись защищена блокировкой.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+    def observe(self, stage: str, value_ms: float):
+        """Добавляет замер этапа в миллисекундах"""
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = LatencyHistogram()
+            histogram.observe(value_ms)
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """
+        Замеряет время выполнения блока.
+
+        Пример:
+            with metrics.span('play.connect'):
+                await player.connect(channel)
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - started) * 1000)
+
+    def get(self, stage: str) -> Optional[LatencyHistogram]:
+        """Возвращает гистограмму этапа"""
+        return self._stages.get(stage)
+
+    def stages(self) -> Dict[str, LatencyHistogram]:
+        """Возвращает гистограммы всех этапов по имени"""
+        with self._lock:
+            return dict(sorted(self._stages.items()))
+
+    def export(self) -> dict:
+        """Возвращает все гистограммы в виде словаря для JSON"""
+        with self._lock:
+            return {
+                'since': self._started_at,
+                'bucket_bounds_ms': list(BUCKET_BOUNDS_MS),
+                'stages': {
+                    stage: histogram.to_dict()
+                    for stage, histogram in sorted(self._stages.items())
+                }
+            }
+
+    def reset(self):
+        """Сбрасывает все замеры"""
+        with self._lock:
+            self._stages.clear()
+            self._started_at = time.time()
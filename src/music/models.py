@@ -3,9 +3,41 @@
 """
 
 from dataclasses import dataclass, field
-from typing import Optional
+from itertools import count
+from typing import Optional, Tuple, Dict
 from enum import Enum
 from datetime import datetime
+from weakref import WeakValueDictionary
+
+# Уникальные идентификаторы элементов очереди
+_queue_item_ids = count(1)
+
+
+def format_duration(seconds: int) -> str:
+    """Форматирует длительность в MM:SS или HH:MM:SS"""
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    
+    if hours > 0:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def parse_duration(value: str) -> Optional[int]:
+    """
+    Разбирает время в формате SS, MM:SS или HH:MM:SS.
+    
+    Returns:
+        Количество секунд или None, если формат неверный
+    """
+    parts = value.strip().split(':')
+    if not 1 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        return None
+    
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds
 
 
 class TrackSource(Enum):
@@ -22,7 +54,7 @@ class LoopMode(Enum):
     QUEUE = "queue"    # Повтор всей очереди
 
 
-@dataclass
+@dataclass(slots=True, weakref_slot=True)
 class Track:
     """Модель трека"""
     title: str
@@ -33,16 +65,12 @@ class Track:
     album: Optional[str] = None
     source: TrackSource = TrackSource.YOUTUBE
     stream_url: Optional[str] = None  # URL для воспроизведения (извлекается позже)
+    stream_codec: Optional[str] = None  # Аудио кодек потока (например, opus)
     
     @property
     def duration_formatted(self) -> str:
         """Возвращает длительность в формате MM:SS или HH:MM:SS"""
-        hours, remainder = divmod(self.duration, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        
-        if hours > 0:
-            return f"{hours}:{minutes:02d}:{seconds:02d}"
-        return f"{minutes}:{seconds:02d}"
+        return format_duration(self.duration)
     
     @property
     def display_name(self) -> str:
@@ -60,7 +88,8 @@ class Track:
             'artist': self.artist,
             'album': self.album,
             'source': self.source.value,
-            'stream_url': self.stream_url
+            'stream_url': self.stream_url,
+            'stream_codec': self.stream_codec
         }
     
     @classmethod
@@ -75,11 +104,51 @@ class Track:
             artist=data.get('artist'),
             album=data.get('album'),
             source=source,
-            stream_url=data.get('stream_url')
+            stream_url=data.get('stream_url'),
+            stream_codec=data.get('stream_codec')
         )
 
 
-@dataclass
+# Общие экземпляры треков: (ID видео или трека Spotify, источник) -> Track.
+# Запись живет, пока трек есть хотя бы в одной очереди, кэше или истории.
+_interned_tracks: 'WeakValueDictionary[Tuple[str, str], Track]' = WeakValueDictionary()
+
+
+def intern_track(track: Track, video_id: Optional[str], spotify_id: Optional[str] = None) -> Track:
+    """
+    Возвращает общий экземпляр трека для видео.
+    
+    Если трек этого видео из того же источника уже есть в памяти,
+    возвращается он (с обновленным stream URL), иначе сохраняется переданный.
+    Разные треки Spotify могут найтись на одном видео (например, студийная
+    и концертная версии), поэтому треки Spotify объединяются по ID трека
+    Spotify, а не по ID видео.
+    
+    Args:
+        track: Новый экземпляр трека
+        video_id: ID видео YouTube (None - трек не объединяется)
+        spotify_id: ID трека Spotify (трек Spotify без него не объединяется)
+        
+    Returns:
+        Общий экземпляр Track
+    """
+    key_id = spotify_id if track.source is TrackSource.SPOTIFY else video_id
+    if not key_id:
+        return track
+    
+    key = (key_id, track.source.value)
+    existing = _interned_tracks.get(key)
+    if existing is None:
+        _interned_tracks[key] = track
+        return track
+    
+    if track.stream_url:
+        existing.stream_url = track.stream_url
+        existing.stream_codec = track.stream_codec
+    return existing
+
+
+@dataclass(slots=True)
 class QueueItem:
     """Элемент очереди воспроизведения"""
     track: Track
@@ -87,6 +156,7 @@ class QueueItem:
     requester_name: str
     added_at: datetime = field(default_factory=datetime.now)
     position: int = 0
+    item_id: int = field(default_factory=lambda: next(_queue_item_ids))
     
     def to_embed_field(self) -> dict:
         """Возвращает данные для embed поля"""
@@ -97,7 +167,7 @@ class QueueItem:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class GuildMusicState:
     """Состояние музыкального плеера для сервера"""
     guild_id: int
@@ -113,3 +183,11 @@ class GuildMusicState:
         """Обновляет время последней активности"""
         self.last_activity = datetime.now()
 
+
+@dataclass(slots=True)
+class GuildSettings:
+    """Настройки плеера сервера, которые сохраняются после отключения бота"""
+    fair_queue: bool = False  # Чередовать треки разных пользователей
+    autoplay: bool = False  # Продолжать похожими треками, когда очередь закончилась
+    # requester_id -> сколько треков подряд пользователь получает в честной очереди
+    weights: Dict[int, int] = field(default_factory=dict)
@@ -4,15 +4,23 @@
 
 import asyncio
 import logging
-from typing import Optional, Dict, Callable, Any
-from datetime import datetime, timedelta
+import time
+from collections import deque
+from typing import Optional, Dict, Callable, Awaitable, Any, Tuple, List
 
 import discord
 from discord.ext import tasks
 
-from .models import Track, QueueItem, GuildMusicState, LoopMode
+from .models import Track, QueueItem, GuildMusicState, GuildSettings, LoopMode
 from .queue import TrackQueue
 from .youtube import YouTubeExtractor, FFMPEG_OPTIONS
+from .prefetch import PrefetchScheduler
+from .audio_cache import AudioCache
+from .source import PlaybackSource, BufferedSource, release_later
+from .journal import QueueJournal, SavedSession
+from .metrics import LatencyMetrics
+from .governor import FFmpegGovernor
+from .health import UpstreamUnavailable
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +28,42 @@ logger = logging.getLogger(__name__)
 class MusicPlayer:
     """Основной класс музыкального плеера"""
     
+    # Сколько кадров следующего трека читать заранее (1 секунда)
+    PREBUFFER_FRAMES = 50
+    
+    # Трек, оборвавшийся раньше конца больше чем на столько секунд,
+    # продолжается с места обрыва
+    RESUME_TOLERANCE = 5.0
+    
+    # На сколько секунд отматывать трек при восстановлении после перезапуска
+    RESTORE_REWIND = 3.0
+    
+    # Сколько секунд после обрыва потока ждать новый URL, отдавая тишину
+    STREAM_HOLD_TIMEOUT = 20.0
+    
+    # Чтение кадра дольше этого времени - ffmpeg завис (его собственные
+    # переподключения укладываются в reconnect_delay_max)
+    STREAM_STALL_TIMEOUT = 15.0
+    
+    # Интервал проверки зависших потоков
+    STREAM_CHECK_INTERVAL = 5.0
+    
     def __init__(
         self,
         youtube_extractor: YouTubeExtractor,
         inactivity_timeout: int = 300,
         max_queue_size: int = 100,
-        default_volume: int = 50
+        fair_queue: bool = False,
+        default_volume: int = 50,
+        prefetch_depth: int = 2,
+        audio_cache: Optional[AudioCache] = None,
+        opus_passthrough: bool = True,
+        gapless: bool = True,
+        gapless_lead: float = 5.0,
+        crossfade_ms: int = 0,
+        journal: Optional[QueueJournal] = None,
+        metrics: Optional[LatencyMetrics] = None,
+        governor: Optional[FFmpegGovernor] = None
     ):
         """
         Инициализация плеера.
@@ -34,44 +72,118 @@ class MusicPlayer:
             youtube_extractor: Экземпляр YouTubeExtractor
             inactivity_timeout: Таймаут бездействия в секундах
             max_queue_size: Максимальный размер очереди
+            fair_queue: Чередовать треки разных пользователей в новых очередях
             default_volume: Громкость по умолчанию (0-100)
+            prefetch_depth: Сколько следующих треков предзагружать
+            audio_cache: Локальный кэш аудио (None - отключен)
+            opus_passthrough: Отдавать Opus напрямую, без декодирования в PCM
+            gapless: Заранее готовить следующий трек для перехода без паузы
+            gapless_lead: За сколько секунд до конца трека готовить следующий
+            crossfade_ms: Длительность плавного перехода между треками (только PCM)
+            journal: Журнал для восстановления очередей после перезапуска (None - отключен)
+            metrics: Замеры задержек (по умолчанию создаются свои)
+            governor: Общее ограничение процессов ffmpeg (None - без ограничения)
         """
         self._youtube = youtube_extractor
         self._inactivity_timeout = inactivity_timeout
         self._max_queue_size = max_queue_size
+        self._fair_queue = fair_queue
         self._default_volume = default_volume
         
         # Состояние плеера для каждого сервера
         self._states: Dict[int, GuildMusicState] = {}
         self._queues: Dict[int, TrackQueue] = {}
         self._voice_clients: Dict[int, discord.VoiceClient] = {}
+        # Режимы сервера (/fairqueue, /autoplay): не удаляются при отключении
+        self._settings: Dict[int, GuildSettings] = {}
+        
+        # Локальный кэш популярных треков
+        self._audio_cache = audio_cache
+        self._opus_passthrough = opus_passthrough
+        
+        # Фоновая предзагрузка следующих треков
+        self._prefetch = PrefetchScheduler(
+            youtube_extractor,
+            upcoming=lambda guild_id, count: (
+                self._queues[guild_id].peek(count) if guild_id in self._queues else []
+            ),
+            depth=prefetch_depth
+        )
+        
+        # Бесшовные переходы между треками
+        self._gapless = gapless
+        self._gapless_lead = gapless_lead
+        self._crossfade_ms = crossfade_ms
+        self._arm_tasks: Dict[int, asyncio.Task] = {}
+        self._armed_items: Dict[int, int] = {}
+        self._last_track_end: Dict[int, float] = {}
+        # Паузы между треками в миллисекундах (последние переходы)
+        self._transition_gaps: deque = deque(maxlen=200)
+        
+        # Замеры задержек по этапам
+        self.metrics = metrics or LatencyMetrics()
+        # Момент запроса воспроизведения (time.perf_counter) до первого кадра
+        self._requested_at: Dict[int, float] = {}
         
-        # Предзагруженные треки
-        self._preloaded: Dict[int, Optional[str]] = {}
+        # Ограничение процессов ffmpeg
+        self.governor = governor
+        
+        # Сохранение состояния в БД
+        self._journal = journal
+        if journal:
+            journal.set_position_provider(self._playing_positions)
         
         # Callbacks
         self._on_track_start: Optional[Callable] = None
         self._on_track_end: Optional[Callable] = None
         self._on_queue_empty: Optional[Callable] = None
         self._on_error: Optional[Callable] = None
+        self._on_disconnect: Optional[Callable] = None
+        
+        # Таймеры отключения по бездействию
+        self._idle_timers: Dict[int, asyncio.TimerHandle] = {}
+        # Повторный запуск воспроизведения после недоступности YouTube
+        self._upstream_retries: Dict[int, asyncio.TimerHandle] = {}
         
         # Счетчики retry
         self._retry_counts: Dict[int, int] = {}
+        self._resume_attempts: Dict[int, int] = {}
         self._max_retries = 3
         
+        # Восстановление оборвавшихся потоков
+        self._watchdog: Optional[asyncio.Task] = None
+        self.streams_recovered = 0
+        self.streams_failed = 0
+        
         # Event loop для корректной работы callback'ов
         self._loop: Optional[asyncio.AbstractEventLoop] = None
     
     def get_state(self, guild_id: int) -> GuildMusicState:
         """Получает или создает состояние для сервера"""
         if guild_id not in self._states:
-            self._states[guild_id] = GuildMusicState(guild_id=guild_id)
+            self._states[guild_id] = GuildMusicState(guild_id=guild_id, volume=self._default_volume)
         return self._states[guild_id]
     
+    def get_settings(self, guild_id: int) -> GuildSettings:
+        """Получает или создает настройки сервера"""
+        settings = self._settings.get(guild_id)
+        if settings is None:
+            settings = self._settings[guild_id] = GuildSettings(fair_queue=self._fair_queue)
+        return settings
+    
     def get_queue(self, guild_id: int) -> TrackQueue:
         """Получает или создает очередь для сервера"""
         if guild_id not in self._queues:
-            self._queues[guild_id] = TrackQueue(max_size=self._max_queue_size)
+            settings = self.get_settings(guild_id)
+            queue = TrackQueue(
+                max_size=self._max_queue_size,
+                fair=settings.fair_queue,
+                weights=settings.weights
+            )
+            queue.set_on_change(lambda: self._on_queue_changed(guild_id))
+            if self._journal:
+                queue.set_observer(self._journal.observer(guild_id))
+            self._queues[guild_id] = queue
         return self._queues[guild_id]
     
     def get_voice_client(self, guild_id: int) -> Optional[discord.VoiceClient]:
@@ -80,8 +192,8 @@ class MusicPlayer:
     
     def is_playing(self, guild_id: int) -> bool:
         """Проверяет, играет ли музыка на сервере"""
-        state = self.get_state(guild_id)
-        return state.is_playing and not state.is_paused
+        state = self._states.get(guild_id)
+        return state is not None and state.is_playing and not state.is_paused
     
     def is_connected(self, guild_id: int) -> bool:
         """Проверяет, подключен ли бот к голосовому каналу"""
@@ -125,6 +237,7 @@ class MusicPlayer:
             state.update_activity()
             
             logger.info(f"Подключен к каналу {channel.name} на сервере {channel.guild.name}")
+            self._update_idle_timer(guild_id)
             return vc
             
         except asyncio.TimeoutError:
@@ -149,26 +262,153 @@ class MusicPlayer:
                 if guild_id in self._voice_clients:
                     del self._voice_clients[guild_id]
         
-        # Очищаем состояние
-        if guild_id in self._states:
-            self._states[guild_id] = GuildMusicState(guild_id=guild_id)
+        # Отменяем предзагрузку
+        self._prefetch.cancel(guild_id)
+        self._cancel_arm(guild_id)
         
         # Очищаем очередь
-        queue = self.get_queue(guild_id)
-        queue.clear()
+        queue = self._queues.get(guild_id)
+        if queue:
+            queue.clear()
+        
+        if self._journal:
+            self._journal.forget(guild_id)
         
-        # Очищаем предзагрузку
-        if guild_id in self._preloaded:
-            del self._preloaded[guild_id]
+        # Удаляем состояние сервера
+        self._evict(guild_id)
         
         logger.info(f"Отключен от сервера {guild_id}")
+        
+        if self._on_disconnect:
+            await self._on_disconnect(guild_id)
+    
+    def _evict(self, guild_id: int):
+        """Удаляет данные сервера из памяти (настройки сервера остаются)"""
+        self._cancel_idle_timer(guild_id)
+        self._cancel_upstream_retry(guild_id)
+        self._cancel_arm(guild_id)
+        self._prefetch.cancel(guild_id)
+        self._states.pop(guild_id, None)
+        self._queues.pop(guild_id, None)
+        self._retry_counts.pop(guild_id, None)
+        self._resume_attempts.pop(guild_id, None)
+        self._last_track_end.pop(guild_id, None)
+        self._requested_at.pop(guild_id, None)
+    
+    def _update_idle_timer(self, guild_id: int):
+        """
+        Запускает таймер отключения, если на сервере ничего не играет,
+        и отменяет его, если воспроизведение идет.
+        
+        Вызывается только при смене состояния: подключение, запрос
+        воспроизведения, окончание трека без следующего, восстановление.
+        
+        Пауза не считается бездействием. Повторный вызов без воспроизведения
+        переносит срок отключения (как любое действие пользователя).
+        """
+        state = self._states.get(guild_id)
+        # Очередь, ожидающая восстановления YouTube, не простаивает
+        if not state or state.is_playing or guild_id in self._upstream_retries:
+            self._cancel_idle_timer(guild_id)
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        self._cancel_idle_timer(guild_id)
+        self._idle_timers[guild_id] = loop.call_later(
+            self._inactivity_timeout,
+            self._on_idle_timeout,
+            guild_id
+        )
+    
+    def _cancel_idle_timer(self, guild_id: int):
+        """Отменяет таймер отключения"""
+        timer = self._idle_timers.pop(guild_id, None)
+        if timer:
+            timer.cancel()
+    
+    def _retry_later(self, guild_id: int, delay: float, retry: Callable[[], Awaitable[None]]):
+        """
+        Повторяет запуск воспроизведения, когда YouTube снова можно проверить.
+        
+        Args:
+            guild_id: ID сервера
+            delay: Через сколько секунд повторить (UpstreamUnavailable.retry_after)
+            retry: Корутина запуска воспроизведения
+        """
+        self._cancel_upstream_retry(guild_id)
+        self._cancel_idle_timer(guild_id)
+        loop = asyncio.get_running_loop()
+        self._upstream_retries[guild_id] = loop.call_later(
+            max(1.0, delay),
+            lambda: asyncio.ensure_future(self._run_upstream_retry(guild_id, retry))
+        )
+    
+    async def _run_upstream_retry(self, guild_id: int, retry: Callable[[], Awaitable[None]]):
+        """Выполняет отложенный запуск воспроизведения"""
+        self._upstream_retries.pop(guild_id, None)
+        state = self._states.get(guild_id)
+        if not state:
+            return
+        if not state.is_playing:
+            await retry()
+        # Запуск снова отложен или ничего не заиграло
+        self._update_idle_timer(guild_id)
+    
+    def _cancel_upstream_retry(self, guild_id: int):
+        """Отменяет отложенный запуск воспроизведения"""
+        handle = self._upstream_retries.pop(guild_id, None)
+        if handle:
+            handle.cancel()
+    
+    async def _resume_queue(self, guild_id: int):
+        """Продолжает очередь, если в ней остались треки"""
+        if not self.get_queue(guild_id).is_empty:
+            await self._play_next(guild_id)
+    
+    def _playable_offline(self, guild_id: int) -> Optional[Tuple[QueueItem, str, bool]]:
+        """
+        Находит первый трек очереди, который можно запустить без запроса к YouTube.
+        
+        Returns:
+            Кортеж (элемент очереди, путь к файлу или URL потока, является ли
+            путь локальным) или None
+        """
+        queue = self.get_queue(guild_id)
+        for item in queue.peek(queue.size):
+            if self._audio_cache:
+                path = self._audio_cache.get_path(item.track)
+                if path:
+                    return item, path, True
+            if item.track.stream_url:
+                return item, item.track.stream_url, False
+        return None
+    
+    def _on_idle_timeout(self, guild_id: int):
+        """Вызывается по истечении таймаута бездействия"""
+        self._idle_timers.pop(guild_id, None)
+        
+        state = self._states.get(guild_id)
+        if state and state.is_playing:
+            return
+        
+        if guild_id in self._voice_clients:
+            logger.info(f"Таймаут бездействия на сервере {guild_id}")
+            asyncio.ensure_future(self.disconnect(guild_id))
+        else:
+            # Бот не подключен: просто освобождаем память
+            self._evict(guild_id)
     
     async def play(
         self, 
         guild_id: int, 
         track: Track,
         requester_id: int,
-        requester_name: str
+        requester_name: str,
+        requested_at: Optional[float] = None
     ) -> Optional[QueueItem]:
         """
         Воспроизводит или добавляет трек в очередь.
@@ -178,6 +418,8 @@ class MusicPlayer:
             track: Трек для воспроизведения
             requester_id: ID пользователя
             requester_name: Имя пользователя
+            requested_at: Момент получения команды (time.perf_counter)
+                для замера времени до первого звука
             
         Returns:
             QueueItem или None
@@ -192,14 +434,14 @@ class MusicPlayer:
             logger.warning("Не удалось добавить трек в очередь")
             return None
         
-        # Если не играет - запускаем
+        # Если не играет - запускаем (следующие треки предзагружаются в фоне)
         if not state.is_playing:
+            if requested_at is not None:
+                self._requested_at[guild_id] = requested_at
             await self._play_next(guild_id)
-        else:
-            # Предзагружаем следующий трек
-            await self._preload_next(guild_id)
         
         state.update_activity()
+        self._update_idle_timer(guild_id)
         return item
     
     async def play_multiple(
@@ -207,7 +449,8 @@ class MusicPlayer:
         guild_id: int,
         tracks: list[Track],
         requester_id: int,
-        requester_name: str
+        requester_name: str,
+        requested_at: Optional[float] = None
     ) -> list[QueueItem]:
         """
         Добавляет несколько треков в очередь.
@@ -228,9 +471,12 @@ class MusicPlayer:
         
         # Если не играет - запускаем
         if not state.is_playing and items:
+            if requested_at is not None:
+                self._requested_at[guild_id] = requested_at
             await self._play_next(guild_id)
         
         state.update_activity()
+        self._update_idle_timer(guild_id)
         return items
     
     async def skip(self, guild_id: int) -> Optional[QueueItem]:
@@ -322,13 +568,73 @@ class MusicPlayer:
         volume = max(0, min(100, volume))
         state = self.get_state(guild_id)
         state.volume = volume
+        self._save_session(guild_id)
         
         vc = self.get_voice_client(guild_id)
-        if vc and vc.source:
-            vc.source.volume = volume / 100
+        if not vc or not isinstance(vc.source, PlaybackSource):
+            return False
+        
+        source = vc.source.current_source
+        if isinstance(source, discord.PCMVolumeTransformer):
+            source.volume = volume / 100
+            # Подготовленный следующий трек создан с прежней громкостью
+            self._rearm(guild_id)
+            return True
+        
+        # Громкость Opus источника задается в ffmpeg: перезапускаем его с текущей позиции
+        if state.current_track:
+            asyncio.ensure_future(
+                self._restart_source(guild_id, state.current_track, vc.source.position)
+            )
             return True
         return False
     
+    def get_position(self, guild_id: int) -> float:
+        """
+        Возвращает позицию воспроизведения текущего трека.
+        
+        Позиция считается по отправленным в Discord кадрам, поэтому
+        время на паузе не учитывается.
+        
+        Args:
+            guild_id: ID сервера
+            
+        Returns:
+            Позиция в секундах
+        """
+        vc = self.get_voice_client(guild_id)
+        if vc and isinstance(vc.source, PlaybackSource):
+            return vc.source.position
+        return 0.0
+    
+    async def seek(self, guild_id: int, position: float) -> bool:
+        """
+        Перематывает текущий трек.
+        
+        ffmpeg перезапускается с -ss перед входом, поэтому поток
+        открывается сразу с нужной позиции без декодирования начала.
+        
+        Args:
+            guild_id: ID сервера
+            position: Позиция в секундах
+            
+        Returns:
+            True если перемотка успешна
+        """
+        state = self.get_state(guild_id)
+        vc = self.get_voice_client(guild_id)
+        item = state.current_track
+        
+        if not item or not vc or not isinstance(vc.source, PlaybackSource):
+            return False
+        
+        position = max(0.0, float(position))
+        if item.track.duration:
+            position = min(position, max(0.0, item.track.duration - 1))
+        
+        state.update_activity()
+        return await self._restart_source(guild_id, item, position)
+    
     def set_loop_mode(self, guild_id: int, mode: LoopMode) -> bool:
         """
         Устанавливает режим повтора.
@@ -342,6 +648,9 @@ class MusicPlayer:
         """
         state = self.get_state(guild_id)
         state.loop_mode = mode
+        self._save_session(guild_id)
+        # Следующий трек мог измениться
+        self._check_armed(guild_id)
         logger.info(f"Режим повтора установлен: {mode.value} для сервера {guild_id}")
         return True
     
@@ -358,6 +667,37 @@ class MusicPlayer:
         state = self.get_state(guild_id)
         return state.loop_mode
     
+    def set_autoplay(self, guild_id: int, enabled: bool):
+        """
+        Включает или выключает автовоспроизведение.
+        
+        Args:
+            guild_id: ID сервера
+            enabled: Продолжать похожими треками после окончания очереди
+        """
+        self.get_settings(guild_id).autoplay = enabled
+        logger.info(f"Автовоспроизведение {'включено' if enabled else 'выключено'} для сервера {guild_id}")
+    
+    def get_autoplay(self, guild_id: int) -> bool:
+        """Включено ли автовоспроизведение"""
+        return self.get_settings(guild_id).autoplay
+    
+    def set_fair_queue(self, guild_id: int, enabled: bool):
+        """
+        Включает или выключает честную очередь.
+        
+        Args:
+            guild_id: ID сервера
+            enabled: Чередовать треки разных пользователей
+        """
+        self.get_settings(guild_id).fair_queue = enabled
+        self.get_queue(guild_id).set_fair(enabled)
+        logger.info(f"Честная очередь {'включена' if enabled else 'выключена'} для сервера {guild_id}")
+    
+    def get_fair_queue(self, guild_id: int) -> bool:
+        """Включена ли честная очередь"""
+        return self.get_settings(guild_id).fair_queue
+    
     def clear_queue(self, guild_id: int) -> int:
         """
         Очищает очередь треков (оставляет текущий трек).
@@ -369,14 +709,133 @@ class MusicPlayer:
             Количество удаленных треков
         """
         queue = self.get_queue(guild_id)
-        cleared_count = len(queue._queue)
-        queue._queue.clear()
-        queue._update_positions()
+        cleared_count = queue.clear_upcoming()
         logger.info(f"Очередь очищена, удалено {cleared_count} треков")
         return cleared_count
     
-    async def _play_track(self, guild_id: int, item: QueueItem):
-        """Воспроизводит конкретный трек"""
+    async def _resolve_audio(
+        self,
+        guild_id: int,
+        item: QueueItem,
+        use_prefetch: bool = True
+    ) -> Tuple[Optional[str], bool]:
+        """
+        Определяет, откуда воспроизводить трек.
+        
+        Args:
+            guild_id: ID сервера
+            item: Элемент очереди
+            use_prefetch: Использовать результат фоновой предзагрузки
+            
+        Returns:
+            Кортеж (путь к файлу или URL потока, является ли путь локальным)
+        """
+        if self._audio_cache:
+            path = self._audio_cache.get_path(item.track)
+            if path:
+                logger.debug(f"Воспроизведение из аудио кэша: {item.track.title}")
+                return path, True
+        
+        with self.metrics.span('stream_url'):
+            if use_prefetch:
+                return await self._prefetch.get_stream_url(guild_id, item), False
+            return await self._youtube.get_stream_url(item.track), False
+    
+    async def _create_source(
+        self,
+        guild_id: int,
+        location: str,
+        volume: int,
+        is_local: bool = False,
+        codec: Optional[str] = None,
+        start_at: float = 0.0
+    ) -> discord.AudioSource:
+        """
+        Создает аудио источник.
+        
+        В режиме Opus ffmpeg сразу отдает Opus пакеты: при громкости 100%
+        Opus поток копируется без перекодирования, иначе громкость
+        применяется фильтром ffmpeg. В режиме PCM звук декодируется,
+        масштабируется в Python и кодируется в Opus библиотекой discord.py.
+        
+        Процесс ffmpeg запускается только с разрешения governor.
+        
+        Args:
+            guild_id: ID сервера
+            location: URL потока или путь к локальному файлу
+            volume: Громкость (0-100)
+            is_local: Источник - локальный файл
+            codec: Аудио кодек источника, если известен
+            start_at: Позиция начала воспроизведения в секундах
+            
+        Returns:
+            Аудио источник для VoiceClient
+            
+        Raises:
+            StreamLimitExceeded: Нет свободных ресурсов для нового процесса
+        """
+        if not self.governor:
+            return await self._spawn_source(location, volume, is_local, codec, start_at)
+        
+        await self.governor.acquire(guild_id)
+        try:
+            source = await self._spawn_source(location, volume, is_local, codec, start_at)
+        except BaseException:
+            self.governor.release(guild_id)
+            raise
+        
+        self.governor.register(guild_id, source)
+        return source
+    
+    async def _spawn_source(
+        self,
+        location: str,
+        volume: int,
+        is_local: bool,
+        codec: Optional[str],
+        start_at: float
+    ) -> discord.AudioSource:
+        """Запускает ffmpeg и создает источник (см. _create_source)"""
+        # Для локальных файлов переподключение не нужно
+        before_options = [] if is_local else [FFMPEG_OPTIONS['before_options']]
+        if start_at > 0:
+            # -ss перед -i: ffmpeg перематывает вход, а не декодирует все до позиции
+            before_options.append(f"-ss {start_at:.2f}")
+        before_options = ' '.join(before_options) or None
+        options = FFMPEG_OPTIONS['options']
+        
+        if not self._opus_passthrough:
+            with self.metrics.span('ffmpeg_spawn'):
+                source = discord.FFmpegPCMAudio(location, before_options=before_options, options=options)
+            return discord.PCMVolumeTransformer(source, volume=volume / 100)
+        
+        if is_local:
+            # Аудио кэш хранит только Ogg/Opus
+            codec = 'opus'
+        elif codec is None:
+            try:
+                with self.metrics.span('ffprobe'):
+                    codec, _ = await discord.FFmpegOpusAudio.probe(location)
+            except Exception as e:
+                logger.debug(f"Не удалось определить кодек потока: {e}")
+        
+        with self.metrics.span('ffmpeg_spawn'):
+            if volume == 100 and codec == 'opus':
+                return discord.FFmpegOpusAudio(
+                    location,
+                    codec='copy',
+                    before_options=before_options,
+                    options=options
+                )
+            
+            return discord.FFmpegOpusAudio(
+                location,
+                before_options=before_options,
+                options=f"{options} -filter:a volume={volume / 100:.2f}"
+            )
+    
+    async def _play_track(self, guild_id: int, item: QueueItem, start_at: float = 0.0):
+        """Воспроизводит конкретный трек (с позиции start_at в секундах)"""
         # Сохраняем ссылку на event loop для callback'а
         self._loop = asyncio.get_running_loop()
         
@@ -392,8 +851,17 @@ class MusicPlayer:
         queue.current = item
         state.current_track = item
         
-        # Получаем URL потока
-        stream_url = await self._youtube.get_stream_url(item.track)
+        # Получаем локальный файл или URL потока
+        try:
+            stream_url, is_local = await self._resolve_audio(guild_id, item, use_prefetch=False)
+        except UpstreamUnavailable as e:
+            logger.warning(f"Трек {item.track.title} не запущен: {e}")
+            state.is_playing = False
+            # Трек продолжится с той же позиции, когда YouTube снова можно проверить
+            self._retry_later(guild_id, e.retry_after, lambda: self._play_track(guild_id, item, start_at))
+            if self._on_error:
+                await self._on_error(guild_id, str(e))
+            return
         
         if not stream_url:
             logger.error(f"Не удалось получить stream URL для {item.track.title}")
@@ -401,16 +869,19 @@ class MusicPlayer:
                 await self._on_error(guild_id, "Не удалось воспроизвести трек")
             return
         
+        source = None
         try:
             # Создаем аудио источник
-            source = discord.FFmpegPCMAudio(stream_url, **FFMPEG_OPTIONS)
-            source = discord.PCMVolumeTransformer(source, volume=state.volume / 100)
+            source = await self._create_source(
+                guild_id, stream_url, state.volume, is_local, item.track.stream_codec, start_at
+            )
+            source = self._wrap_source(guild_id, item, source, start_at)
             
             # Воспроизводим
             vc.play(
                 source,
                 after=lambda e: asyncio.run_coroutine_threadsafe(
-                    self._on_track_finished(guild_id, e),
+                    self._on_track_finished(guild_id, e, source),
                     self._loop
                 )
             )
@@ -418,18 +889,28 @@ class MusicPlayer:
             state.is_playing = True
             state.is_paused = False
             state.update_activity()
+            self._cancel_upstream_retry(guild_id)
+            self._ensure_watchdog()
             
             logger.info(f"Воспроизведение: {item.track.display_name}")
+            self._save_session(guild_id, start_at)
             
-            if self._on_track_start:
-                await self._on_track_start(guild_id, item)
+            # Продолжение трека с середины - не новое воспроизведение
+            if not start_at:
+                if self._audio_cache:
+                    self._audio_cache.record_play(item.track)
+                
+                if self._on_track_start:
+                    await self._on_track_start(guild_id, item)
             
-            # Предзагружаем следующий трек
-            await self._preload_next(guild_id)
+            self._schedule_arm(guild_id)
             
         except Exception as e:
             logger.error(f"Ошибка воспроизведения: {e}")
             state.is_playing = False
+            if source is not None and vc.source is not source:
+                # vc.play() не принял источник - процесс ffmpeg больше никто не закроет
+                release_later(source)
             if self._on_error:
                 await self._on_error(guild_id, str(e))
     
@@ -447,25 +928,50 @@ class MusicPlayer:
             state.is_playing = False
             return
         
-        # Получаем следующий трек
-        next_item = queue.get_next()
+        # Следующий трек снимается с очереди только после получения URL:
+        # если YouTube недоступен, трек остается первым
+        next_item = queue.peek_next()
         
         if not next_item:
             logger.debug("Очередь пуста")
             state.is_playing = False
             state.current_track = None
             queue.current = None
+            self._save_session(guild_id)
             
             if self._on_queue_empty:
                 await self._on_queue_empty(guild_id)
             return
         
+        # Получаем локальный файл или URL потока (предзагруженный для этого элемента очереди)
+        try:
+            stream_url, is_local = await self._resolve_audio(guild_id, next_item)
+        except UpstreamUnavailable as e:
+            logger.warning(f"Трек {next_item.track.title} не запущен: {e}")
+            self._retry_counts[guild_id] = 0
+            # Следующие треки тоже не получат URL: играют только треки из кэша
+            # или с уже полученным URL, остальные ждут восстановления сервиса
+            offline = self._playable_offline(guild_id)
+            if offline is None:
+                state.is_playing = False
+                state.current_track = None
+                queue.current = None
+                self._save_session(guild_id)
+                self._retry_later(guild_id, e.retry_after, lambda: self._resume_queue(guild_id))
+                if self._on_error:
+                    await self._on_error(guild_id, str(e))
+                return
+            next_item, stream_url, is_local = offline
+            logger.info(f"YouTube недоступен, воспроизводится доступный трек: {next_item.track.title}")
+        
+        # Пока получали URL, трек могли удалить из очереди
+        if not queue.remove(next_item):
+            await self._play_next(guild_id)
+            return
+        
         queue.current = next_item
         state.current_track = next_item
         
-        # Получаем URL потока
-        stream_url = self._preloaded.get(guild_id) or await self._youtube.get_stream_url(next_item.track)
-        
         if not stream_url:
             logger.error(f"Не удалось получить stream URL для {next_item.track.title}")
             # Пробуем следующий трек
@@ -479,17 +985,21 @@ class MusicPlayer:
             return
         
         self._retry_counts[guild_id] = 0
+        self._resume_attempts[guild_id] = 0
         
+        source = None
         try:
             # Создаем аудио источник
-            source = discord.FFmpegPCMAudio(stream_url, **FFMPEG_OPTIONS)
-            source = discord.PCMVolumeTransformer(source, volume=state.volume / 100)
+            source = await self._create_source(
+                guild_id, stream_url, state.volume, is_local, next_item.track.stream_codec
+            )
+            source = self._wrap_source(guild_id, next_item, source)
             
             # Воспроизводим
             vc.play(
                 source,
                 after=lambda e: asyncio.run_coroutine_threadsafe(
-                    self._on_track_finished(guild_id, e),
+                    self._on_track_finished(guild_id, e, source),
                     self._loop
                 )
             )
@@ -497,29 +1007,76 @@ class MusicPlayer:
             state.is_playing = True
             state.is_paused = False
             state.update_activity()
+            self._cancel_upstream_retry(guild_id)
             
             logger.info(f"Воспроизведение: {next_item.track.display_name}")
+            self._save_session(guild_id)
+            
+            if self._audio_cache:
+                self._audio_cache.record_play(next_item.track)
             
             if self._on_track_start:
                 await self._on_track_start(guild_id, next_item)
             
-            # Предзагружаем следующий трек
-            await self._preload_next(guild_id)
+            self._schedule_arm(guild_id)
             
         except Exception as e:
             logger.error(f"Ошибка воспроизведения: {e}")
             state.is_playing = False
+            if source is not None and vc.source is not source:
+                # vc.play() не принял источник - процесс ffmpeg больше никто не закроет
+                release_later(source)
             if self._on_error:
                 await self._on_error(guild_id, str(e))
     
-    async def _on_track_finished(self, guild_id: int, error: Optional[Exception]):
+    async def _on_track_finished(
+        self,
+        guild_id: int,
+        error: Optional[Exception],
+        source: Optional[PlaybackSource] = None
+    ):
         """Вызывается при завершении трека"""
+        # Бот уже отключен (after-callback после disconnect)
+        if guild_id not in self._states:
+            return
+        
+        await self._handle_track_finished(guild_id, error, source)
+        
+        # Если ничего не заиграло - запускаем таймер отключения
+        self._update_idle_timer(guild_id)
+    
+    async def _handle_track_finished(
+        self,
+        guild_id: int,
+        error: Optional[Exception],
+        source: Optional[PlaybackSource]
+    ):
+        """Обрабатывает завершение трека: повтор, продолжение или следующий трек"""
         if error:
             logger.error(f"Ошибка воспроизведения: {error}")
         
         state = self.get_state(guild_id)
         queue = self.get_queue(guild_id)
         
+        # Отсюда отсчитывается пауза до начала следующего трека
+        self._cancel_arm(guild_id)
+        self._last_track_end[guild_id] = (source.ended_at if source else None) or time.perf_counter()
+        
+        # Поток оборвался (например, истек URL) - продолжаем трек с места обрыва
+        if state.current_track and self._is_interrupted(state.current_track, error, source):
+            attempts = self._resume_attempts.get(guild_id, 0)
+            if attempts < self._max_retries:
+                self._resume_attempts[guild_id] = attempts + 1
+                current = state.current_track
+                logger.warning(
+                    f"Поток трека {current.track.title} оборвался на {source.position:.0f} с, "
+                    f"продолжаем воспроизведение"
+                )
+                # Сохраненный URL мог устареть, получаем новый
+                current.track.stream_url = None
+                await self._play_track(guild_id, current, source.position)
+                return
+        
         if self._on_track_end and state.current_track:
             await self._on_track_end(guild_id, state.current_track)
         
@@ -533,44 +1090,427 @@ class MusicPlayer:
             return
         elif state.loop_mode == LoopMode.QUEUE and state.current_track:
             # Повтор очереди - возвращаем трек в конец очереди
-            current = state.current_track
-            queue._queue.append(
-                QueueItem(
-                    track=current.track,
-                    requester_id=current.requester_id,
-                    requester_name=current.requester_name,
-                    position=len(queue._queue) + 2
-                )
-            )
-            queue._update_positions()
-            logger.debug(f"Трек {current.track.title} добавлен в конец очереди для повтора")
+            self._requeue_for_loop(queue, state.current_track)
         
         # Воспроизводим следующий
         await self._play_next(guild_id)
     
-    async def _preload_next(self, guild_id: int):
-        """Предзагружает следующий трек"""
+    def _is_interrupted(
+        self,
+        item: QueueItem,
+        error: Optional[Exception],
+        source: Optional[PlaybackSource]
+    ) -> bool:
+        """Проверяет, что трек закончился из-за ошибки, а не дошел до конца"""
+        # Без источника неизвестна позиция; остановка через skip/stop не дочитывает источник
+        if source is None or (error is None and source.ended_at is None):
+            return False
+        # Восстановить поток уже пытались (_recover_stream)
+        if source.recovery_failed:
+            return False
+        if error is not None:
+            return True
+        duration = item.track.duration
+        return bool(duration) and source.position < duration - self.RESUME_TOLERANCE
+    
+    async def _restart_source(self, guild_id: int, item: QueueItem, position: float) -> bool:
+        """
+        Перезапускает ffmpeg текущего трека с позиции position.
+        
+        Новый источник подставляется в PlaybackSource, поэтому VoiceClient
+        не останавливается и трек не считается завершенным.
+        """
+        state = self.get_state(guild_id)
+        vc = self.get_voice_client(guild_id)
+        if not vc or not isinstance(vc.source, PlaybackSource):
+            return False
+        playback = vc.source
+        
+        try:
+            location, is_local = await self._resolve_audio(guild_id, item, use_prefetch=False)
+        except UpstreamUnavailable as e:
+            logger.warning(f"Трек {item.track.title} не перезапущен: {e}")
+            return False
+        if not location:
+            return False
+        
+        try:
+            source = await self._create_source(
+                guild_id, location, state.volume, is_local, item.track.stream_codec, position
+            )
+        except Exception as e:
+            logger.error(f"Ошибка перезапуска источника: {e}")
+            return False
+        
+        # Пока создавался источник, трек мог смениться
+        if vc.source is not playback or state.current_track is not item:
+            release_later(source)
+            return False
+        
+        if not playback.replace(source, position):
+            release_later(source)
+            return False
+        
+        logger.debug(f"Трек {item.track.title} перезапущен с {position:.1f} с")
+        # Время подготовки следующего трека изменилось
+        self._rearm(guild_id)
+        return True
+    
+    async def _recover_stream(self, guild_id: int, position: float):
+        """
+        Продолжает оборвавшийся трек с места обрыва с новым URL.
+        
+        Вызывается из аудио потока, пока PlaybackSource отдает тишину:
+        VoiceClient не останавливается, а новый источник подставляется
+        через _restart_source.
+        """
+        state = self.get_state(guild_id)
+        vc = self.get_voice_client(guild_id)
+        item = state.current_track
+        if not vc or not isinstance(vc.source, PlaybackSource) or item is None:
+            return
+        playback = vc.source
+        
+        attempts = self._resume_attempts.get(guild_id, 0)
+        if attempts >= self._max_retries:
+            logger.error(f"Поток трека {item.track.title} обрывается повторно, переходим к следующему")
+            self.streams_failed += 1
+            playback.abandon()
+            return
+        self._resume_attempts[guild_id] = attempts + 1
+        
+        logger.warning(f"Поток трека {item.track.title} оборвался на {position:.0f} с, получаем новый URL")
+        # Сохраненный URL мог устареть
+        item.track.stream_url = None
+        
+        with self.metrics.span('stream_recover'):
+            recovered = await self._restart_source(guild_id, item, position)
+        
+        if recovered:
+            self.streams_recovered += 1
+            logger.info(f"Поток трека {item.track.title} восстановлен с {position:.0f} с")
+        else:
+            self.streams_failed += 1
+            logger.error(f"Не удалось восстановить поток трека {item.track.title}")
+            playback.abandon()
+    
+    def _ensure_watchdog(self):
+        """Запускает проверку зависших потоков"""
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = asyncio.ensure_future(self._watchdog_loop())
+    
+    async def _watchdog_loop(self):
+        """Завершает зависшие процессы ffmpeg, пока есть подключения"""
+        while self._voice_clients:
+            await asyncio.sleep(self.STREAM_CHECK_INTERVAL)
+            now = time.perf_counter()
+            for guild_id, vc in list(self._voice_clients.items()):
+                playback = vc.source
+                if not isinstance(playback, PlaybackSource):
+                    continue
+                stalled = playback.stalled_for(now)
+                if stalled < self.STREAM_STALL_TIMEOUT:
+                    continue
+                # Чтение вернет пустой кадр, и поток восстановится как оборвавшийся
+                logger.warning(f"Поток сервера {guild_id} не отдает кадры {stalled:.0f} с, перезапуск ffmpeg")
+                playback.abort()
+    
+    def _requeue_for_loop(self, queue: TrackQueue, current: QueueItem):
+        """Возвращает трек в конец очереди в режиме повтора очереди"""
+        queue.requeue(current)
+        logger.debug(f"Трек {current.track.title} добавлен в конец очереди для повтора")
+    
+    def _on_queue_changed(self, guild_id: int):
+        """Вызывается при изменении состава очереди"""
+        self._prefetch.invalidate(guild_id)
+        self._check_armed(guild_id)
+    
+    def _wrap_source(
+        self,
+        guild_id: int,
+        item: QueueItem,
+        source: discord.AudioSource,
+        offset: float = 0.0
+    ) -> PlaybackSource:
+        """Оборачивает источник для бесшовных переходов, замера пауз и позиции"""
+        requested_at = self._requested_at.pop(guild_id, None)
+        return PlaybackSource(
+            source,
+            duration=item.track.duration,
+            gap_started_at=self._last_track_end.pop(guild_id, None),
+            on_gap=self._record_transition_gap,
+            offset=offset,
+            on_first_frame=lambda first_packet_ms, started_at: self._record_first_frame(
+                first_packet_ms, started_at, requested_at
+            ),
+            on_interrupted=lambda position: asyncio.run_coroutine_threadsafe(
+                self._recover_stream(guild_id, position),
+                self._loop
+            ),
+            resume_tolerance=self.RESUME_TOLERANCE,
+            hold_timeout=self.STREAM_HOLD_TIMEOUT
+        )
+    
+    def _record_first_frame(
+        self,
+        first_packet_ms: float,
+        started_at: float,
+        requested_at: Optional[float]
+    ):
+        """Сохраняет задержку первого кадра трека (вызывается из аудио потока)"""
+        self.metrics.observe('first_packet', first_packet_ms)
+        if requested_at is not None:
+            self.metrics.observe('play.time_to_first_audio', (started_at - requested_at) * 1000)
+    
+    def _record_transition_gap(self, gap_ms: float):
+        """Сохраняет паузу перехода между треками (вызывается из аудио потока)"""
+        self._transition_gaps.append(gap_ms)
+        self.metrics.observe('transition_gap', gap_ms)
+        logger.debug(f"Пауза между треками: {gap_ms:.0f} мс")
+    
+    def get_transition_gaps(self) -> List[float]:
+        """Возвращает паузы последних переходов между треками в миллисекундах"""
+        return list(self._transition_gaps)
+    
+    def _upcoming_item(self, guild_id: int) -> Optional[QueueItem]:
+        """Определяет трек, который заиграет после текущего"""
+        state = self.get_state(guild_id)
         queue = self.get_queue(guild_id)
+        
+        if state.loop_mode == LoopMode.TRACK:
+            return state.current_track
+        
         next_item = queue.peek_next()
+        if not next_item and state.loop_mode == LoopMode.QUEUE:
+            # Очередь из одного трека повторяет его же
+            return state.current_track
+        return next_item
+    
+    def _schedule_arm(self, guild_id: int):
+        """Запускает подготовку следующего трека перед окончанием текущего"""
+        if not self._gapless:
+            return
+        self._cancel_arm(guild_id)
+        self._arm_tasks[guild_id] = asyncio.ensure_future(self._arm_next(guild_id))
+    
+    def _cancel_arm(self, guild_id: int):
+        """Отменяет подготовку следующего трека"""
+        task = self._arm_tasks.pop(guild_id, None)
+        if task:
+            task.cancel()
+        self._armed_items.pop(guild_id, None)
+    
+    def _check_armed(self, guild_id: int):
+        """Отменяет подготовленный трек, если следующим должен играть другой"""
+        armed_id = self._armed_items.get(guild_id)
+        if armed_id is None:
+            return
         
-        if next_item:
-            stream_url = await self._youtube.get_stream_url(next_item.track)
-            self._preloaded[guild_id] = stream_url
-            logger.debug(f"Предзагружен: {next_item.track.title}")
-        else:
-            self._preloaded[guild_id] = None
+        upcoming = self._upcoming_item(guild_id)
+        if upcoming and upcoming.item_id == armed_id:
+            return
+        
+        self._rearm(guild_id)
+    
+    def _rearm(self, guild_id: int):
+        """Сбрасывает подготовленный следующий трек и готовит его заново"""
+        if guild_id not in self._arm_tasks:
+            return
+        vc = self.get_voice_client(guild_id)
+        if vc and isinstance(vc.source, PlaybackSource):
+            vc.source.disarm()
+        self._schedule_arm(guild_id)
+    
+    async def _arm_next(self, guild_id: int):
+        """
+        Готовит источник следующего трека за gapless_lead секунд до конца текущего.
+        
+        Процесс ffmpeg запускается заранее, первые кадры читаются в буфер,
+        и по окончании текущего трека воспроизведение продолжается без паузы.
+        """
+        vc = self.get_voice_client(guild_id)
+        if not vc or not isinstance(vc.source, PlaybackSource):
+            return
+        playback = vc.source
+        
+        source = None
+        try:
+            # Позиция считается по отправленным кадрам, поэтому пауза учитывается
+            while True:
+                if vc.source is not playback or not playback.duration:
+                    return
+                remaining = playback.duration - playback.position - self._gapless_lead
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, 5))
+            
+            item = self._upcoming_item(guild_id)
+            if not item:
+                return
+            
+            prepare_started = time.perf_counter()
+            is_repeat = item is self.get_state(guild_id).current_track
+            location, is_local = await self._resolve_audio(guild_id, item, use_prefetch=not is_repeat)
+            if not location or vc.source is not playback:
+                return
+            
+            state = self.get_state(guild_id)
+            source = BufferedSource(
+                await self._create_source(guild_id, location, state.volume, is_local, item.track.stream_codec)
+            )
+            
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, source.prebuffer, self.PREBUFFER_FRAMES)
+            self.metrics.observe('gapless_prepare', (time.perf_counter() - prepare_started) * 1000)
+        except asyncio.CancelledError:
+            if source is not None:
+                release_later(source)
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка подготовки следующего трека: {e}")
+            if source is not None:
+                release_later(source)
+            return
+        
+        # Пока готовился источник, очередь или воспроизведение могли измениться
+        if vc.source is not playback or self._upcoming_item(guild_id) is not item:
+            release_later(source)
+            return
+        
+        armed = playback.arm_next(
+            source,
+            item.track.duration,
+            on_switch=lambda: asyncio.run_coroutine_threadsafe(
+                self._on_gapless_switch(guild_id, item),
+                self._loop
+            ),
+            crossfade_ms=self._crossfade_ms
+        )
+        if not armed:
+            release_later(source)
+            return
+        
+        self._armed_items[guild_id] = item.item_id
+        logger.debug(f"Следующий трек подготовлен: {item.track.title}")
+    
+    async def _on_gapless_switch(self, guild_id: int, item: QueueItem):
+        """Обновляет состояние после бесшовного перехода на следующий трек"""
+        self._armed_items.pop(guild_id, None)
+        self._arm_tasks.pop(guild_id, None)
+        
+        state = self.get_state(guild_id)
+        queue = self.get_queue(guild_id)
+        previous = state.current_track
+        
+        if self._on_track_end and previous:
+            await self._on_track_end(guild_id, previous)
+        
+        if item is not previous:
+            if state.loop_mode == LoopMode.QUEUE and previous:
+                self._requeue_for_loop(queue, previous)
+            if queue.peek_next() is item:
+                queue.get_next()
+            else:
+                # Очередь изменилась между переключением в аудио потоке и этим
+                # вызовом: убираем только заигравший элемент, остальные на месте
+                logger.warning(f"Очередь изменилась во время перехода на {item.track.title}")
+                queue.remove(item)
+        
+        queue.current = item
+        state.current_track = item
+        state.is_playing = True
+        state.update_activity()
+        
+        logger.info(f"Воспроизведение: {item.track.display_name}")
+        self._save_session(guild_id)
+        
+        if self._audio_cache:
+            self._audio_cache.record_play(item.track)
+        
+        if self._on_track_start:
+            await self._on_track_start(guild_id, item)
+        
+        self._schedule_arm(guild_id)
+    
+    def _save_session(self, guild_id: int, position: float = 0.0):
+        """Сохраняет состояние плеера сервера в журнал"""
+        if not self._journal:
+            return
+        vc = self.get_voice_client(guild_id)
+        if not vc or not vc.channel:
+            return
+        self._journal.save_session(guild_id, self.get_state(guild_id), vc.channel.id, position)
+    
+    def _playing_positions(self) -> Dict[int, float]:
+        """Позиции воспроизведения серверов, где сейчас играет музыка"""
+        return {
+            guild_id: self.get_position(guild_id)
+            for guild_id, state in self._states.items()
+            if state.is_playing and state.current_track
+        }
+    
+    async def restore(self, session: SavedSession, channel: discord.VoiceChannel) -> bool:
+        """
+        Восстанавливает сохраненное состояние после перезапуска.
+        
+        Подключается к голосовому каналу, восстанавливает очередь и
+        продолжает текущий трек немного раньше сохраненной позиции.
+        
+        Args:
+            session: Сохраненное состояние
+            channel: Голосовой канал
+            
+        Returns:
+            True если воспроизведение восстановлено
+        """
+        guild_id = session.guild_id
+        
+        vc = await self.connect(channel, session.owner_id)
+        if not vc:
+            return False
+        
+        state = self.get_state(guild_id)
+        state.volume = session.volume
+        state.loop_mode = session.loop_mode
+        
+        # Элементы уже есть в журнале, записывать их повторно не нужно
+        queue = self.get_queue(guild_id)
+        queue.set_observer(None)
+        restored = []
+        for seq, item in session.items:
+            added = queue.add(item.track, item.requester_id, item.requester_name)
+            if added:
+                restored.append((seq, added))
+        if self._journal:
+            self._journal.adopt(guild_id, restored)
+            queue.set_observer(self._journal.observer(guild_id))
+        
+        logger.info(f"Восстановлена очередь сервера {guild_id}: {len(restored)} треков")
+        
+        if session.current:
+            start_at = max(0.0, session.position - self.RESTORE_REWIND)
+            await self._play_track(guild_id, session.current, start_at)
+            if state.is_playing and start_at and self._on_track_start:
+                await self._on_track_start(guild_id, session.current)
+        elif restored:
+            await self._play_next(guild_id)
+        
+        self._update_idle_timer(guild_id)
+        return state.is_playing
     
     async def check_inactivity(self, guild_id: int) -> bool:
         """
-        Проверяет бездействие и отключает если нужно.
+        Отключается, если в голосовом канале не осталось пользователей.
+        
+        Вызывается при выходе пользователя из канала. Отключение по таймауту
+        без воспроизведения выполняет таймер (_update_idle_timer).
         
         Args:
             guild_id: ID сервера
             
         Returns:
-            True если был отключен из-за бездействия
+            True если был отключен
         """
-        state = self.get_state(guild_id)
         vc = self.get_voice_client(guild_id)
         
         if not vc or not vc.is_connected():
@@ -582,14 +1522,6 @@ class MusicPlayer:
             await self.disconnect(guild_id)
             return True
         
-        # Проверяем таймаут бездействия
-        if not state.is_playing:
-            inactive_time = datetime.now() - state.last_activity
-            if inactive_time > timedelta(seconds=self._inactivity_timeout):
-                logger.info(f"Таймаут бездействия на сервере {guild_id}")
-                await self.disconnect(guild_id)
-                return True
-        
         return False
     
     def set_on_track_start(self, callback: Callable):
@@ -607,4 +1539,8 @@ class MusicPlayer:
     def set_on_error(self, callback: Callable):
         """Устанавливает callback при ошибке"""
         self._on_error = callback
+    
+    def set_on_disconnect(self, callback: Callable):
+        """Устанавливает callback при отключении от голосового канала"""
+        self._on_disconnect = callback
 
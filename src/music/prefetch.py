@@ -0,0 +1,136 @@
+"""
+Фоновая предзагрузка stream URL для следующих треков очереди.
+"""
+
+import asyncio
+import logging
+from typing import Optional, Dict, Set, List, Callable
+
+from .models import QueueItem
+from .youtube import YouTubeExtractor
+from .health import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchScheduler:
+    """
+    Планировщик предзагрузки.
+
+    Для каждого сервера держит фоновые задачи получения stream URL для
+    первых prefetch_depth треков очереди. Задачи привязаны к конкретному
+    элементу очереди (QueueItem.item_id), поэтому после пропуска, удаления
+    или перемешивания не будет воспроизведен чужой URL. Задачи для треков,
+    которые больше не входят в начало очереди, отменяются.
+    """
+
+    def __init__(
+        self,
+        youtube_extractor: YouTubeExtractor,
+        upcoming: Callable[[int, int], List[QueueItem]],
+        depth: int = 2
+    ):
+        """
+        Инициализация планировщика.
+
+        Args:
+            youtube_extractor: Экземпляр YouTubeExtractor
+            upcoming: Функция (guild_id, count) -> следующие элементы очереди
+            depth: Сколько следующих треков предзагружать
+        """
+        self._youtube = youtube_extractor
+        self._upcoming = upcoming
+        self._depth = max(0, depth)
+        self._tasks: Dict[int, Dict[int, asyncio.Task]] = {}
+        self._dirty: Set[int] = set()
+
+    def invalidate(self, guild_id: int):
+        """
+        Отмечает, что очередь сервера изменилась.
+
+        Пересчет выполняется на следующей итерации event loop, поэтому серия
+        изменений (например, добавление плейлиста) обрабатывается один раз.
+        """
+        if guild_id in self._dirty:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._dirty.add(guild_id)
+        loop.call_soon(self._refresh, guild_id)
+
+    def _refresh(self, guild_id: int):
+        """Запускает недостающие задачи и отменяет устаревшие"""
+        if guild_id not in self._dirty:
+            # Предзагрузка сервера отменена (cancel) до пересчета
+            return
+        self._dirty.discard(guild_id)
+
+        wanted = {
+            item.item_id: item
+            for item in self._upcoming(guild_id, self._depth)
+        }
+        tasks = self._tasks.setdefault(guild_id, {})
+
+        for item_id in list(tasks):
+            if item_id not in wanted:
+                tasks.pop(item_id).cancel()
+
+        for item_id, item in wanted.items():
+            if item_id not in tasks:
+                tasks[item_id] = asyncio.ensure_future(self._prefetch(item))
+
+        if not tasks:
+            self._tasks.pop(guild_id, None)
+
+    async def _prefetch(self, item: QueueItem) -> Optional[str]:
+        """Получает stream URL трека"""
+        try:
+            stream_url = await self._youtube.get_stream_url(item.track)
+        except UpstreamUnavailable as e:
+            # Трек получит URL при запуске, если сервис к тому времени заработает
+            logger.debug(f"Предзагрузка {item.track.title} пропущена: {e}")
+            return None
+        logger.debug(f"Предзагружен: {item.track.title}")
+        return stream_url
+
+    async def get_stream_url(self, guild_id: int, item: QueueItem) -> Optional[str]:
+        """
+        Возвращает stream URL элемента очереди.
+
+        Использует результат предзагрузки, если он есть, иначе получает
+        URL сразу.
+
+        Args:
+            guild_id: ID сервера
+            item: Элемент очереди
+
+        Returns:
+            URL аудиопотока или None
+        """
+        task = self._tasks.get(guild_id, {}).pop(item.item_id, None)
+
+        if task and not task.cancelled():
+            try:
+                stream_url = await asyncio.shield(task)
+                if stream_url:
+                    return stream_url
+            except asyncio.CancelledError:
+                # Получать URL заново можно только если отменили саму
+                # предзагрузку, а не вызывающую задачу
+                if not task.cancelled() or asyncio.current_task().cancelling():
+                    task.cancel()
+                    raise
+            except Exception as e:
+                logger.error(f"Ошибка предзагрузки: {e}")
+
+        return await self._youtube.get_stream_url(item.track)
+
+    def cancel(self, guild_id: int):
+        """Отменяет все задачи предзагрузки сервера"""
+        self._dirty.discard(guild_id)
+        for task in self._tasks.pop(guild_id, {}).values():
+            task.cancel()
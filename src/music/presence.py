@@ -0,0 +1,126 @@
+"""
+Общая активность бота для всех серверов с музыкой.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional, Dict
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Ограничение Discord на длину названия активности
+ACTIVITY_NAME_LIMIT = 128
+
+
+class PresenceManager:
+    """
+    Менеджер активности бота.
+
+    Активность у бота одна на все серверы, поэтому серверы не меняют ее
+    напрямую, а сообщают, что у них сейчас играет (set_track) или что
+    воспроизведение закончилось (clear). Изменения объединяются, и
+    change_presence вызывается не чаще раза в interval секунд с
+    итоговым состоянием.
+
+    Правило приоритета: показывается трек сервера, где воспроизведение
+    началось позже всех; если музыка нигде не играет - активность по
+    умолчанию.
+    """
+
+    def __init__(self, bot, default_name: str, interval: float = 5.0):
+        """
+        Инициализация менеджера.
+
+        Args:
+            bot: Экземпляр бота
+            default_name: Название активности по умолчанию
+            interval: Минимальный интервал между обновлениями в секундах
+        """
+        self._bot = bot
+        self._default_name = default_name
+        self._interval = interval
+
+        # guild_id -> название трека, от ранее начатых к недавним
+        self._tracks: Dict[int, str] = {}
+
+        self._last_sent: Optional[str] = None
+        self._last_sent_at = 0.0
+        self._pending_intents = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.dropped = 0
+
+    def set_track(self, guild_id: int, name: str):
+        """Сообщает, что на сервере начал играть трек"""
+        self._tracks.pop(guild_id, None)
+        self._tracks[guild_id] = name[:ACTIVITY_NAME_LIMIT]
+        self._schedule()
+
+    def clear(self, guild_id: int):
+        """Сообщает, что на сервере больше ничего не играет"""
+        if self._tracks.pop(guild_id, None) is None:
+            return
+        self._schedule()
+
+    def refresh(self):
+        """
+        Отправляет итоговую активность заново.
+
+        Вызывается после подключения к Discord: после переподключения
+        активность нужно восстановить, даже если название не менялось.
+        """
+        self._last_sent = None
+        self._schedule()
+
+    def _desired(self) -> str:
+        """Итоговое название активности"""
+        if self._tracks:
+            return next(reversed(self._tracks.values()))
+        return self._default_name
+
+    def _schedule(self):
+        """Планирует обновление активности"""
+        self._pending_intents += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        """Отправляет итоговую активность с учетом интервала"""
+        # Изменения одной итерации event loop объединяются всегда
+        delay = max(0.0, self._last_sent_at + self._interval - time.monotonic())
+        await asyncio.sleep(delay)
+
+        intents, self._pending_intents = self._pending_intents, 0
+        name = self._desired()
+        if name == self._last_sent:
+            self.dropped += intents
+            return
+
+        try:
+            await self._bot.change_presence(
+                activity=discord.Activity(type=discord.ActivityType.listening, name=name),
+                status=discord.Status.do_not_disturb
+            )
+            self._last_sent = name
+            self.sent += 1
+            self.dropped += intents - 1
+            logger.debug(f"Активность: {name} (отправлено {self.sent}, отброшено {self.dropped})")
+        except Exception as e:
+            logger.error(f"Ошибка смены активности: {e}")
+            self.dropped += intents
+        finally:
+            self._last_sent_at = time.monotonic()
+
+        if self._pending_intents:
+            # Пока шел запрос, пришли новые изменения
+            self._task = asyncio.ensure_future(self._flush())
+
+    def stop(self):
+        """Отменяет запланированное обновление"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
@@ -2,31 +2,549 @@
 Система очереди треков для музыкального плеера.
 """
 
+import itertools
 import logging
-from typing import Optional, List, Tuple
+import random
 from collections import deque
-from datetime import datetime
+from typing import Optional, List, Tuple, Callable, Dict, Iterable, Iterator
 
 from .models import Track, QueueItem
 
 logger = logging.getLogger(__name__)
 
 
+class _IndexedItems:
+    """
+    Список элементов очереди с доступом по индексу за O(log n).
+    
+    Элементы хранятся в массиве слотов только с добавлением в конец,
+    удаленные слоты помечаются None. Дерево Фенвика над слотами хранит
+    количество живых элементов, что позволяет найти k-й элемент и индекс
+    элемента за O(log n), не сдвигая остальные. Когда удаленных слотов
+    становится больше живых, массив перестраивается (амортизированно O(1)).
+    """
+    
+    # Минимальное число удаленных слотов для перестройки
+    COMPACT_MIN = 64
+    
+    def __init__(self, items: Iterable[QueueItem] = ()):
+        self._rebuild(list(items))
+    
+    def _rebuild(self, items: List[QueueItem]):
+        """Строит структуру заново за O(n)"""
+        self._slots: List[Optional[QueueItem]] = items
+        self._slot_of: Dict[int, int] = {item.item_id: i for i, item in enumerate(items)}
+        self._head = 0
+        self._live = len(items)
+        
+        size = len(items)
+        tree = [0] + [1] * size
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+    
+    def __len__(self) -> int:
+        return self._live
+    
+    def __iter__(self) -> Iterator[QueueItem]:
+        for i in range(self._head, len(self._slots)):
+            item = self._slots[i]
+            if item is not None:
+                yield item
+    
+    def _prefix(self, count: int) -> int:
+        """Количество живых элементов в первых count слотах"""
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+    
+    def _find(self, index: int) -> int:
+        """Номер слота элемента с индексом index (0-based)"""
+        pos = 0
+        remaining = index + 1
+        step = 1 << (len(self._slots).bit_length() - 1) if self._slots else 0
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] < remaining:
+                pos = nxt
+                remaining -= self._tree[nxt]
+            step >>= 1
+        return pos
+    
+    def append(self, item: QueueItem):
+        """Добавляет элемент в конец за O(log n)"""
+        slot = len(self._slots)
+        self._slots.append(item)
+        self._slot_of[item.item_id] = slot
+        self._live += 1
+        
+        # Узел i дерева покрывает слоты (i - lowbit(i), i]
+        i = slot + 1
+        self._tree.append(1 + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+    
+    def popleft(self) -> Optional[QueueItem]:
+        """Удаляет и возвращает первый элемент"""
+        if not self._live:
+            return None
+        return self._remove_slot(self._head)
+    
+    def pop_at(self, index: int) -> Optional[QueueItem]:
+        """Удаляет и возвращает элемент с индексом index за O(log n)"""
+        if index < 0 or index >= self._live:
+            return None
+        return self._remove_slot(self._find(index))
+    
+    def first(self) -> Optional[QueueItem]:
+        """Первый элемент без удаления"""
+        return self._slots[self._head] if self._live else None
+    
+    def index_of(self, item: QueueItem) -> Optional[int]:
+        """Индекс элемента (0-based) за O(log n) или None"""
+        slot = self._slot_of.get(item.item_id)
+        if slot is None:
+            return None
+        return self._prefix(slot)
+    
+    def slice(self, start: int, count: int) -> List[QueueItem]:
+        """Элементы с индексами [start, start + count) за O(log n + count)"""
+        if start < 0 or start >= self._live or count <= 0:
+            return []
+        
+        result = []
+        slots = self._slots
+        for i in range(self._find(start), len(slots)):
+            item = slots[i]
+            if item is not None:
+                result.append(item)
+                if len(result) == count:
+                    break
+        return result
+    
+    def items(self) -> List[QueueItem]:
+        """Все элементы по порядку"""
+        return list(self)
+    
+    def replace_all(self, items: List[QueueItem]):
+        """Заменяет содержимое (например, после перемешивания)"""
+        self._rebuild(items)
+    
+    def clear(self):
+        self._rebuild([])
+    
+    def _remove_slot(self, slot: int) -> QueueItem:
+        """Помечает слот удаленным"""
+        item = self._slots[slot]
+        self._slots[slot] = None
+        del self._slot_of[item.item_id]
+        self._live -= 1
+        
+        i = slot + 1
+        while i < len(self._tree):
+            self._tree[i] -= 1
+            i += i & -i
+        
+        while self._head < len(self._slots) and self._slots[self._head] is None:
+            self._head += 1
+        
+        dead = len(self._slots) - self._live
+        if dead > self.COMPACT_MIN and dead > self._live:
+            self._rebuild(self.items())
+        return item
+
+
+class _Lane:
+    """
+    Подочередь пользователя: список со смещением начала.
+    
+    В отличие от deque, элемент с любым индексом берется за O(1), поэтому
+    обход с середины подочереди не перебирает пропущенные элементы.
+    Удаление первого элемента сдвигает смещение, а освободившееся начало
+    списка отбрасывается, когда занимает больше половины.
+    """
+    
+    __slots__ = ('_items', '_head')
+    
+    def __init__(self):
+        self._items: List[Optional[QueueItem]] = []
+        self._head = 0
+    
+    def __len__(self) -> int:
+        return len(self._items) - self._head
+    
+    def __iter__(self) -> Iterator[QueueItem]:
+        return map(self._items.__getitem__, range(self._head, len(self._items)))
+    
+    def __getitem__(self, index: int) -> QueueItem:
+        if index < 0:
+            index += len(self)
+        return self._items[self._head + index]
+    
+    def __delitem__(self, index: int):
+        del self._items[self._head + index]
+    
+    def append(self, item: QueueItem):
+        self._items.append(item)
+    
+    def popleft(self) -> QueueItem:
+        """Удаляет и возвращает первый элемент за амортизированное O(1)"""
+        item = self._items[self._head]
+        self._items[self._head] = None
+        self._head += 1
+        if self._head * 2 >= len(self._items):
+            del self._items[:self._head]
+            self._head = 0
+        return item
+
+
+class _FairItems:
+    """
+    Очередь с честным чередованием пользователей.
+    
+    У каждого пользователя своя подочередь, пользователи с треками стоят
+    в круговой очереди ходов. За ход пользователь получает столько треков
+    подряд, каков его вес (по умолчанию 1), после чего ход переходит к
+    следующему. Выбор следующего трека и добавление - O(1). Ход, в котором
+    играет элемент с нужным индексом, находится двоичным поиском по числу
+    ходов за O(пользователей * log n), а подочереди индексируются за O(1),
+    поэтому страница и удаление по индексу перебирают только элементы
+    внутри этого хода, а не всю очередь до него.
+    
+    Интерфейс совпадает с _IndexedItems.
+    """
+    
+    def __init__(self, items: Iterable[QueueItem] = (), weights: Optional[Dict[int, int]] = None):
+        self._weights: Dict[int, int] = weights if weights is not None else {}
+        self._rebuild(list(items))
+    
+    def _rebuild(self, items: List[QueueItem]):
+        """Строит структуру заново за O(n)"""
+        # requester_id -> треки пользователя по порядку добавления
+        self._lanes: Dict[int, _Lane] = {}
+        # Пользователи с треками в порядке ходов, первый - текущий ход
+        self._turns: deque = deque()
+        # Сколько треков уже выдано в текущем ходе
+        self._served = 0
+        # item_id -> requester_id
+        self._owner: Dict[int, int] = {}
+        for item in items:
+            self.append(item)
+    
+    def weight(self, requester_id: int) -> int:
+        """Сколько треков пользователь получает за ход"""
+        return self._weights.get(requester_id, 1)
+    
+    def __len__(self) -> int:
+        return len(self._owner)
+    
+    def __iter__(self) -> Iterator[QueueItem]:
+        """Элементы в порядке воспроизведения (повторяет popleft без изменений)"""
+        return (item for item, _ in self._walk_from(0))
+    
+    def _walk_from(self, rounds: int) -> Iterator[Tuple[QueueItem, int]]:
+        """
+        Элементы в порядке воспроизведения, начиная с хода номер rounds.
+        
+        Returns:
+            Итератор пар (элемент, индекс в подочереди пользователя)
+        """
+        head = self._turns[0] if rounds == 0 and self._turns else None
+        turns = deque()
+        # requester_id -> индекс следующего элемента в подочереди
+        cursors = {}
+        for turn, requester_id in enumerate(self._turns):
+            done = self._emitted(requester_id, turn == 0, rounds)
+            if done < len(self._lanes[requester_id]):
+                turns.append(requester_id)
+                cursors[requester_id] = done
+        
+        while turns:
+            requester_id = turns.popleft()
+            if requester_id == head:
+                take = self._first_take(requester_id, True)
+                head = None
+            else:
+                take = self.weight(requester_id)
+            lane = self._lanes[requester_id]
+            start = cursors[requester_id]
+            end = min(start + take, len(lane))
+            for lane_index in range(start, end):
+                yield lane[lane_index], lane_index
+            cursors[requester_id] = end
+            if end < len(lane):
+                turns.append(requester_id)
+    
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """
+        Находит ход, в котором играет элемент с индексом index.
+        
+        Returns:
+            Кортеж (номер хода, сколько элементов пропустить от его начала)
+        """
+        # (треков в первый ход, треков за ход, длина подочереди) - как в _emitted,
+        # но без вызовов методов на каждом шаге поиска
+        lanes = [
+            (self._first_take(requester_id, turn == 0), self.weight(requester_id),
+             len(self._lanes[requester_id]))
+            for turn, requester_id in enumerate(self._turns)
+        ]
+        
+        def emitted_total(rounds: int) -> int:
+            """Сколько элементов выдается за первые rounds ходов"""
+            if rounds <= 0:
+                return 0
+            return sum(min(first + weight * (rounds - 1), length) for first, weight, length in lanes)
+        
+        # За max(len(lane)) ходов выдаются все элементы
+        low, high = 0, max(length for _, _, length in lanes)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if emitted_total(middle) <= index:
+                low = middle
+            else:
+                high = middle - 1
+        return low, index - emitted_total(low)
+    
+    def append(self, item: QueueItem):
+        """Добавляет элемент в конец подочереди пользователя за O(1)"""
+        lane = self._lanes.get(item.requester_id)
+        if lane is None:
+            # Новый пользователь получает ход после всех ожидающих
+            lane = self._lanes[item.requester_id] = _Lane()
+            self._turns.append(item.requester_id)
+        lane.append(item)
+        self._owner[item.item_id] = item.requester_id
+    
+    def popleft(self) -> Optional[QueueItem]:
+        """Удаляет и возвращает следующий элемент за O(1)"""
+        if not self._turns:
+            return None
+        
+        requester_id = self._turns[0]
+        lane = self._lanes[requester_id]
+        item = lane.popleft()
+        del self._owner[item.item_id]
+        self._served += 1
+        
+        if not lane:
+            del self._lanes[requester_id]
+            self._turns.popleft()
+            self._served = 0
+        elif self._served >= self.weight(requester_id):
+            self._turns.rotate(-1)
+            self._served = 0
+        return item
+    
+    def pop_at(self, index: int) -> Optional[QueueItem]:
+        """
+        Удаляет и возвращает элемент с индексом index.
+        
+        Кроме поиска хода, сдвигается хвост подочереди пользователя
+        (копирование указателей в списке).
+        """
+        if index < 0 or index >= len(self._owner):
+            return None
+        if index == 0:
+            return self.popleft()
+        
+        rounds, skip = self._locate(index)
+        item, lane_index = next(itertools.islice(self._walk_from(rounds), skip, None))
+        requester_id = item.requester_id
+        lane = self._lanes[requester_id]
+        # По индексу: remove() сравнивал бы элементы через __eq__
+        del lane[lane_index]
+        del self._owner[item.item_id]
+        
+        if not lane:
+            del self._lanes[requester_id]
+            if self._turns[0] == requester_id:
+                self._served = 0
+            self._turns.remove(requester_id)
+        return item
+    
+    def first(self) -> Optional[QueueItem]:
+        """Первый элемент без удаления за O(1)"""
+        return self._lanes[self._turns[0]][0] if self._turns else None
+    
+    def index_of(self, item: QueueItem) -> Optional[int]:
+        """
+        Индекс элемента (0-based) или None.
+        
+        Считается без прохода по очереди, за O(число пользователей) для
+        первого и последнего трека пользователя (добавление, повтор) и
+        O(треков пользователя) для остальных.
+        """
+        requester_id = self._owner.get(item.item_id)
+        if requester_id is None:
+            return None
+        
+        lane = self._lanes[requester_id]
+        if lane[-1] is item:
+            lane_index = len(lane) - 1
+        else:
+            lane_index = next(i for i, queued in enumerate(lane) if queued is item)
+        
+        # Ход, в котором выйдет элемент: до него каждый пользователь, стоящий
+        # в очереди ходов раньше, сделает на один ход больше
+        turn_of = {turn_id: i for i, turn_id in enumerate(self._turns)}
+        turn = turn_of[requester_id]
+        rounds = self._round_of(requester_id, turn == 0, lane_index)
+        
+        index = lane_index
+        for other_id, other_turn in turn_of.items():
+            if other_id != requester_id:
+                index += self._emitted(other_id, other_turn == 0, rounds + (other_turn < turn))
+        return index
+    
+    def _first_take(self, requester_id: int, is_head: bool) -> int:
+        """Сколько треков пользователь получит в первый ход"""
+        weight = self.weight(requester_id)
+        # popleft всегда выдает хотя бы один трек, даже если вес уменьшили посреди хода
+        return max(1, weight - self._served) if is_head else weight
+    
+    def _emitted(self, requester_id: int, is_head: bool, rounds: int) -> int:
+        """Сколько треков пользователь получит за первые rounds ходов"""
+        if rounds <= 0:
+            return 0
+        total = self._first_take(requester_id, is_head) + self.weight(requester_id) * (rounds - 1)
+        return min(total, len(self._lanes[requester_id]))
+    
+    def _round_of(self, requester_id: int, is_head: bool, lane_index: int) -> int:
+        """Номер хода пользователя (0-based), в котором выйдет его трек lane_index"""
+        first = self._first_take(requester_id, is_head)
+        if lane_index < first:
+            return 0
+        return 1 + (lane_index - first) // self.weight(requester_id)
+    
+    def slice(self, start: int, count: int) -> List[QueueItem]:
+        """Элементы с индексами [start, start + count)"""
+        if start < 0 or start >= len(self._owner) or count <= 0:
+            return []
+        rounds, skip = self._locate(start)
+        return [item for item, _ in itertools.islice(self._walk_from(rounds), skip, skip + count)]
+    
+    def items(self) -> List[QueueItem]:
+        """Все элементы в порядке воспроизведения"""
+        return list(self)
+    
+    def replace_all(self, items: List[QueueItem]):
+        """
+        Заменяет содержимое. Порядок сохраняется внутри подочередей,
+        очередность ходов - по первому появлению пользователя.
+        """
+        self._rebuild(items)
+    
+    def clear(self):
+        self._rebuild([])
+
+
+class QueueObserver:
+    """Получает изменения состава очереди (например, для сохранения в БД)"""
+    
+    def on_append(self, item: QueueItem):
+        """Элемент добавлен в конец очереди"""
+    
+    def on_remove(self, item: QueueItem):
+        """Элемент удален из очереди"""
+    
+    def on_reset(self, items: List[QueueItem]):
+        """Состав очереди заменен целиком"""
+
+
 class TrackQueue:
-    """Очередь воспроизведения треков"""
+    """
+    Очередь воспроизведения треков.
+    
+    Позиция элемента не хранится, а вычисляется по индексу в очереди:
+    удаление первого трека не требует перенумерации остальных.
+    Общая длительность и количество треков каждого пользователя
+    обновляются при каждом изменении, а не пересчитываются.
     
-    def __init__(self, max_size: int = 100):
+    В режиме честной очереди треки разных пользователей чередуются
+    (см. _FairItems), и плейлист одного пользователя не откладывает
+    треки остальных на часы.
+    """
+    
+    def __init__(self, max_size: int = 100, fair: bool = False, weights: Optional[Dict[int, int]] = None):
         """
         Инициализация очереди.
         
         Args:
             max_size: Максимальный размер очереди
+            fair: Чередовать треки разных пользователей
+            weights: Доли пользователей в честной очереди (словарь изменяется
+                через set_weight, по умолчанию - свой)
         """
-        self._queue: deque[QueueItem] = deque()
+        # requester_id -> сколько треков подряд пользователь получает в честной очереди
+        self._weights: Dict[int, int] = weights if weights is not None else {}
+        self._queue = _FairItems(weights=self._weights) if fair else _IndexedItems()
         self._max_size = max_size
+        self._total_duration = 0
+        self._requester_counts: Dict[int, int] = {}
         self._current: Optional[QueueItem] = None
-        self._history: List[QueueItem] = []
-        self._history_limit = 10
+        # Последние сыгранные треки (старые вытесняются)
+        self._history: deque = deque(maxlen=10)
+        self._on_change: Optional[Callable[[], None]] = None
+        self._observer: Optional[QueueObserver] = None
+    
+    def set_on_change(self, callback: Optional[Callable[[], None]]):
+        """Устанавливает callback при изменении состава очереди"""
+        self._on_change = callback
+    
+    def set_observer(self, observer: Optional[QueueObserver]):
+        """Устанавливает наблюдателя за составом очереди"""
+        self._observer = observer
+    
+    def _notify_change(self):
+        """Уведомляет об изменении состава очереди"""
+        if self._on_change:
+            self._on_change()
+    
+    @property
+    def fair(self) -> bool:
+        """Включен ли режим честной очереди"""
+        return isinstance(self._queue, _FairItems)
+    
+    def set_fair(self, enabled: bool):
+        """
+        Включает или выключает честную очередь.
+        
+        При включении треки распределяются по пользователям в текущем
+        порядке, при выключении очередь остается в порядке чередования.
+        
+        Args:
+            enabled: Чередовать треки разных пользователей
+        """
+        if enabled == self.fair:
+            return
+        
+        items = self._queue.items()
+        self._queue = _FairItems(items, weights=self._weights) if enabled else _IndexedItems(items)
+        if self._observer:
+            self._observer.on_reset(self._queue.items())
+        self._notify_change()
+    
+    def set_weight(self, requester_id: int, weight: int):
+        """
+        Устанавливает долю пользователя в честной очереди.
+        
+        Args:
+            requester_id: ID пользователя
+            weight: Сколько треков подряд пользователь получает за ход (1 - поровну)
+        """
+        if weight > 1:
+            self._weights[requester_id] = weight
+        else:
+            self._weights.pop(requester_id, None)
+        if self.fair:
+            self._notify_change()
+    
+    def get_weight(self, requester_id: int) -> int:
+        """Доля пользователя в честной очереди"""
+        return self._weights.get(requester_id, 1)
     
     @property
     def current(self) -> Optional[QueueItem]:
@@ -36,10 +554,15 @@ class TrackQueue:
     @current.setter
     def current(self, item: Optional[QueueItem]):
         """Устанавливает текущий трек"""
-        if self._current and len(self._history) < self._history_limit:
+        if self._current:
             self._history.append(self._current)
         self._current = item
     
+    @property
+    def history(self) -> List[QueueItem]:
+        """Последние сыгранные треки, от старых к новым"""
+        return list(self._history)
+    
     @property
     def size(self) -> int:
         """Количество треков в очереди (без текущего)"""
@@ -58,7 +581,7 @@ class TrackQueue:
     @property
     def total_duration(self) -> int:
         """Общая длительность очереди в секундах"""
-        total = sum(item.track.duration for item in self._queue)
+        total = self._total_duration
         if self._current:
             total += self._current.track.duration
         return total
@@ -76,6 +599,46 @@ class TrackQueue:
             return f"{minutes}м {seconds}с"
         return f"{seconds}с"
     
+    def count_by_requester(self, requester_id: int) -> int:
+        """Количество треков пользователя в очереди (без текущего)"""
+        return self._requester_counts.get(requester_id, 0)
+    
+    def position_of(self, item: QueueItem) -> Optional[int]:
+        """
+        Текущая позиция элемента (1-based, с учетом текущего трека).
+        
+        Returns:
+            Позиция или None, если элемента нет в очереди
+        """
+        index = self._queue.index_of(item)
+        if index is None:
+            return None
+        return index + self._first_position
+    
+    @property
+    def _first_position(self) -> int:
+        """Позиция первого трека очереди"""
+        return 2 if self._current else 1
+    
+    def _append(self, item: QueueItem):
+        """Добавляет элемент и обновляет счетчики"""
+        self._queue.append(item)
+        self._total_duration += item.track.duration
+        self._requester_counts[item.requester_id] = self._requester_counts.get(item.requester_id, 0) + 1
+        if self._observer:
+            self._observer.on_append(item)
+    
+    def _forget(self, item: QueueItem):
+        """Обновляет счетчики после удаления элемента"""
+        self._total_duration -= item.track.duration
+        count = self._requester_counts.get(item.requester_id, 0) - 1
+        if count > 0:
+            self._requester_counts[item.requester_id] = count
+        else:
+            self._requester_counts.pop(item.requester_id, None)
+        if self._observer:
+            self._observer.on_remove(item)
+    
     def add(
         self, 
         track: Track, 
@@ -97,19 +660,17 @@ class TrackQueue:
             logger.warning("Очередь заполнена")
             return None
         
-        position = len(self._queue) + 1
-        if self._current:
-            position += 1
-        
         item = QueueItem(
             track=track,
             requester_id=requester_id,
-            requester_name=requester_name,
-            position=position
+            requester_name=requester_name
         )
         
-        self._queue.append(item)
-        logger.debug(f"Трек добавлен в очередь: {track.display_name} (позиция {position})")
+        self._append(item)
+        # В честной очереди трек может встать не в конец
+        item.position = self.position_of(item)
+        self._notify_change()
+        logger.debug(f"Трек добавлен в очередь: {track.display_name} (позиция {item.position})")
         
         return item
     
@@ -139,6 +700,31 @@ class TrackQueue:
                 added.append(item)
         return added
     
+    def requeue(self, item: QueueItem) -> QueueItem:
+        """
+        Возвращает трек в конец очереди (режим повтора очереди).
+        
+        Сыгранный элемент переиспользуется, новый создается только если
+        этот элемент все еще находится в очереди. Ограничение размера
+        не применяется: трек уже был в очереди.
+        
+        Args:
+            item: Сыгранный элемент очереди
+            
+        Returns:
+            QueueItem в конце очереди (в честной очереди - в конце треков пользователя)
+        """
+        if self._queue.index_of(item) is not None:
+            item = QueueItem(
+                track=item.track,
+                requester_id=item.requester_id,
+                requester_name=item.requester_name
+            )
+        self._append(item)
+        item.position = self.position_of(item)
+        self._notify_change()
+        return item
+    
     def get_next(self) -> Optional[QueueItem]:
         """
         Получает следующий трек из очереди.
@@ -150,7 +736,8 @@ class TrackQueue:
             return None
         
         item = self._queue.popleft()
-        self._update_positions()
+        self._forget(item)
+        self._notify_change()
         
         return item
     
@@ -161,9 +748,19 @@ class TrackQueue:
         Returns:
             Следующий QueueItem или None
         """
-        if self.is_empty:
-            return None
-        return self._queue[0]
+        return self._queue.first()
+    
+    def peek(self, count: int) -> List[QueueItem]:
+        """
+        Просматривает несколько следующих треков без удаления из очереди.
+        
+        Args:
+            count: Количество треков
+            
+        Returns:
+            Список QueueItem
+        """
+        return self._queue.slice(0, count)
     
     def remove_at(self, position: int) -> Optional[QueueItem]:
         """
@@ -176,32 +773,67 @@ class TrackQueue:
             Удаленный QueueItem или None
         """
         # Позиция 1 - это текущий трек, позиция 2 - первый в очереди
-        queue_index = position - 2 if self._current else position - 1
-        
-        if queue_index < 0 or queue_index >= len(self._queue):
+        removed = self._queue.pop_at(position - self._first_position)
+        if not removed:
             return None
         
-        # Конвертируем deque в list для удаления по индексу
-        queue_list = list(self._queue)
-        removed = queue_list.pop(queue_index)
-        self._queue = deque(queue_list)
-        
-        self._update_positions()
+        self._forget(removed)
+        self._notify_change()
         return removed
     
+    def remove(self, item: QueueItem) -> bool:
+        """
+        Удаляет конкретный элемент очереди (по item_id).
+        
+        Args:
+            item: Элемент очереди
+            
+        Returns:
+            True если элемент был в очереди
+        """
+        index = self._queue.index_of(item)
+        if index is None:
+            return False
+        
+        self._forget(self._queue.pop_at(index))
+        self._notify_change()
+        return True
+    
     def clear(self):
         """Очищает очередь"""
         self._queue.clear()
+        self._total_duration = 0
+        self._requester_counts.clear()
         self._current = None
+        if self._observer:
+            self._observer.on_reset([])
+        self._notify_change()
         logger.debug("Очередь очищена")
     
+    def clear_upcoming(self) -> int:
+        """
+        Очищает очередь, оставляя текущий трек.
+        
+        Returns:
+            Количество удаленных треков
+        """
+        cleared_count = len(self._queue)
+        self._queue.clear()
+        self._total_duration = 0
+        self._requester_counts.clear()
+        if self._observer:
+            self._observer.on_reset([])
+        self._notify_change()
+        return cleared_count
+    
     def shuffle(self):
         """Перемешивает очередь"""
-        import random
-        queue_list = list(self._queue)
+        queue_list = self._queue.items()
         random.shuffle(queue_list)
-        self._queue = deque(queue_list)
-        self._update_positions()
+        self._queue.replace_all(queue_list)
+        if self._observer:
+            self._observer.on_reset(queue_list)
+        self._notify_change()
         logger.debug("Очередь перемешана")
     
     def get_page(self, page: int = 1, per_page: int = 10) -> Tuple[List[QueueItem], int, int]:
@@ -221,21 +853,18 @@ class TrackQueue:
         page = max(1, min(page, total_pages))
         
         start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
+        items = self._queue.slice(start_idx, per_page)
         
-        items = list(self._queue)[start_idx:end_idx]
+        # Позиции обновляются только у показываемых треков
+        start_pos = start_idx + self._first_position
+        for i, item in enumerate(items):
+            item.position = start_pos + i
         
         return (items, page, total_pages)
     
     def get_all(self) -> List[QueueItem]:
         """Возвращает все треки в очереди"""
-        return list(self._queue)
-    
-    def _update_positions(self):
-        """Обновляет позиции всех треков в очереди"""
-        start_pos = 2 if self._current else 1
-        for i, item in enumerate(self._queue):
-            item.position = start_pos + i
+        return self._queue.items()
     
     def to_embed_data(self, page: int = 1, per_page: int = 10) -> dict:
         """
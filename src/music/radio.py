@@ -0,0 +1,234 @@
+"""
+Автовоспроизведение по истории переходов между треками.
+"""
+
+import dataclasses
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple, Iterable
+
+from ..database import BatchedWriter
+from .models import Track, TrackSource, intern_track
+from .youtube import YouTubeExtractor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Neighbor:
+    """Трек, который играл после другого трека"""
+    key: str
+    weight: int
+
+
+class CoOccurrenceIndex:
+    """
+    Индекс переходов между треками для автовоспроизведения.
+
+    Для каждого трека сервера хранится список треков, которые играли
+    сразу после него, от частых к редким. Список обновляется при каждом
+    воспроизведении и ограничен MAX_NEIGHBORS записями, поэтому выбор
+    следующего трека не зависит от размера истории. В памяти держатся
+    только недавно использованные треки (MAX_SEEDS списков и MAX_TRACKS
+    метаданных), а все переходы с точными весами хранятся в таблице
+    music_track_transitions и записываются пачками, как история.
+    """
+
+    # Максимум соседей одного трека в памяти
+    MAX_NEIGHBORS = 20
+    # Максимум треков со списком соседей в памяти
+    MAX_SEEDS = 10000
+    # Максимум метаданных треков в памяти
+    MAX_TRACKS = 20000
+
+    def __init__(self, db_manager=None, flush_interval: float = 10.0, batch_size: int = 100):
+        """
+        Инициализация индекса.
+
+        Args:
+            db_manager: DatabaseManager для постоянного хранения (None - только память)
+            flush_interval: Максимальная задержка записи в секундах
+            batch_size: Количество переходов, после которого запись выполняется сразу
+        """
+        self._db = db_manager
+        self._loaded = False
+
+        # ключ трека -> метаданные для воспроизведения (от давно использованных к недавним)
+        self._tracks: 'OrderedDict[str, Track]' = OrderedDict()
+        # (guild_id, ключ трека) -> следующие треки, от частых к редким
+        self._neighbors: 'OrderedDict[Tuple[int, str], List[_Neighbor]]' = OrderedDict()
+
+        # Буфер: (guild_id, prev_key, next_key) -> (трек, новые переходы)
+        self._writer: Optional[BatchedWriter] = None
+        if db_manager:
+            self._writer = BatchedWriter(
+                db_manager,
+                self._build_batches,
+                "переходы автовоспроизведения",
+                buffer_factory=dict,
+                flush_interval=flush_interval,
+                batch_size=batch_size
+            )
+
+    def __len__(self) -> int:
+        return len(self._neighbors)
+
+    @staticmethod
+    def _key(track: Track) -> str:
+        return YouTubeExtractor.get_video_id(track.url) or track.url
+
+    async def load(self):
+        """Загружает переходы из базы данных"""
+        if self._loaded or not self._db:
+            return
+        self._loaded = True
+
+        rows = await self._db.fetch_all(
+            "SELECT `guild_id`, `prev_key`, `next_key`, `title`, `artist`, `url`, "
+            "`duration`, `source`, `weight` FROM `music_track_transitions` "
+            "ORDER BY `weight` DESC"
+        )
+        for guild_id, prev_key, next_key, title, artist, url, duration, source, weight in rows:
+            neighbors = self._neighbors.get((guild_id, prev_key))
+            if neighbors is None:
+                if len(self._neighbors) >= self.MAX_SEEDS:
+                    continue
+                neighbors = self._neighbors[(guild_id, prev_key)] = []
+            if len(neighbors) >= self.MAX_NEIGHBORS:
+                continue
+            neighbors.append(_Neighbor(next_key, weight))
+
+            if next_key not in self._tracks and len(self._tracks) < self.MAX_TRACKS:
+                self._tracks[next_key] = Track(
+                    title=title or '',
+                    url=url,
+                    duration=duration or 0,
+                    artist=artist,
+                    source=TrackSource(source) if source else TrackSource.YOUTUBE
+                )
+        logger.info(f"Индекс автовоспроизведения: {len(self._neighbors)} треков")
+
+    def record(self, guild_id: int, previous: Track, track: Track):
+        """
+        Учитывает переход от одного трека к другому.
+
+        Индекс в памяти обновляется сразу, запись в БД откладывается.
+
+        Args:
+            guild_id: ID сервера
+            previous: Трек, который играл перед этим
+            track: Начавшийся трек
+        """
+        prev_key = self._key(previous)
+        next_key = self._key(track)
+        if not prev_key or not next_key or prev_key == next_key:
+            return
+
+        self._remember(next_key, dataclasses.replace(track, stream_url=None, stream_codec=None))
+
+        seed = (guild_id, prev_key)
+        neighbors = self._neighbors.get(seed)
+        if neighbors is None:
+            if len(self._neighbors) >= self.MAX_SEEDS:
+                # Давно не игравший трек уступает место (в БД переходы остаются)
+                self._neighbors.popitem(last=False)
+            neighbors = self._neighbors[seed] = []
+        else:
+            self._neighbors.move_to_end(seed)
+        self._bump(neighbors, next_key)
+
+        if not self._writer:
+            return
+
+        transition = (guild_id, prev_key, next_key)
+        pending = self._writer.pending.get(transition)
+        self._writer.pending[transition] = (track, (pending[1] if pending else 0) + 1)
+        self._writer.schedule()
+
+    def _remember(self, key: str, track: Track):
+        """Сохраняет метаданные трека, вытесняя давно не использованные"""
+        self._tracks[key] = track
+        self._tracks.move_to_end(key)
+        if len(self._tracks) > self.MAX_TRACKS:
+            self._tracks.popitem(last=False)
+
+    async def flush(self):
+        """Записывает накопленные переходы в БД"""
+        if self._writer:
+            await self._writer.flush()
+
+    @staticmethod
+    def _build_batches(
+        pending: Dict[Tuple[int, str, str], Tuple[Track, int]]
+    ) -> List[Tuple[str, List[tuple]]]:
+        """Запрос обновления переходов в БД"""
+        return [(
+            "INSERT INTO `music_track_transitions` "
+            "(guild_id, prev_key, next_key, title, artist, url, duration, source, weight) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(guild_id, prev_key, next_key) DO UPDATE SET "
+            "title = excluded.title, artist = excluded.artist, url = excluded.url, "
+            "duration = excluded.duration, source = excluded.source, "
+            "weight = music_track_transitions.weight + excluded.weight",
+            [
+                transition + (track.title, track.artist, track.url,
+                              track.duration, track.source.value, weight)
+                for transition, (track, weight) in pending.items()
+            ]
+        )]
+
+    def _bump(self, neighbors: List[_Neighbor], key: str):
+        """Увеличивает вес соседа, сохраняя порядок списка"""
+        for index, neighbor in enumerate(neighbors):
+            if neighbor.key == key:
+                neighbor.weight += 1
+                break
+        else:
+            if len(neighbors) < self.MAX_NEIGHBORS:
+                index = len(neighbors)
+                neighbors.append(_Neighbor(key, 1))
+            elif neighbors[-1].weight <= 1:
+                # Самый редкий сосед уступает место новому
+                index = len(neighbors) - 1
+                neighbors[index] = _Neighbor(key, 1)
+            else:
+                # Остальные соседи чаще: новый переход учтен только в БД
+                return
+
+        # Список отсортирован, поэтому элемент сдвигается только вверх
+        while index > 0 and neighbors[index - 1].weight < neighbors[index].weight:
+            neighbors[index - 1], neighbors[index] = neighbors[index], neighbors[index - 1]
+            index -= 1
+
+    def pick(self, guild_id: int, recent: Iterable[Track]) -> Optional[Track]:
+        """
+        Выбирает следующий трек для автовоспроизведения.
+
+        Берется самый частый переход от последнего трека; если все его
+        соседи недавно играли - от предыдущих треков.
+
+        Args:
+            guild_id: ID сервера
+            recent: Недавно сыгранные треки, от старых к новым
+
+        Returns:
+            Общий экземпляр трека (intern_track) для добавления в очередь или None
+        """
+        recent = list(recent)
+        recent_keys = {self._key(track) for track in recent}
+
+        for seed in reversed(recent):
+            for neighbor in self._neighbors.get((guild_id, self._key(seed)), ()):
+                if neighbor.key in recent_keys:
+                    continue
+                track = self._tracks.get(neighbor.key)
+                if track is None:
+                    # Метаданные вытеснены из памяти
+                    continue
+                self._tracks.move_to_end(neighbor.key)
+                return intern_track(
+                    dataclasses.replace(track),
+                    YouTubeExtractor.get_video_id(track.url)
+                )
+        return None
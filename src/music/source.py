@@ -0,0 +1,465 @@
+"""
+Аудио источник плеера с бесшовным переходом между треками.
+"""
+
+import logging
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Optional, Callable, Deque, Tuple
+
+import discord
+
+try:
+    import audioop
+except ImportError:  # Python 3.13+ без audioop-lts
+    audioop = None
+
+logger = logging.getLogger(__name__)
+
+# Длительность одного кадра Discord в секундах
+FRAME_DURATION = 0.02
+
+# Кадры тишины: Opus и PCM (20 мс, 48 кГц, стерео, 16 бит)
+OPUS_SILENCE = b'\xf8\xff\xfe'
+PCM_SILENCE = b'\0' * 3840
+
+
+def find_ffmpeg_process(source: discord.AudioSource) -> Optional[subprocess.Popen]:
+    """Находит процесс ffmpeg источника"""
+    # PCMVolumeTransformer и BufferedSource хранят исходный источник в original/source
+    while not isinstance(source, discord.FFmpegAudio):
+        source = getattr(source, 'original', None) or getattr(source, 'source', None)
+        if source is None:
+            return None
+    return getattr(source, '_process', None) or None
+
+
+def _cleanup(source: discord.AudioSource):
+    """Освобождает источник, не пропуская ошибки наружу"""
+    try:
+        source.cleanup()
+    except Exception as e:
+        logger.debug(f"Ошибка освобождения источника: {e}")
+
+
+def release_later(source: discord.AudioSource):
+    """
+    Освобождает источник в отдельном потоке.
+
+    Завершение ffmpeg ждет выхода процесса, поэтому не выполняется ни в
+    аудио потоке, ни в event loop.
+    """
+    threading.Thread(target=_cleanup, args=(source,), name='source-cleanup', daemon=True).start()
+
+
+class BufferedSource(discord.AudioSource):
+    """
+    Источник с заранее прочитанными кадрами.
+
+    Процесс ffmpeg запускается при создании источника, а prebuffer()
+    читает первые кадры до начала воспроизведения, чтобы переход на этот
+    источник не ждал сети и запуска ffmpeg.
+    """
+
+    def __init__(self, source: discord.AudioSource):
+        self.source = source
+        self._buffer: Deque[bytes] = deque()
+
+    def prebuffer(self, frames: int) -> int:
+        """
+        Читает кадры заранее. Блокирующий вызов, выполняется вне event loop.
+
+        Returns:
+            Количество прочитанных кадров
+        """
+        for _ in range(frames):
+            data = self.source.read()
+            if not data:
+                break
+            self._buffer.append(data)
+        return len(self._buffer)
+
+    def read(self) -> bytes:
+        if self._buffer:
+            return self._buffer.popleft()
+        return self.source.read()
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self._buffer.clear()
+        self.source.cleanup()
+
+
+class PlaybackSource(discord.AudioSource):
+    """
+    Обертка над источником текущего трека.
+
+    Если заранее подготовлен источник следующего трека (arm_next), то по
+    окончании текущего чтение сразу продолжается из следующего, без вызова
+    after-callback VoiceClient и запуска ffmpeg в момент перехода.
+    Для PCM источников поддерживается плавный переход (crossfade).
+    Также измеряет паузу между треками в миллисекундах.
+    """
+
+    def __init__(
+        self,
+        source: discord.AudioSource,
+        duration: int = 0,
+        gap_started_at: Optional[float] = None,
+        on_gap: Optional[Callable[[float], None]] = None,
+        offset: float = 0.0,
+        on_first_frame: Optional[Callable[[float, float], None]] = None,
+        on_interrupted: Optional[Callable[[float], None]] = None,
+        resume_tolerance: float = 5.0,
+        hold_timeout: float = 20.0
+    ):
+        """
+        Args:
+            source: Источник текущего трека
+            duration: Длительность трека в секундах (0 - неизвестна)
+            gap_started_at: Момент окончания предыдущего трека (time.perf_counter)
+            on_gap: Вызывается с длительностью паузы перехода в миллисекундах
+            offset: Позиция в треке, с которой начинается источник (в секундах)
+            on_first_frame: Вызывается при первом кадре с задержкой от создания
+                обертки в миллисекундах и моментом кадра (time.perf_counter)
+            on_interrupted: Вызывается с позицией, если источник закончился раньше
+                длительности трека больше чем на resume_tolerance секунд
+            resume_tolerance: Допустимая разница между концом источника и длительностью
+            hold_timeout: Сколько секунд после обрыва ждать replace(), отдавая тишину
+        """
+        self._source = source
+        self._duration = duration
+        self._on_gap = on_gap
+        self._lock = threading.Lock()
+
+        self._next: Optional[BufferedSource] = None
+        self._next_duration = 0
+        self._on_switch: Optional[Callable[[], None]] = None
+        self._crossfade_frames = 0
+
+        # Кадры текущего трека, отправленные с позиции offset
+        self.frames = 0
+        self._offset = offset
+        self._gap_started_at = gap_started_at
+        self._last_read_at: Optional[float] = None
+        self._created_at = time.perf_counter()
+        self._on_first_frame = on_first_frame
+        # Момент, когда источник закончился без следующего трека
+        self.ended_at: Optional[float] = None
+
+        # После обрыва потока вместо завершения трека отдается тишина, пока
+        # плеер получает новый URL и вызывает replace()
+        self._on_interrupted = on_interrupted
+        self._resume_tolerance = resume_tolerance
+        self._hold_timeout = hold_timeout
+        self._held_since: Optional[float] = None
+        # Поток не удалось восстановить, трек завершен с обрывом
+        self.recovery_failed = False
+        # Начало чтения, которое еще не вернулось (для поиска зависшего ffmpeg)
+        self._read_started_at: Optional[float] = None
+
+    @property
+    def duration(self) -> int:
+        """Длительность текущего трека в секундах"""
+        return self._duration
+
+    @property
+    def position(self) -> float:
+        """Позиция в текущем треке в секундах"""
+        return self._offset + self.frames * FRAME_DURATION
+
+    @property
+    def current_source(self) -> discord.AudioSource:
+        """Источник, который воспроизводится сейчас"""
+        if isinstance(self._source, BufferedSource):
+            return self._source.source
+        return self._source
+
+    @property
+    def is_armed(self) -> bool:
+        """Подготовлен ли следующий трек"""
+        return self._next is not None
+
+    def can_chain(self, source: discord.AudioSource) -> bool:
+        """Можно ли бесшовно продолжить воспроизведение этим источником"""
+        # Кодировщик VoiceClient создается один раз, тип данных менять нельзя
+        return source.is_opus() == self._source.is_opus()
+
+    def arm_next(
+        self,
+        source: BufferedSource,
+        duration: int,
+        on_switch: Callable[[], None],
+        crossfade_ms: int = 0
+    ) -> bool:
+        """
+        Подготавливает следующий трек.
+
+        Args:
+            source: Источник следующего трека с заранее прочитанными кадрами
+            duration: Длительность следующего трека в секундах
+            on_switch: Вызывается из аудио потока в момент перехода
+            crossfade_ms: Длительность плавного перехода (только PCM)
+
+        Returns:
+            True если источник принят
+        """
+        if not self.can_chain(source):
+            return False
+
+        crossfade_frames = 0
+        if crossfade_ms and audioop and not source.is_opus() and self._duration:
+            crossfade_frames = int(crossfade_ms / 1000 / FRAME_DURATION)
+
+        with self._lock:
+            if self._next:
+                release_later(self._next)
+            self._next = source
+            self._next_duration = duration
+            self._on_switch = on_switch
+            self._crossfade_frames = crossfade_frames
+        return True
+
+    def disarm(self):
+        """Отменяет подготовленный следующий трек"""
+        with self._lock:
+            if self._next:
+                release_later(self._next)
+            self._next = None
+            self._on_switch = None
+            self._crossfade_frames = 0
+
+    @property
+    def is_holding(self) -> bool:
+        """Ожидает ли обертка новый источник после обрыва"""
+        return self._held_since is not None
+
+    def stalled_for(self, now: float) -> float:
+        """Сколько секунд длится незавершенное чтение источника"""
+        started = self._read_started_at
+        return now - started if started is not None else 0.0
+
+    def read(self) -> bytes:
+        self._read_started_at = time.perf_counter()
+        try:
+            data, is_track = self._read_frame()
+        finally:
+            self._read_started_at = None
+
+        if not is_track:
+            # Тишина не двигает позицию трека
+            return data
+        if data:
+            self._count_frame()
+        elif self.ended_at is None:
+            self.ended_at = time.perf_counter()
+        return data
+
+    def _read_frame(self) -> Tuple[bytes, bool]:
+        """
+        Читает кадр текущего трека.
+
+        Блокировка защищает только выбор и смену источника: само чтение может
+        ждать ffmpeg, и replace() или disarm() из event loop не должны ждать
+        вместе с ним. После чтения проверяется, что источник не сменился.
+
+        Returns:
+            Кортеж (кадр, кадр ли это трека, а не тишина)
+        """
+        with self._lock:
+            if self._held_since is not None:
+                data = self._hold()
+                # Пустой кадр после тишины завершает трек
+                return data, not data
+
+            source = self._source
+            upcoming = None
+            fade_start = 0
+            if self._next and self._crossfade_frames:
+                end_frame = int((self._duration - self._offset) / FRAME_DURATION)
+                fade_start = end_frame - self._crossfade_frames
+                if self.frames >= fade_start:
+                    upcoming = self._next
+
+        try:
+            data = source.read()
+        except Exception:
+            # replace() освободил источник во время чтения
+            if self._source is source:
+                raise
+            data = b''
+        upcoming_data = b''
+        if upcoming is not None:
+            try:
+                upcoming_data = upcoming.read()
+            except Exception:
+                # disarm() освободил следующий источник во время чтения
+                if self._next is upcoming:
+                    raise
+
+        with self._lock:
+            if self._source is not source:
+                # Кадр прочитан из замененного источника
+                return self._silence(), False
+
+            if upcoming is not None and self._next is upcoming:
+                return self._crossfade(data, upcoming_data, fade_start), True
+
+            if data:
+                return data, True
+
+            if not self._next:
+                if self._is_premature_end():
+                    self._held_since = time.perf_counter()
+                    self._on_interrupted(self.position)
+                    return self._silence(), False
+                return data, True
+
+            self._switch()
+
+        # Первый кадр следующего трека читается так же, вне блокировки
+        return self._read_frame()
+
+    def _is_premature_end(self) -> bool:
+        """Закончился ли источник заметно раньше длительности трека"""
+        if self._on_interrupted is None or self.recovery_failed or not self._duration:
+            return False
+        return self.position < self._duration - self._resume_tolerance
+
+    def _silence(self) -> bytes:
+        return OPUS_SILENCE if self._source.is_opus() else PCM_SILENCE
+
+    def _hold(self) -> bytes:
+        """Отдает тишину, пока не пришел новый источник"""
+        if not self.recovery_failed and time.perf_counter() - self._held_since < self._hold_timeout:
+            return self._silence()
+
+        # Новый источник не пришел: трек завершается
+        self._held_since = None
+        self.recovery_failed = True
+        return b''
+
+    def abandon(self):
+        """Отказ от восстановления: следующее чтение завершит трек"""
+        self.recovery_failed = True
+
+    def abort(self) -> bool:
+        """
+        Завершает процесс ffmpeg текущего источника.
+
+        Используется для зависшего потока: чтение блокировано внутри ffmpeg
+        и вернется только после завершения процесса. После этого источник
+        заканчивается и обрабатывается как обрыв.
+
+        Returns:
+            True если процесс найден
+        """
+        process = find_ffmpeg_process(self.current_source)
+        if process is None:
+            return False
+        try:
+            process.kill()
+        except OSError as e:
+            logger.debug(f"Ошибка завершения ffmpeg: {e}")
+        return True
+
+    def _crossfade(self, current: bytes, upcoming: bytes, fade_start: int) -> bytes:
+        """Смешивает окончание текущего трека с началом следующего"""
+        progress = (self.frames - fade_start) / self._crossfade_frames
+
+        if not current or progress >= 1:
+            # Следующий трек уже играет с уже прочитанной позиции
+            mixed_frames = self.frames - fade_start
+            self._switch()
+            self.frames = mixed_frames
+            return upcoming
+
+        if not upcoming:
+            return current
+
+        size = max(len(current), len(upcoming))
+        current = current.ljust(size, b'\0')
+        upcoming = upcoming.ljust(size, b'\0')
+        return audioop.add(
+            audioop.mul(current, 2, 1 - progress),
+            audioop.mul(upcoming, 2, progress),
+            2
+        )
+
+    def _switch(self):
+        """Переключается на подготовленный следующий трек (под блокировкой)"""
+        previous = self._source
+        self._source = self._next
+        self._duration = self._next_duration
+        on_switch = self._on_switch
+
+        self._next = None
+        self._on_switch = None
+        self._crossfade_frames = 0
+        self.frames = 0
+        self._offset = 0.0
+
+        # Паузой считается задержка сверх обычного интервала между кадрами
+        self._gap_started_at = (self._last_read_at + FRAME_DURATION) if self._last_read_at else None
+
+        release_later(previous)
+
+        if on_switch:
+            on_switch()
+
+    def replace(self, source: discord.AudioSource, offset: float) -> bool:
+        """
+        Заменяет источник текущего трека, например после перемотки.
+
+        VoiceClient продолжает читать эту обертку, поэтому after-callback
+        не вызывается и трек не считается завершенным.
+
+        Args:
+            source: Новый источник того же трека
+            offset: Позиция, с которой начинается новый источник
+
+        Returns:
+            True если источник заменен
+        """
+        if not self.can_chain(source):
+            return False
+
+        with self._lock:
+            previous = self._source
+            self._source = source
+            self._offset = offset
+            self.frames = 0
+            self.ended_at = None
+            self._held_since = None
+            self.recovery_failed = False
+
+        release_later(previous)
+        return True
+
+    def _count_frame(self):
+        """Учитывает отправленный кадр"""
+        now = time.perf_counter()
+        if self._gap_started_at is not None:
+            gap_ms = max(0.0, (now - self._gap_started_at) * 1000)
+            self._gap_started_at = None
+            if self._on_gap:
+                self._on_gap(gap_ms)
+        if self._on_first_frame:
+            on_first_frame, self._on_first_frame = self._on_first_frame, None
+            on_first_frame((now - self._created_at) * 1000, now)
+        self._last_read_at = now
+        self.frames += 1
+
+    def is_opus(self) -> bool:
+        return self._source.is_opus()
+
+    def cleanup(self):
+        with self._lock:
+            if self._next:
+                self._next.cleanup()
+                self._next = None
+            self._source.cleanup()
@@ -5,14 +5,17 @@
 import asyncio
 import logging
 import re
-from typing import Optional, List, Tuple
+from collections import deque
+from typing import Optional, List, Tuple, AsyncIterator, Deque
 from concurrent.futures import ThreadPoolExecutor
 
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 
-from .models import Track, TrackSource
+from .models import Track, TrackSource, intern_track
 from .youtube import YouTubeExtractor
+from .match_cache import SpotifyMatchCache, SpotifyMatch
+from .health import UpstreamHealth, UpstreamUnavailable
 
 logger = logging.getLogger(__name__)
 
@@ -31,11 +34,22 @@ class SpotifyClient:
         r'(https?://open\.spotify\.com/playlist/|spotify:playlist:)([a-zA-Z0-9]+)'
     )
     
+    # Постраничная загрузка плейлистов: только нужные для поиска поля
+    PLAYLIST_PAGE_SIZE = 100
+    PLAYLIST_ITEM_FIELDS = (
+        'next,items(track(id,name,duration_ms,external_ids(isrc),'
+        'artists(name),album(name,images)))'
+    )
+    
     def __init__(
         self, 
         client_id: str, 
         client_secret: str,
-        youtube_extractor: YouTubeExtractor
+        youtube_extractor: YouTubeExtractor,
+        match_concurrency: int = 4,
+        match_timeout: float = 15.0,
+        match_cache: Optional[SpotifyMatchCache] = None,
+        health: Optional[UpstreamHealth] = None
     ):
         """
         Инициализация клиента Spotify.
@@ -44,10 +58,18 @@ class SpotifyClient:
             client_id: Spotify Client ID
             client_secret: Spotify Client Secret
             youtube_extractor: Экземпляр YouTubeExtractor для поиска треков
+            match_concurrency: Количество одновременных поисков на YouTube
+            match_timeout: Таймаут поиска одного трека в секундах
+            match_cache: Кэш соответствий Spotify -> YouTube
+            health: Состояние внешних сервисов (по умолчанию - общее с youtube_extractor)
         """
         self._enabled = bool(client_id and client_secret)
         self._youtube = youtube_extractor
         self._executor = ThreadPoolExecutor(max_workers=2)
+        self._match_concurrency = max(1, match_concurrency)
+        self._match_timeout = match_timeout
+        self._match_cache = match_cache or SpotifyMatchCache()
+        self._breaker = (health or youtube_extractor.health).breaker(UpstreamHealth.SPOTIFY)
         
         if self._enabled:
             try:
@@ -129,39 +151,15 @@ class SpotifyClient:
         track_id = extracted[1]
         
         try:
-            loop = asyncio.get_event_loop()
-            track_data = await loop.run_in_executor(
-                self._executor,
-                lambda: self._spotify.track(track_id)
-            )
+            track_data = await self._call_api(lambda: self._spotify.track(track_id))
             
             if not track_data:
                 return None
             
-            # Формируем поисковый запрос для YouTube
-            search_query = self._build_search_query(track_data)
-            
-            # Ищем на YouTube
-            youtube_tracks = await self._youtube.search(search_query, max_results=1)
-            
-            if not youtube_tracks:
-                logger.warning(f"Трек не найден на YouTube: {search_query}")
-                return None
-            
-            track = youtube_tracks[0]
-            
-            # Обновляем метаданные из Spotify
-            track.title = track_data['name']
-            track.artist = ', '.join(a['name'] for a in track_data['artists'])
-            track.album = track_data['album']['name']
-            track.source = TrackSource.SPOTIFY
-            
-            # Используем обложку из Spotify если есть
-            if track_data['album']['images']:
-                track.thumbnail = track_data['album']['images'][0]['url']
-            
-            return track
+            return await self._match_track(track_data)
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Ошибка получения трека Spotify: {e}")
             return None
@@ -177,111 +175,372 @@ class SpotifyClient:
         Returns:
             Список Track объектов
         """
+        tracks = [track async for track in self.iter_album_tracks(url, max_tracks)]
+        logger.info(f"Извлечено {len(tracks)} треков из альбома Spotify")
+        return tracks
+    
+    async def get_playlist_tracks(self, url: str, max_tracks: int = 50) -> List[Track]:
+        """
+        Получает треки из плейлиста Spotify.
+        
+        Args:
+            url: Spotify URL или URI плейлиста
+            max_tracks: Максимальное количество треков
+            
+        Returns:
+            Список Track объектов
+        """
+        tracks = [track async for track in self.iter_playlist_tracks(url, max_tracks)]
+        logger.info(f"Извлечено {len(tracks)} треков из плейлиста Spotify")
+        return tracks
+    
+    async def iter_album_tracks(
+        self,
+        url: str,
+        max_tracks: Optional[int] = None
+    ) -> AsyncIterator[Track]:
+        """
+        Находит треки альбома Spotify на YouTube и отдает их по мере готовности.
+        
+        Треки альбома запрашиваются постранично, в памяти держится одна страница.
+        
+        Args:
+            url: Spotify URL или URI альбома
+            max_tracks: Максимальное количество треков (None - без ограничения)
+            
+        Yields:
+            Track объекты в порядке альбома
+        """
         if not self._enabled:
-            return []
+            return
         
         extracted = self._extract_spotify_id(url)
         if not extracted or extracted[0] != 'album':
-            return []
+            return
         
         album_id = extracted[1]
         
         try:
-            loop = asyncio.get_event_loop()
-            album_data = await loop.run_in_executor(
-                self._executor,
-                lambda: self._spotify.album(album_id)
-            )
-            
-            if not album_data or 'tracks' not in album_data:
-                return []
-            
-            tracks = []
-            album_name = album_data['name']
-            album_image = album_data['images'][0]['url'] if album_data['images'] else None
-            
-            items = album_data['tracks']['items'][:max_tracks]
-            
-            for item in items:
-                search_query = self._build_search_query_from_item(item, album_name)
-                youtube_tracks = await self._youtube.search(search_query, max_results=1)
-                
-                if youtube_tracks:
-                    track = youtube_tracks[0]
-                    track.title = item['name']
-                    track.artist = ', '.join(a['name'] for a in item['artists'])
-                    track.album = album_name
-                    track.source = TrackSource.SPOTIFY
-                    if album_image:
-                        track.thumbnail = album_image
-                    tracks.append(track)
-            
-            logger.info(f"Извлечено {len(tracks)} треков из альбома Spotify")
-            return tracks
-            
+            album_data = await self._call_api(lambda: self._spotify.album(album_id))
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Ошибка получения альбома Spotify: {e}")
-            return []
+            return
+        
+        if not album_data or 'tracks' not in album_data:
+            return
+        
+        album_name = album_data['name']
+        album_image = album_data['images'][0]['url'] if album_data['images'] else None
+        
+        # Первая страница треков приходит вместе с альбомом
+        items = self._iter_pages(album_data['tracks'], max_tracks)
+        
+        async for track in self._match_tracks(items, album_name, album_image):
+            yield track
     
-    async def get_playlist_tracks(self, url: str, max_tracks: int = 50) -> List[Track]:
+    async def iter_playlist_tracks(
+        self,
+        url: str,
+        max_tracks: Optional[int] = None
+    ) -> AsyncIterator[Track]:
         """
-        Получает треки из плейлиста Spotify.
+        Находит треки плейлиста Spotify на YouTube и отдает их по мере готовности.
+        
+        Треки плейлиста запрашиваются постранично, в памяти держится одна страница.
         
         Args:
             url: Spotify URL или URI плейлиста
-            max_tracks: Максимальное количество треков
+            max_tracks: Максимальное количество треков (None - без ограничения)
             
-        Returns:
-            Список Track объектов
+        Yields:
+            Track объекты в порядке плейлиста
         """
         if not self._enabled:
-            return []
+            return
         
         extracted = self._extract_spotify_id(url)
         if not extracted or extracted[0] != 'playlist':
-            return []
+            return
         
         playlist_id = extracted[1]
         
         try:
-            loop = asyncio.get_event_loop()
-            playlist_data = await loop.run_in_executor(
-                self._executor,
-                lambda: self._spotify.playlist(playlist_id)
+            first_page = await self._call_api(
+                lambda: self._spotify.playlist_items(
+                    playlist_id,
+                    fields=self.PLAYLIST_ITEM_FIELDS,
+                    limit=self.PLAYLIST_PAGE_SIZE,
+                    additional_types=('track',)
+                )
             )
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка получения плейлиста Spotify: {e}")
+            return
+        
+        if not first_page:
+            return
+        
+        items = self._iter_pages(first_page, max_tracks, item_key='track')
+        
+        async for track in self._match_tracks(items):
+            yield track
+    
+    async def _iter_pages(
+        self,
+        page: dict,
+        max_tracks: Optional[int] = None,
+        item_key: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Проходит по страницам ответа Spotify API.
+        
+        Следующая страница запрашивается только когда предыдущая прочитана.
+        
+        Args:
+            page: Первая страница (объект paging Spotify API)
+            max_tracks: Максимальное количество треков
+            item_key: Ключ трека внутри элемента страницы (для плейлистов)
             
-            if not playlist_data or 'tracks' not in playlist_data:
-                return []
-            
-            tracks = []
-            items = playlist_data['tracks']['items'][:max_tracks]
-            
-            for item in items:
-                if not item.get('track'):
+        Yields:
+            Данные треков
+        """
+        count = 0
+        
+        while page:
+            for item in page.get('items') or []:
+                track_data = item.get(item_key) if item_key else item
+                # Локальные файлы и удаленные треки не имеют ID
+                if not track_data or not track_data.get('id'):
                     continue
                 
-                track_data = item['track']
-                search_query = self._build_search_query(track_data)
-                youtube_tracks = await self._youtube.search(search_query, max_results=1)
-                
-                if youtube_tracks:
-                    track = youtube_tracks[0]
-                    track.title = track_data['name']
-                    track.artist = ', '.join(a['name'] for a in track_data['artists'])
-                    track.album = track_data['album']['name']
-                    track.source = TrackSource.SPOTIFY
-                    
-                    if track_data['album']['images']:
-                        track.thumbnail = track_data['album']['images'][0]['url']
-                    
-                    tracks.append(track)
+                yield track_data
+                count += 1
+                if max_tracks is not None and count >= max_tracks:
+                    return
             
-            logger.info(f"Извлечено {len(tracks)} треков из плейлиста Spotify")
-            return tracks
+            if not page.get('next'):
+                return
             
-        except Exception as e:
-            logger.error(f"Ошибка получения плейлиста Spotify: {e}")
-            return []
+            current = page
+            try:
+                page = await self._call_api(lambda: self._spotify.next(current))
+            except UpstreamUnavailable:
+                # Без этого плейлист молча обрезался бы на отключении Spotify
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка получения страницы Spotify: {e}")
+                return
+    
+    async def _call_api(self, request):
+        """
+        Выполняет запрос к Spotify API в пуле потоков.
+        
+        Raises:
+            UpstreamUnavailable: Spotify отключен после серии ошибок
+        """
+        self._breaker.check()
+        loop = asyncio.get_event_loop()
+        try:
+            result = await loop.run_in_executor(self._executor, request)
+        except spotipy.SpotifyException as e:
+            # Ошибки запроса (неверный ID, нет доступа) - сервис при этом работает
+            if e.http_status and 400 <= e.http_status < 500 and e.http_status != 429:
+                self._breaker.record_success()
+            else:
+                self._breaker.record_failure()
+            raise
+        except Exception:
+            self._breaker.record_failure()
+            raise
+        
+        self._breaker.record_success()
+        return result
+    
+    async def _match_tracks(
+        self,
+        items: AsyncIterator[dict],
+        album_name: Optional[str] = None,
+        album_image: Optional[str] = None
+    ) -> AsyncIterator[Track]:
+        """
+        Параллельно ищет треки Spotify на YouTube.
+        
+        Одновременно выполняется не более match_concurrency поисков, каждый
+        ограничен таймаутом. Результаты отдаются в исходном порядке сразу,
+        как только готов очередной трек.
+        
+        Args:
+            items: Данные треков из Spotify API
+            album_name: Название альбома (для треков альбома)
+            album_image: Обложка альбома (для треков альбома)
+            
+        Yields:
+            Найденные Track объекты
+        """
+        semaphore = asyncio.Semaphore(self._match_concurrency)
+        # Окно опережения: поиск идет дальше, пока ждем медленный трек в начале
+        window = self._match_concurrency * 2
+        pending: Deque[asyncio.Task] = deque()
+        
+        async def match(track_data: dict):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        self._match_track(track_data, album_name, album_image),
+                        timeout=self._match_timeout
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"Таймаут поиска на YouTube: {track_data.get('name')}")
+                    return None
+                except UpstreamUnavailable:
+                    # Остальные треки тоже не найти: сборка прерывается
+                    raise
+                except Exception as e:
+                    logger.error(f"Ошибка поиска трека Spotify на YouTube: {e}")
+                    return None
+        
+        exhausted = False
+        
+        async def fill_window():
+            nonlocal exhausted
+            while not exhausted and len(pending) < window:
+                try:
+                    track_data = await items.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    return
+                pending.append(asyncio.ensure_future(match(track_data)))
+        
+        try:
+            await fill_window()
+            while pending:
+                track = await pending.popleft()
+                await fill_window()
+                if track:
+                    yield track
+        finally:
+            for task in pending:
+                task.cancel()
+            await items.aclose()
+    
+    async def _match_track(
+        self,
+        track_data: dict,
+        album_name: Optional[str] = None,
+        album_image: Optional[str] = None
+    ) -> Optional[Track]:
+        """
+        Ищет один трек Spotify на YouTube и переносит метаданные Spotify.
+        
+        Args:
+            track_data: Данные трека из Spotify API
+            album_name: Название альбома (если нет в данных трека)
+            album_image: Обложка альбома (если нет в данных трека)
+            
+        Returns:
+            Track объект или None
+        """
+        spotify_id = track_data.get('id')
+        isrc = (track_data.get('external_ids') or {}).get('isrc')
+        
+        # Ранее найденные треки не требуют поиска на YouTube
+        cached = await self._match_cache.get(spotify_id, isrc) if spotify_id else None
+        if cached:
+            track = Track(
+                title=cached.title,
+                url=self._youtube.get_video_url(cached.video_id),
+                duration=cached.duration
+            )
+            return self._with_metadata(track, track_data, album_name, album_image)
+        
+        search_query = self._build_search_query(track_data)
+        youtube_tracks = await self._youtube.search(search_query, max_results=1)
+        
+        if not youtube_tracks:
+            logger.warning(f"Трек не найден на YouTube: {search_query}")
+            return None
+        
+        track = youtube_tracks[0]
+        
+        video_id = self._youtube.get_video_id(track.url)
+        if spotify_id and video_id:
+            await self._match_cache.put(
+                spotify_id,
+                isrc,
+                SpotifyMatch(
+                    video_id=video_id,
+                    title=track.title,
+                    duration=track.duration,
+                    confidence=self._score_match(track_data, track)
+                )
+            )
+        
+        return self._with_metadata(track, track_data, album_name, album_image)
+    
+    def _score_match(self, track_data: dict, track: Track) -> float:
+        """
+        Оценивает уверенность в том, что видео YouTube соответствует треку Spotify.
+        
+        Учитывает совпадение длительности и слов названия трека.
+        
+        Returns:
+            Уверенность от 0 до 1
+        """
+        duration_ms = track_data.get('duration_ms') or 0
+        if duration_ms and track.duration:
+            # До 3 секунд разницы - полное совпадение, 30 секунд и больше - нет
+            diff = abs(duration_ms / 1000 - track.duration)
+            duration_score = 1.0 - min(1.0, max(0.0, diff - 3) / 27)
+        else:
+            duration_score = 0.5
+        
+        title_words = set(re.findall(r'\w+', track_data.get('name', '').lower()))
+        found_words = set(re.findall(r'\w+', f"{track.title} {track.artist or ''}".lower()))
+        if title_words:
+            title_score = len(title_words & found_words) / len(title_words)
+        else:
+            title_score = 0.5
+        
+        return round(0.6 * duration_score + 0.4 * title_score, 3)
+    
+    def _with_metadata(
+        self,
+        track: Track,
+        track_data: dict,
+        album_name: Optional[str] = None,
+        album_image: Optional[str] = None
+    ) -> Track:
+        """
+        Создает трек с метаданными Spotify для найденного на YouTube видео.
+        
+        Трек YouTube не изменяется: это общий экземпляр, который может
+        находиться в чужих очередях и кэше.
+        """
+        album = track_data.get('album') or {}
+        
+        # Используем обложку из Spotify если есть
+        thumbnail = track.thumbnail
+        if album.get('images'):
+            thumbnail = album['images'][0]['url']
+        elif album_image:
+            thumbnail = album_image
+        
+        spotify_track = Track(
+            title=track_data['name'],
+            url=track.url,
+            duration=track.duration,
+            thumbnail=thumbnail,
+            artist=', '.join(a['name'] for a in track_data['artists']),
+            album=album.get('name') or album_name,
+            source=TrackSource.SPOTIFY,
+            stream_url=track.stream_url,
+            stream_codec=track.stream_codec
+        )
+        return intern_track(spotify_track, self._youtube.get_video_id(track.url), track_data.get('id'))
     
     def _build_search_query(self, track_data: dict) -> str:
         """Формирует поисковый запрос для YouTube из данных трека Spotify"""
@@ -289,12 +548,6 @@ class SpotifyClient:
         title = track_data.get('name', '')
         return f"{artists} - {title}"
     
-    def _build_search_query_from_item(self, item: dict, album_name: str = '') -> str:
-        """Формирует поисковый запрос из элемента трека"""
-        artists = ', '.join(a['name'] for a in item.get('artists', []))
-        title = item.get('name', '')
-        return f"{artists} - {title}"
-    
     def __del__(self):
         """Освобождает ресурсы"""
         if hasattr(self, '_executor'):
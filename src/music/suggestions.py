@@ -0,0 +1,347 @@
+"""
+Подсказки для /play по ранее воспроизведенным трекам.
+"""
+
+import heapq
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Set, Tuple
+
+from ..database import BatchedWriter
+from .models import Track
+from .youtube import YouTubeExtractor
+
+logger = logging.getLogger(__name__)
+
+_WORD_REGEX = re.compile(r'\w+')
+
+
+def _normalize(text: str) -> str:
+    return (text or '').casefold().replace('ё', 'е')
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_REGEX.findall(_normalize(text))
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {' '.join(_words(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(slots=True)
+class IndexedTrack:
+    """Трек в индексе подсказок"""
+    key: str
+    url: str
+    title: str
+    artist: Optional[str]
+    plays: int = 0
+
+    @property
+    def display_name(self) -> str:
+        if self.artist:
+            return f"{self.artist} - {self.title}"
+        return self.title
+
+
+class TrackIndex:
+    """
+    Индекс подсказок по названиям и исполнителям воспроизведенных треков.
+
+    Поиск выполняется только в памяти: каждое слово запроса ищется по
+    префиксам слов трека, при отсутствии совпадений (опечатка, слово из
+    середины) - по общим триграммам. Результаты упорядочены по числу
+    воспроизведений. Индекс обновляется при каждом воспроизведении без
+    перестроения: трек переставляется в рейтинге за O(1), а при
+    превышении max_tracks вытесняется самый редкий трек.
+
+    Записи хранятся в таблице music_track_index и, как история
+    воспроизведения, записываются пачками раз в flush_interval секунд или
+    при накоплении batch_size треков.
+    """
+
+    # Длина самого длинного индексируемого префикса слова
+    MAX_PREFIX = 12
+
+    # Если совпадений больше 1/SCAN_RATIO всех треков, они выбираются
+    # проходом по рейтингу, а не сортировкой совпадений
+    SCAN_RATIO = 20
+
+    def __init__(
+        self,
+        db_manager=None,
+        limit: int = 25,
+        max_tracks: int = 5000,
+        flush_interval: float = 10.0,
+        batch_size: int = 100
+    ):
+        """
+        Инициализация индекса.
+
+        Args:
+            db_manager: DatabaseManager для постоянного хранения (None - только память)
+            limit: Максимальное количество подсказок
+            max_tracks: Максимальное количество треков в памяти
+            flush_interval: Максимальная задержка записи в секундах
+            batch_size: Количество треков, после которого запись выполняется сразу
+        """
+        self._db = db_manager
+        self._limit = limit
+        self._max_tracks = max(1, max_tracks)
+        self._loaded = False
+
+        # Буфер: ключ трека -> (URL, название, исполнитель, новые воспроизведения)
+        self._writer: Optional[BatchedWriter] = None
+        if db_manager:
+            self._writer = BatchedWriter(
+                db_manager,
+                self._build_batches,
+                "индекс подсказок",
+                buffer_factory=dict,
+                flush_interval=flush_interval,
+                batch_size=batch_size
+            )
+
+        self._tracks: Dict[str, IndexedTrack] = {}
+        # префикс слова -> ключи треков
+        self._prefixes: Dict[str, Set[str]] = {}
+        # триграмма -> ключи треков
+        self._trigrams: Dict[str, Set[str]] = {}
+        # Все треки от часто воспроизводимых к редким
+        self._ranked: List[IndexedTrack] = []
+        # ключ трека -> индекс в _ranked
+        self._rank: Dict[str, int] = {}
+        # число воспроизведений -> индекс первого трека с таким числом в _ranked
+        self._group_start: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    @staticmethod
+    def _key(track: Track) -> str:
+        # Один ключ для треков YouTube и Spotify, найденных на том же видео
+        return YouTubeExtractor.get_video_id(track.url) or track.url
+
+    def _add(self, entry: IndexedTrack):
+        """Добавляет трек в индексы"""
+        self._tracks[entry.key] = entry
+        text = f"{entry.title} {entry.artist or ''}"
+        for word in _words(text):
+            for length in range(1, min(len(word), self.MAX_PREFIX) + 1):
+                self._prefixes.setdefault(word[:length], set()).add(entry.key)
+        for trigram in _trigrams(text):
+            self._trigrams.setdefault(trigram, set()).add(entry.key)
+
+    def _discard(self, entry: IndexedTrack):
+        """Удаляет трек из индексов"""
+        text = f"{entry.title} {entry.artist or ''}"
+        for word in _words(text):
+            for length in range(1, min(len(word), self.MAX_PREFIX) + 1):
+                keys = self._prefixes.get(word[:length])
+                if keys is not None:
+                    keys.discard(entry.key)
+                    if not keys:
+                        del self._prefixes[word[:length]]
+        for trigram in _trigrams(text):
+            keys = self._trigrams.get(trigram)
+            if keys is not None:
+                keys.discard(entry.key)
+                if not keys:
+                    del self._trigrams[trigram]
+
+    async def load(self):
+        """Загружает индекс из базы данных"""
+        if self._loaded or not self._db:
+            return
+        self._loaded = True
+
+        rows = await self._db.fetch_all(
+            "SELECT `key`, `url`, `title`, `artist`, `plays` FROM `music_track_index` "
+            "ORDER BY `plays` DESC LIMIT ?",
+            (self._max_tracks,)
+        )
+        for key, url, title, artist, plays in rows:
+            self._add(IndexedTrack(key=key, url=url, title=title or '', artist=artist, plays=plays or 0))
+        self._rerank()
+        logger.info(f"Индекс подсказок: {len(self._tracks)} треков")
+
+    def record(self, track: Track):
+        """
+        Учитывает воспроизведение трека.
+
+        Индекс в памяти обновляется сразу, запись в БД откладывается.
+
+        Args:
+            track: Воспроизведенный трек
+        """
+        key = self._key(track)
+        if not key:
+            return
+
+        entry = self._tracks.get(key)
+        if entry is None:
+            if len(self._tracks) >= self._max_tracks:
+                self._evict()
+            entry = IndexedTrack(key=key, url=track.url, title=track.title, artist=track.artist)
+            self._add(entry)
+            self._append_ranked(entry)
+        elif entry.title != track.title or entry.artist != track.artist:
+            # Метаданные изменились (например, трек теперь из Spotify)
+            self._discard(entry)
+            entry.title = track.title
+            entry.artist = track.artist
+            self._add(entry)
+        entry.url = track.url
+        self._promote(entry)
+
+        if not self._writer:
+            return
+
+        pending = self._writer.pending.get(key)
+        self._writer.pending[key] = (track.url, track.title, track.artist, (pending[3] if pending else 0) + 1)
+        self._writer.schedule()
+
+    async def flush(self):
+        """Записывает накопленные воспроизведения в БД"""
+        if self._writer:
+            await self._writer.flush()
+
+    @staticmethod
+    def _build_batches(
+        pending: Dict[str, Tuple[str, str, Optional[str], int]]
+    ) -> List[Tuple[str, List[tuple]]]:
+        """Запрос обновления индекса в БД"""
+        return [(
+            "INSERT INTO `music_track_index` (key, url, title, artist, plays, last_played) "
+            "VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "url = excluded.url, title = excluded.title, artist = excluded.artist, "
+            "plays = music_track_index.plays + excluded.plays, last_played = CURRENT_TIMESTAMP",
+            [(key,) + values for key, values in pending.items()]
+        )]
+
+    def lookup(self, query: str, limit: Optional[int] = None) -> List[IndexedTrack]:
+        """
+        Ищет подсказки по началу запроса.
+
+        Args:
+            query: Введенный текст
+            limit: Максимальное количество подсказок
+
+        Returns:
+            Треки, от часто воспроизводимых к редким
+        """
+        limit = limit or self._limit
+        words = _words(query)
+
+        if not words:
+            return self._ranked[:limit]
+
+        candidates = self._match_prefixes(words)
+        if not candidates:
+            return self._match_trigrams(query, limit)
+
+        if len(candidates) * self.SCAN_RATIO >= len(self._tracks):
+            # Совпадений много (короткий префикс): первые limit из них
+            # встретятся в начале общего рейтинга
+            result = []
+            for entry in self._ranked:
+                if entry.key in candidates:
+                    result.append(entry)
+                    if len(result) == limit:
+                        break
+            return result
+
+        tracks = self._tracks
+        return heapq.nlargest(limit, (tracks[key] for key in candidates), key=lambda e: e.plays)
+
+    def _rerank(self):
+        """Строит общий рейтинг треков заново (только при загрузке)"""
+        self._ranked = sorted(self._tracks.values(), key=lambda e: e.plays, reverse=True)
+        self._rank = {entry.key: index for index, entry in enumerate(self._ranked)}
+        self._group_start = {}
+        for index, entry in enumerate(self._ranked):
+            self._group_start.setdefault(entry.plays, index)
+
+    def _append_ranked(self, entry: IndexedTrack):
+        """Добавляет трек в конец рейтинга (его воспроизведений не больше, чем у остальных)"""
+        index = len(self._ranked)
+        self._ranked.append(entry)
+        self._rank[entry.key] = index
+        self._group_start.setdefault(entry.plays, index)
+
+    def _promote(self, entry: IndexedTrack):
+        """
+        Увеличивает число воспроизведений трека, сохраняя порядок рейтинга.
+
+        Трек меняется местами с первым треком с тем же числом
+        воспроизведений и становится последним в группе на единицу выше.
+        """
+        ranked = self._ranked
+        plays = entry.plays
+        index = self._rank[entry.key]
+        start = self._group_start[plays]
+
+        if index != start:
+            other = ranked[start]
+            ranked[index], ranked[start] = other, entry
+            self._rank[other.key] = index
+            self._rank[entry.key] = start
+
+        entry.plays = plays + 1
+        if start + 1 < len(ranked) and ranked[start + 1].plays == plays:
+            self._group_start[plays] = start + 1
+        else:
+            del self._group_start[plays]
+        self._group_start.setdefault(plays + 1, start)
+
+    def _evict(self):
+        """Удаляет из памяти самый редко воспроизводимый трек (в БД он остается)"""
+        entry = self._ranked.pop()
+        del self._rank[entry.key]
+        if self._group_start.get(entry.plays) == len(self._ranked):
+            del self._group_start[entry.plays]
+        del self._tracks[entry.key]
+        self._discard(entry)
+
+    def _match_prefixes(self, words: List[str]) -> Set[str]:
+        """Треки, где каждое слово запроса - начало какого-либо слова трека"""
+        sets = []
+        for word in words:
+            keys = self._prefixes.get(word[:self.MAX_PREFIX])
+            if not keys:
+                return set()
+            sets.append(keys)
+
+        # Пересечение идет от самого маленького множества; результат не изменяется
+        sets.sort(key=len)
+        result = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+
+        if any(len(word) > self.MAX_PREFIX for word in words):
+            # Длинные слова сверяем целиком
+            result = {key for key in result if self._contains_words(self._tracks[key], words)}
+        return result
+
+    @staticmethod
+    def _contains_words(entry: IndexedTrack, words: List[str]) -> bool:
+        track_words = _words(f"{entry.title} {entry.artist or ''}")
+        return all(any(t.startswith(word) for t in track_words) for word in words)
+
+    def _match_trigrams(self, query: str, limit: int) -> List[IndexedTrack]:
+        """Треки с наибольшим числом общих с запросом триграмм"""
+        trigrams = _trigrams(query)
+        counts: Counter = Counter()
+        for trigram in trigrams:
+            counts.update(self._trigrams.get(trigram, ()))
+
+        # Не меньше половины триграмм запроса должны совпасть
+        threshold = max(1, len(trigrams) // 2)
+        tracks = self._tracks
+        return heapq.nlargest(
+            limit,
+            (tracks[key] for key, count in counts.items() if count >= threshold),
+            key=lambda e: (counts[e.key], e.plays)
+        )
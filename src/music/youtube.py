@@ -6,18 +6,16 @@ import asyncio
 import logging
 import re
 from typing import Optional, List, Dict, Any
-from functools import lru_cache
-from concurrent.futures import ThreadPoolExecutor
-
-import yt_dlp
-
-from .models import Track, TrackSource
+from .models import Track, TrackSource, intern_track
+from .extraction import create_extraction_backend, ExtractionFailed
+from .health import UpstreamHealth, UpstreamUnavailable, CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
 # Настройки yt-dlp
 YTDL_FORMAT_OPTIONS = {
-    'format': 'bestaudio/best',
+    # Opus без видео можно передавать в Discord без перекодирования
+    'format': 'bestaudio[acodec=opus]/bestaudio/best',
     'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
     'restrictfilenames': True,
     'noplaylist': False,
@@ -31,6 +29,13 @@ YTDL_FORMAT_OPTIONS = {
     'extract_flat': False,
 }
 
+# Настройки быстрого поиска: только ID, названия и длительности результатов,
+# без получения форматов каждого видео
+YTDL_SEARCH_OPTIONS = {
+    **YTDL_FORMAT_OPTIONS,
+    'extract_flat': 'in_playlist',
+}
+
 # Настройки FFmpeg
 FFMPEG_OPTIONS = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
@@ -48,12 +53,30 @@ class YouTubeExtractor:
     YOUTUBE_PLAYLIST_REGEX = re.compile(
         r'(https?://)?(www\.)?youtube\.com/playlist\?list=[\w-]+'
     )
+    YOUTUBE_VIDEO_ID_REGEX = re.compile(
+        r'(?:youtube\.com/watch\?(?:.*&)?v=|youtu\.be/|youtube\.com/shorts/)([\w-]{11})'
+    )
     
-    def __init__(self, max_workers: int = 3):
-        self.ytdl = yt_dlp.YoutubeDL(YTDL_FORMAT_OPTIONS)
-        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+    def __init__(
+        self,
+        max_workers: int = 3,
+        backend: str = 'thread',
+        health: Optional[UpstreamHealth] = None
+    ):
+        """
+        Инициализация извлечения.
+        
+        Args:
+            max_workers: Количество рабочих процессов или потоков yt-dlp
+            backend: Движок извлечения ('process' или 'thread')
+            health: Состояние внешних сервисов (общее со Spotify)
+        """
+        self._backend = create_extraction_backend(backend, YTDL_FORMAT_OPTIONS, max_workers)
+        self.health = health or UpstreamHealth()
         self._cache: Dict[str, Track] = {}
         self._cache_limit = 100
+        # Выполняющиеся извлечения: одновременные запросы одного видео ждут одно извлечение
+        self._inflight: Dict[str, asyncio.Future] = {}
         
     async def extract_track(self, url_or_query: str) -> Optional[Track]:
         """
@@ -65,17 +88,16 @@ class YouTubeExtractor:
         Returns:
             Track объект или None при ошибке
         """
+        # Разные ссылки на одно видео используют одну запись кэша
+        cache_key = self.get_video_id(url_or_query) or url_or_query
+        
         # Проверяем кэш
-        if url_or_query in self._cache:
+        if cache_key in self._cache:
             logger.debug(f"Трек найден в кэше: {url_or_query}")
-            return self._cache[url_or_query]
+            return self._cache[cache_key]
         
         try:
-            loop = asyncio.get_event_loop()
-            data = await loop.run_in_executor(
-                self._executor,
-                lambda: self._extract_info(url_or_query, download=False)
-            )
+            data = await self._extract(url_or_query)
             
             if not data:
                 logger.warning(f"Не удалось получить информацию: {url_or_query}")
@@ -91,10 +113,12 @@ class YouTubeExtractor:
             track = self._create_track_from_data(data)
             
             # Сохраняем в кэш
-            self._add_to_cache(url_or_query, track)
+            self._add_to_cache(cache_key, track)
             
             return track
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Ошибка извлечения трека: {e}")
             return None
@@ -111,19 +135,14 @@ class YouTubeExtractor:
             Список Track объектов
         """
         try:
-            loop = asyncio.get_event_loop()
-            
             # Используем flat extraction для быстрого получения списка
             playlist_opts = YTDL_FORMAT_OPTIONS.copy()
             playlist_opts['extract_flat'] = 'in_playlist'
             playlist_opts['playlistend'] = max_tracks
             
-            ytdl_playlist = yt_dlp.YoutubeDL(playlist_opts)
-            
-            data = await loop.run_in_executor(
-                self._executor,
-                lambda: ytdl_playlist.extract_info(url, download=False)
-            )
+            breaker = self.health.breaker(UpstreamHealth.YOUTUBE)
+            breaker.check()
+            data = await self._call_backend(breaker, url, playlist_opts)
             
             if not data or 'entries' not in data:
                 logger.warning(f"Не удалось получить плейлист: {url}")
@@ -135,24 +154,38 @@ class YouTubeExtractor:
             # Извлекаем информацию о каждом треке
             for entry in entries:
                 video_url = entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
-                track = await self.extract_track(video_url)
+                try:
+                    track = await self.extract_track(video_url)
+                except UpstreamUnavailable:
+                    # Уже найденные треки остаются в результате
+                    if not tracks:
+                        raise
+                    logger.warning(f"YouTube отключен, из плейлиста извлечено {len(tracks)} треков")
+                    break
                 if track:
                     tracks.append(track)
             
             logger.info(f"Извлечено {len(tracks)} треков из плейлиста")
             return tracks
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Ошибка извлечения плейлиста: {e}")
             return []
     
-    async def search(self, query: str, max_results: int = 1) -> List[Track]:
+    async def search(self, query: str, max_results: int = 1, flat: bool = True) -> List[Track]:
         """
         Поиск треков на YouTube.
         
+        Быстрый поиск (flat) выполняется одним легким запросом и не получает
+        stream URL: он будет получен через get_stream_url только для трека,
+        который действительно будет воспроизводиться.
+        
         Args:
             query: Поисковый запрос
             max_results: Максимальное количество результатов
+            flat: Быстрый поиск без получения форматов видео
             
         Returns:
             Список Track объектов
@@ -160,23 +193,29 @@ class YouTubeExtractor:
         try:
             search_query = f"ytsearch{max_results}:{query}"
             
-            loop = asyncio.get_event_loop()
-            data = await loop.run_in_executor(
-                self._executor,
-                lambda: self._extract_info(search_query, download=False)
-            )
+            if flat:
+                data = await self._extract(search_query, YTDL_SEARCH_OPTIONS)
+            else:
+                data = await self._extract(search_query)
             
             if not data or 'entries' not in data:
                 return []
             
             tracks = []
             for entry in data['entries']:
-                if entry:
+                if not entry:
+                    continue
+                if flat:
+                    track = self._create_track_from_entry(entry)
+                else:
                     track = self._create_track_from_data(entry)
+                if track:
                     tracks.append(track)
             
             return tracks
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Ошибка поиска: {e}")
             return []
@@ -195,14 +234,11 @@ class YouTubeExtractor:
             return track.stream_url
         
         try:
-            loop = asyncio.get_event_loop()
-            data = await loop.run_in_executor(
-                self._executor,
-                lambda: self._extract_info(track.url, download=False)
-            )
+            data = await self._extract(track.url)
             
             if data and 'url' in data:
                 track.stream_url = data['url']
+                track.stream_codec = self._get_codec(data)
                 return data['url']
             
             # Пробуем получить из formats
@@ -210,10 +246,13 @@ class YouTubeExtractor:
                 for f in data['formats']:
                     if f.get('acodec') != 'none':
                         track.stream_url = f['url']
+                        track.stream_codec = self._get_codec(f)
                         return f['url']
             
             return None
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Ошибка получения stream URL: {e}")
             return None
@@ -226,25 +265,123 @@ class YouTubeExtractor:
         """Проверяет, является ли URL плейлистом YouTube"""
         return bool(self.YOUTUBE_PLAYLIST_REGEX.match(url))
     
-    def _extract_info(self, url: str, download: bool = False) -> Optional[Dict[str, Any]]:
-        """Синхронное извлечение информации через yt-dlp"""
+    @classmethod
+    def get_video_id(cls, url: str) -> Optional[str]:
+        """Извлекает ID видео из URL YouTube"""
+        match = cls.YOUTUBE_VIDEO_ID_REGEX.search(url or '')
+        return match.group(1) if match else None
+    
+    def get_video_url(self, video_id: str) -> str:
+        """Формирует URL видео YouTube по его ID"""
+        return f"https://www.youtube.com/watch?v={video_id}"
+    
+    async def _extract(
+        self,
+        url_or_query: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Извлекает информацию через движок yt-dlp.
+        
+        Одновременные запросы одного видео (по ID) или одного поискового
+        запроса объединяются: извлечение выполняется один раз, а все
+        ожидающие получают общий результат.
+        
+        Args:
+            url_or_query: URL видео или запрос для yt-dlp
+            options: Настройки yt-dlp (по умолчанию - полное извлечение)
+            
+        Returns:
+            Данные yt-dlp или None при ошибке
+            
+        Raises:
+            UpstreamUnavailable: YouTube отключен после серии ошибок
+        """
+        key = self.get_video_id(url_or_query) or url_or_query
+        if options is YTDL_SEARCH_OPTIONS:
+            # Быстрый поиск возвращает другие данные, чем полное извлечение
+            key = f"flat:{key}"
+        
+        future = self._inflight.get(key)
+        if future is None:
+            # Не URL - поисковый запрос (ytsearch или default_search)
+            is_search = not url_or_query.startswith(('http://', 'https://'))
+            breaker = self.health.breaker(
+                UpstreamHealth.YOUTUBE_SEARCH if is_search else UpstreamHealth.YOUTUBE
+            )
+            breaker.check()
+            future = asyncio.ensure_future(self._call_backend(breaker, url_or_query, options))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.debug(f"Ожидание уже выполняющегося извлечения: {key}")
+        
+        # Отмена одного из ожидающих не должна отменять извлечение для остальных
+        return await asyncio.shield(future)
+    
+    async def _call_backend(
+        self,
+        breaker: CircuitBreaker,
+        url_or_query: str,
+        options: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Выполняет извлечение и учитывает результат в состоянии сервиса"""
         try:
-            return self.ytdl.extract_info(url, download=download)
-        except Exception as e:
-            logger.error(f"Ошибка yt-dlp: {e}")
+            data = await self._backend.extract(url_or_query, options)
+        except ExtractionFailed as e:
+            # Удаленное, приватное или недоступное в регионе видео - ответ
+            # YouTube, сервис отключается только после серии сбоев
+            if e.upstream:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
             return None
+        except Exception:
+            breaker.record_failure()
+            raise
+        
+        if data:
+            breaker.record_success()
+        return data
     
     def _create_track_from_data(self, data: Dict[str, Any]) -> Track:
-        """Создает Track из данных yt-dlp"""
-        return Track(
+        """Создает Track из данных yt-dlp (общий экземпляр для одного видео)"""
+        track = Track(
             title=data.get('title', 'Unknown'),
             url=data.get('webpage_url') or data.get('url', ''),
             duration=data.get('duration', 0) or 0,
             thumbnail=data.get('thumbnail'),
             artist=data.get('uploader') or data.get('channel'),
             source=TrackSource.YOUTUBE,
-            stream_url=data.get('url')
+            stream_url=data.get('url'),
+            stream_codec=self._get_codec(data)
+        )
+        return intern_track(track, self.get_video_id(track.url))
+    
+    def _create_track_from_entry(self, entry: Dict[str, Any]) -> Optional[Track]:
+        """Создает Track из результата быстрого поиска (без stream URL)"""
+        video_id = entry.get('id')
+        if not video_id:
+            return None
+        
+        thumbnails = entry.get('thumbnails') or []
+        track = Track(
+            title=entry.get('title') or 'Unknown',
+            url=self.get_video_url(video_id),
+            duration=int(entry.get('duration') or 0),
+            thumbnail=thumbnails[-1].get('url') if thumbnails else None,
+            artist=entry.get('channel') or entry.get('uploader'),
+            source=TrackSource.YOUTUBE
         )
+        return intern_track(track, video_id)
+    
+    @staticmethod
+    def _get_codec(data: Dict[str, Any]) -> Optional[str]:
+        """Возвращает аудио кодек формата yt-dlp"""
+        codec = data.get('acodec')
+        if not codec or codec == 'none':
+            return None
+        return codec.split('.')[0]
     
     def _add_to_cache(self, key: str, track: Track):
         """Добавляет трек в кэш с ограничением размера"""
@@ -260,5 +397,6 @@ class YouTubeExtractor:
     
     def __del__(self):
         """Освобождает ресурсы"""
-        self._executor.shutdown(wait=False)
+        if hasattr(self, '_backend'):
+            self._backend.shutdown()
 
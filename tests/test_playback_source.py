@@ -0,0 +1,175 @@
+"""
+Восстановление потока, пока чтение аудио потока заблокировано.
+"""
+
+import asyncio
+import subprocess
+import sys
+import threading
+import time
+
+import discord
+
+from src.music.models import Track, QueueItem
+from src.music.player import MusicPlayer
+from src.music.source import PCM_SILENCE
+
+GUILD_ID = 1
+FRAME = b'\1' * 3840
+
+
+class StalledStream(discord.FFmpegAudio):
+    """Источник, чтение которого висит на процессе, как у зависшего ffmpeg"""
+
+    def __init__(self):
+        self._process = subprocess.Popen(
+            [sys.executable, '-c', 'import time; time.sleep(60)'],
+            stdout=subprocess.PIPE
+        )
+
+    def read(self) -> bytes:
+        data = self._process.stdout.read(len(FRAME))
+        return data if len(data) == len(FRAME) else b''
+
+    def is_opus(self) -> bool:
+        return False
+
+    def cleanup(self):
+        self._process.kill()
+        self._process.wait()
+
+
+class BlockingSource(discord.AudioSource):
+    """Источник, чтение которого ждет события"""
+
+    def __init__(self):
+        self.unblock = threading.Event()
+        self.released = threading.Event()
+
+    def read(self) -> bytes:
+        self.unblock.wait()
+        return FRAME
+
+    def is_opus(self) -> bool:
+        return False
+
+    def cleanup(self):
+        self.released.set()
+
+
+class FrameSource(discord.AudioSource):
+    """Источник, который сразу отдает кадры"""
+
+    def __init__(self, frames: int = 100):
+        self.frames = frames
+
+    def read(self) -> bytes:
+        if self.frames <= 0:
+            return b''
+        self.frames -= 1
+        return FRAME
+
+    def is_opus(self) -> bool:
+        return False
+
+
+class FakeVoiceClient:
+    def __init__(self):
+        self.source = None
+
+
+def _player(replacement: discord.AudioSource) -> MusicPlayer:
+    player = MusicPlayer(youtube_extractor=None, gapless=False)
+    player._loop = asyncio.get_running_loop()
+
+    async def resolve_audio(guild_id, item, use_prefetch=True):
+        return 'https://example.com/stream', False
+
+    async def create_source(guild_id, location, volume, is_local, codec=None, position=0.0):
+        return replacement
+
+    player._resolve_audio = resolve_audio
+    player._create_source = create_source
+    return player
+
+
+def _start_track(player: MusicPlayer, source: discord.AudioSource):
+    item = QueueItem(
+        track=Track(title='Song', url='https://www.youtube.com/watch?v=abc', duration=180),
+        requester_id=1,
+        requester_name='user'
+    )
+    player.get_state(GUILD_ID).current_track = item
+    vc = FakeVoiceClient()
+    vc.source = player._wrap_source(GUILD_ID, item, source, offset=30.0)
+    player._voice_clients[GUILD_ID] = vc
+    return vc.source
+
+
+def _read_in_thread(playback) -> list:
+    frames = []
+    threading.Thread(target=lambda: frames.append(playback.read()), daemon=True).start()
+    return frames
+
+
+def test_recovery_does_not_wait_for_blocked_read():
+    async def scenario():
+        stalled = BlockingSource()
+        player = _player(FrameSource())
+        playback = _start_track(player, stalled)
+
+        frames = _read_in_thread(playback)
+        await asyncio.sleep(0.05)
+        assert playback.stalled_for(time.perf_counter()) > 0
+
+        # Если replace() ждет чтение, event loop стоит до этого таймера
+        safety = threading.Timer(2.0, stalled.unblock.set)
+        safety.start()
+        started = time.perf_counter()
+        await player._recover_stream(GUILD_ID, 30.0)
+        elapsed = time.perf_counter() - started
+        safety.cancel()
+
+        assert elapsed < 1.0
+        assert player.streams_recovered == 1
+        assert playback.current_source is not stalled
+
+        stalled.unblock.set()
+        for _ in range(100):
+            if frames:
+                break
+            await asyncio.sleep(0.01)
+        # Кадр зависшего источника не выдается после замены
+        assert frames == [PCM_SILENCE]
+        assert playback.read() == FRAME
+        assert playback.position == 30.0 + 0.02
+        assert stalled.released.wait(1.0)
+
+    asyncio.run(scenario())
+
+
+def test_watchdog_recovers_stalled_ffmpeg():
+    async def scenario():
+        stalled = StalledStream()
+        player = _player(FrameSource())
+        player.STREAM_CHECK_INTERVAL = 0.05
+        player.STREAM_STALL_TIMEOUT = 0.2
+        playback = _start_track(player, stalled)
+
+        frames = _read_in_thread(playback)
+        player._ensure_watchdog()
+        try:
+            for _ in range(200):
+                if player.streams_recovered:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            player._voice_clients.clear()
+            stalled.cleanup()
+
+        # ffmpeg завершен, обрыв отдан тишиной и трек продолжен новым источником
+        assert frames == [PCM_SILENCE]
+        assert player.streams_recovered == 1
+        assert playback.read() == FRAME
+
+    asyncio.run(scenario())